@@ -0,0 +1,201 @@
+"""
+Primary/replica database routing.
+
+Replicas are the aliases listed in settings.DATABASE_REPLICAS (built from
+REPLICA_DATABASE_URLS). Reads go to a replica only inside a request
+handled by ReplicaRoutingMiddleware whose method is safe (GET, HEAD,
+OPTIONS); writes, reads inside a transaction, reads after the request
+has written, models of REPLICA_EXCLUDED_APPS (sessions: a lagging replica
+would log users out) and everything outside a request (management
+commands, background threads) use the primary.
+
+Read-your-writes: a request that writes sets a short-lived cookie, and
+requests carrying it read from the primary for REPLICA_PIN_SECONDS, so a
+user sees their own RSVP right after the redirect. The cookie only ever
+makes reads more conservative, so it needs no signing.
+
+Code whose result outlives the request (the anonymous page cache
+regenerating a page after an invalidation) wraps its reads in
+read_from_primary(), so a lagging replica cannot be stored as the new
+copy. That doesn't pin the client.
+
+Each request picks one replica and keeps it, so its reads come from one
+snapshot. A replica is health-checked at most every REPLICA_CHECK_INTERVAL
+seconds per process; a replica that fails the check (or raises a
+database error during a request) is skipped until it passes again, and
+with no healthy replica reads fall back to the primary.
+"""
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+DATABASE_REPLICAS = getattr(settings, 'DATABASE_REPLICAS', [])
+REPLICA_PIN_SECONDS = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+REPLICA_PIN_COOKIE = getattr(settings, 'REPLICA_PIN_COOKIE', 'db_primary')
+REPLICA_CHECK_INTERVAL = getattr(settings, 'REPLICA_CHECK_INTERVAL', 5)
+REPLICA_EXCLUDED_APPS = getattr(settings, 'REPLICA_EXCLUDED_APPS', ('sessions',))
+# Seconds of replication lag (PostgreSQL only) above which a replica counts as unhealthy
+REPLICA_MAX_LAG = getattr(settings, 'REPLICA_MAX_LAG', None)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_routing = ContextVar('db_routing', default=None)
+_health = {}
+_health_lock = threading.Lock()
+
+
+class RoutingState:
+    """Per-request routing decisions"""
+
+    def __init__(self, use_replicas):
+        self.use_replicas = use_replicas
+        self.replica = None
+        self.wrote = False
+
+
+@contextmanager
+def read_from_primary():
+    """Send the current request's reads to the primary inside the block, without pinning the client"""
+    state = _routing.get()
+    if state is None:
+        yield
+        return
+    use_replicas, state.use_replicas = state.use_replicas, False
+    try:
+        yield
+    finally:
+        state.use_replicas = use_replicas
+
+
+def check_replica(alias):
+    """Whether `alias` answers and has the schema (and, on PostgreSQL, is within REPLICA_MAX_LAG)"""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1 FROM django_migrations LIMIT 1')
+            if REPLICA_MAX_LAG is not None and connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)'
+                )
+                lag = cursor.fetchone()[0]
+                if lag > REPLICA_MAX_LAG:
+                    logger.warning('Replica %s is %.1f s behind', alias, lag)
+                    return False
+        return True
+    except DatabaseError as error:
+        logger.warning('Replica %s is unavailable: %s', alias, error)
+        connection.close()
+        return False
+
+
+def is_healthy(alias):
+    now = time.monotonic()
+    with _health_lock:
+        status = _health.get(alias)
+    if status is not None and status[1] > now:
+        return status[0]
+    healthy = check_replica(alias)
+    with _health_lock:
+        _health[alias] = (healthy, now + REPLICA_CHECK_INTERVAL)
+    return healthy
+
+
+def mark_unhealthy(alias):
+    with _health_lock:
+        _health[alias] = (False, time.monotonic() + REPLICA_CHECK_INTERVAL)
+
+
+def _choose_replica(state):
+    if state.replica is None:
+        healthy = [alias for alias in DATABASE_REPLICAS if is_healthy(alias)]
+        state.replica = random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+    return state.replica
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.use_replicas or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label in REPLICA_EXCLUDED_APPS:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return _choose_replica(state)
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the primary's rows
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in DATABASE_REPLICAS
+
+
+class ReplicaRoutingMiddleware:
+    """Let safe requests read from a replica unless the client recently wrote"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.finish(request, response, state)
+
+    async def __acall__(self, request):
+        state, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.finish(request, response, state)
+
+    def start(self, request):
+        use_replicas = (
+            bool(DATABASE_REPLICAS)
+            and request.method in SAFE_METHODS
+            and REPLICA_PIN_COOKIE not in request.COOKIES
+        )
+        state = RoutingState(use_replicas)
+        return state, _routing.set(state)
+
+    def finish(self, request, response, state):
+        if state.wrote and DATABASE_REPLICAS:
+            response.set_cookie(
+                REPLICA_PIN_COOKIE, '1', max_age=REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+                secure=request.is_secure(),
+            )
+        return response
+
+    def process_exception(self, request, exception):
+        state = _routing.get()
+        if isinstance(exception, DatabaseError) and state is not None \
+                and state.replica not in (None, DEFAULT_DB_ALIAS):
+            mark_unhealthy(state.replica)
+        return None
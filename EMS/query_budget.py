@@ -0,0 +1,292 @@
+"""
+Per-request query instrumentation and query budgets.
+
+Every database connection carries one process-wide execute_wrapper,
+which hands each query to the recorder of the request being served, held
+in a ContextVar, and passes it straight through otherwise.
+QueryInstrumentationMiddleware sets that recorder for the duration of a
+request (including the iteration of streaming responses) and records:
+
+* the number of queries and the total time spent in the database,
+* a fingerprint per statement (the SQL template with IN lists collapsed),
+  counting how often each one ran and, for repeats, the project code
+  that issued them - a template running once per row is an N+1.
+
+A view declares its budget with the @query_budget decorator, or a URL
+name gets one through the QUERY_BUDGETS setting. Going over budget (or
+repeating one statement more than QUERY_REPEAT_LIMIT times) logs a
+warning with the repeated statements and their origins, and raises
+QueryBudgetExceeded when QUERY_BUDGET_RAISE is set, so tests fail
+instead of shipping the regression. With QUERY_SERVER_TIMING the totals
+are also sent in a Server-Timing header.
+
+Under ASGI, concurrent requests share the one thread that runs sync code
+and database queries; sync_to_async() carries each request's context
+over, so queries still reach the recorder of the request that issued
+them. Long-lived async streams (server-sent events) opt out of recording
+their content with query_budget(..., record_stream=False); only the
+queries made before the stream starts are checked.
+"""
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGETS = getattr(settings, 'QUERY_BUDGETS', {})
+QUERY_REPEAT_LIMIT = getattr(settings, 'QUERY_REPEAT_LIMIT', 10)
+QUERY_BUDGET_RAISE = getattr(settings, 'QUERY_BUDGET_RAISE', False)
+QUERY_SERVER_TIMING = getattr(settings, 'QUERY_SERVER_TIMING', False)
+
+# Distinct call sites kept per repeated statement
+MAX_ORIGINS = 3
+
+PROJECT_ROOT = str(settings.BASE_DIR)
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+WHITESPACE = re.compile(r'\s+')
+
+_recorder = ContextVar('query_recorder', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryBudget:
+    def __init__(self, max_queries=None, max_repeats=None, record_stream=True):
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats if max_repeats is not None else QUERY_REPEAT_LIMIT
+        self.record_stream = record_stream
+
+    def violations(self, recorder):
+        problems = []
+        if self.max_queries is not None and recorder.count > self.max_queries:
+            problems.append(f'{recorder.count} queries (budget {self.max_queries})')
+        for fingerprint, count in recorder.repeated(self.max_repeats):
+            problems.append(f'{count}x {fingerprint[:200]}')
+        return problems
+
+
+def query_budget(max_queries=None, max_repeats=None, record_stream=True):
+    """
+    Declare the most queries (and repeats of one statement) a view may run
+    per request. With record_stream=False the content of a streaming
+    response is not recorded, for streams that stay open indefinitely.
+    """
+    budget = QueryBudget(max_queries, max_repeats, record_stream)
+
+    def decorator(view):
+        # functools.wraps copies the attribute onto any outer decorator
+        view.query_budget = budget
+        return view
+    return decorator
+
+
+def fingerprint(sql):
+    return IN_LIST.sub('IN (...)', WHITESPACE.sub(' ', sql).strip())
+
+
+def _frame_name(frame):
+    filename = frame.f_code.co_filename
+    marker = f'{os.sep}site-packages{os.sep}'
+    if marker in filename:
+        filename = filename.split(marker, 1)[1]
+    elif filename.startswith(PROJECT_ROOT):
+        filename = os.path.relpath(filename, PROJECT_ROOT)
+    return f'{filename}:{frame.f_lineno} in {frame.f_code.co_name}'
+
+
+def _is_project(frame):
+    filename = frame.f_code.co_filename
+    return filename.startswith(PROJECT_ROOT) and f'{os.sep}site-packages{os.sep}' not in filename
+
+
+def _origin():
+    """
+    Where a query came from: the innermost frame outside the ORM, plus the
+    innermost project frame when that is further out (e.g. a template or
+    admin helper touching a relation for each row).
+    """
+    frame = sys._getframe(2)
+    caller = None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename != __file__ and f'{os.sep}django{os.sep}db{os.sep}' not in filename \
+                and not filename.endswith(f'{os.sep}contextlib.py'):
+            if _is_project(frame):
+                origin = _frame_name(frame)
+                return origin if caller is None else f'{caller} (via {origin})'
+            if caller is None:
+                caller = _frame_name(frame)
+        frame = frame.f_back
+    return caller
+
+
+class QueryRecorder:
+    """execute_wrapper that counts, times and fingerprints every query"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.origins = defaultdict(set)
+
+    def __call__(self, execute, sql, params, many, context):
+        key = fingerprint(sql)
+        self.count += 1
+        self.fingerprints[key] += 1
+        if self.fingerprints[key] > 1 and len(self.origins[key]) < MAX_ORIGINS:
+            origin = _origin()
+            if origin:
+                self.origins[key].add(origin)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+
+    def repeated(self, limit):
+        return [(key, count) for key, count in self.fingerprints.most_common() if count > limit]
+
+    def report(self, limit):
+        lines = []
+        for key, count in self.repeated(limit):
+            origins = ', '.join(sorted(self.origins[key])) or 'unknown origin'
+            lines.append(f'  {count}x from {origins}: {key[:300]}')
+        return '\n'.join(lines)
+
+
+
+def _dispatch(execute, sql, params, many, context):
+    """The process-wide execute_wrapper: record into the current request's recorder, if any"""
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install(connection, **kwargs):
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_dispatch)
+
+
+# Covers every connection opened from now on, in any thread
+connection_created.connect(install)
+
+
+class QueryInstrumentationMiddleware:
+    """Record the queries of each request and enforce its query budget"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        # Connections opened before this module was imported
+        for connection in connections.all(initialized_only=True):
+            install(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.wrap(request, response, recorder)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.wrap(request, response, recorder)
+
+    def wrap(self, request, response, recorder):
+        """Finish now, or once the streaming content has been consumed"""
+        budget = self.get_budget(request)
+        if not response.streaming or (budget is not None and not budget.record_stream):
+            self.finish(request, response, recorder)
+        elif response.is_async:
+            response.streaming_content = self._astream(request, response, recorder, response.streaming_content)
+        else:
+            response.streaming_content = self._stream(request, response, recorder, response.streaming_content)
+        return response
+
+    # The recorder is set around each step rather than for the whole
+    # iteration: the server may advance the stream from a fresh context
+    def _stream(self, request, response, recorder, content):
+        iterator = iter(content)
+        while True:
+            token = _recorder.set(recorder)
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                _recorder.reset(token)
+            yield chunk
+        self.finish(request, response, recorder, streamed=True)
+
+    async def _astream(self, request, response, recorder, content):
+        iterator = aiter(content)
+        while True:
+            token = _recorder.set(recorder)
+            try:
+                chunk = await anext(iterator)
+            except StopAsyncIteration:
+                break
+            finally:
+                _recorder.reset(token)
+            yield chunk
+        self.finish(request, response, recorder, streamed=True)
+
+    def get_budget(self, request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return None
+        budget = getattr(match.func, 'query_budget', None)
+        view_class = getattr(match.func, 'view_class', None)
+        if budget is None and view_class is not None:
+            budget = getattr(view_class, 'query_budget', None)
+        if budget is None and match.view_name in QUERY_BUDGETS:
+            budget = QueryBudget(QUERY_BUDGETS[match.view_name])
+        return budget
+
+    def finish(self, request, response, recorder, streamed=False):
+        request.query_recorder = recorder
+        if QUERY_SERVER_TIMING and not streamed:
+            response['Server-Timing'] = (
+                f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"'
+            )
+        logger.debug(
+            '%s %s: %d queries in %.1f ms', request.method, request.path, recorder.count, recorder.duration * 1000
+        )
+
+        budget = self.get_budget(request) or QueryBudget()
+        problems = budget.violations(recorder)
+        if not problems:
+            return
+        message = (
+            f'Query budget exceeded for {request.method} {request.path}: {"; ".join(problems)}\n'
+            f'{recorder.report(budget.max_repeats if budget.max_queries is None else 1)}'
+        )
+        if QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -1,7 +1,9 @@
 from pathlib import Path
 from django.contrib.messages import constants as messages
+from django.core.exceptions import ImproperlyConfigured
 import dj_database_url
 import os
+import sys
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -26,6 +28,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'EMS.query_budget.QueryInstrumentationMiddleware',
+    'EMS.db_router.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -47,6 +51,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'events.context_processors.navigation',
             ],
         },
     },
@@ -62,6 +67,60 @@ DATABASES = {
     )
 }
 
+# Optional read replicas (comma separated URLs, aliased replica_1, replica_2, ...).
+# EMS.db_router sends reads of GET/HEAD requests to them, keeping clients that
+# just wrote on the primary for REPLICA_PIN_SECONDS
+DATABASE_REPLICAS = []
+for index, url in enumerate(filter(None, os.getenv('REPLICA_DATABASE_URLS', '').split(',')), start=1):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dj_database_url.parse(url.strip(), conn_max_age=600)
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['EMS.db_router.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
+
+# Shared by the role cache and the anonymous page cache; use a backend shared
+# by all workers (e.g. django.core.cache.backends.redis.RedisCache) in production.
+# Role names are only cached across requests with such a backend
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Session storage: db (default), cached_db, cache or signed_cookies. With cache
+# or signed_cookies page views never touch the session table; cache needs the
+# shared cache above, signed_cookies keeps the (signed, not encrypted) data client-side
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'db')
+if SESSION_BACKEND not in ('db', 'cached_db', 'cache', 'signed_cookies'):
+    raise ImproperlyConfigured(f'Unknown SESSION_BACKEND: {SESSION_BACKEND}')
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_BACKEND}'
+
+# Anonymous page cache (events.page_cache), in seconds
+PAGE_CACHE_FRESH = int(os.getenv('PAGE_CACHE_FRESH', 60))
+PAGE_CACHE_STALE = int(os.getenv('PAGE_CACHE_STALE', 600))
+
+# Per-request query budgets (EMS.query_budget): over-budget requests log a
+# warning, or fail outright when QUERY_BUDGET_RAISE is on (always under `manage.py test`)
+QUERY_BUDGET_RAISE = os.getenv('QUERY_BUDGET_RAISE', str(sys.argv[1:2] == ['test'])) == 'True'
+QUERY_REPEAT_LIMIT = int(os.getenv('QUERY_REPEAT_LIMIT', 10))
+QUERY_SERVER_TIMING = os.getenv('QUERY_SERVER_TIMING', str(DEBUG)) == 'True'
+QUERY_BUDGETS = {}
+
+# Serve the read-only event pages from their native async versions
+# (events.async_views); EMS.asgi turns this on unless set explicitly
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+
+# Live RSVP updates (events.live): LocalBackend serves a single process,
+# events.live.DatabaseBackend fans out across processes through the database
+LIVE_BACKEND = os.getenv('LIVE_BACKEND', 'events.live.LocalBackend')
+
+# `manage.py archive_events` moves events that started more than this many
+# days ago, with their RSVPs, to the archive tables (events.archive)
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 365))
+
 
 
 AUTH_PASSWORD_VALIDATORS = [
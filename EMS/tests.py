@@ -0,0 +1,200 @@
+import asyncio
+from importlib import import_module
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import ResolverMatch
+
+from events import page_cache
+from events.models import Category, Event
+
+from . import db_router, query_budget
+from .db_router import REPLICA_PIN_COOKIE, PrimaryReplicaRouter, ReplicaRoutingMiddleware
+from .query_budget import QUERY_REPEAT_LIMIT, QueryBudgetExceeded, QueryInstrumentationMiddleware, fingerprint
+
+
+@mock.patch.object(db_router, 'DATABASE_REPLICAS', ['replica_1'])
+@mock.patch.object(db_router, 'is_healthy', lambda alias: True)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def handle(self, request, view):
+        """Run `view(router)` inside the routing middleware; returns (its result, the response)"""
+        result = []
+
+        def get_response(request):
+            result.append(view(self.router))
+            return HttpResponse()
+        response = ReplicaRoutingMiddleware(get_response)(request)
+        return result[0], response
+
+    def test_reads_outside_requests_use_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Event), 'default')
+
+    def test_safe_requests_read_from_a_replica(self):
+        alias, response = self.handle(self.factory.get('/'), lambda router: router.db_for_read(Event))
+        self.assertEqual(alias, 'replica_1')
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_excluded_apps_read_from_the_primary(self):
+        alias, _ = self.handle(self.factory.get('/'), lambda router: router.db_for_read(Session))
+        self.assertEqual(alias, 'default')
+
+    def test_unsafe_requests_use_the_primary(self):
+        alias, _ = self.handle(self.factory.post('/'), lambda router: router.db_for_read(Event))
+        self.assertEqual(alias, 'default')
+
+    def test_writes_pin_the_rest_of_the_request_and_the_client(self):
+        def write_then_read(router):
+            router.db_for_write(Event)
+            return router.db_for_read(Event)
+        alias, response = self.handle(self.factory.post('/'), write_then_read)
+        self.assertEqual(alias, 'default')
+        self.assertIn(REPLICA_PIN_COOKIE, response.cookies)
+
+        request = self.factory.get('/')
+        request.COOKIES[REPLICA_PIN_COOKIE] = '1'
+        alias, _ = self.handle(request, lambda router: router.db_for_read(Event))
+        self.assertEqual(alias, 'default')
+
+    def test_read_from_primary_covers_only_its_block(self):
+        def reads(router):
+            with db_router.read_from_primary():
+                inside = router.db_for_read(Event)
+            return inside, router.db_for_read(Event)
+        aliases, response = self.handle(self.factory.get('/'), reads)
+        self.assertEqual(aliases, ('default', 'replica_1'))
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_cached_pages_are_regenerated_from_the_primary(self):
+        cache.clear()
+        reads = []
+
+        @page_cache.cache_anonymous_page(lambda request: ['events'])
+        def view(request):
+            reads.append(self.router.db_for_read(Event))
+            return HttpResponse('page')
+
+        def get():
+            request = self.factory.get('/regenerated/')
+            request.user, request.session = AnonymousUser(), import_module(settings.SESSION_ENGINE).SessionStore()
+            return ReplicaRoutingMiddleware(view)(request)
+
+        self.assertEqual(get()['X-Page-Cache'], 'miss')
+        page_cache.invalidate('events')
+        response = get()
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+        self.assertEqual(reads, ['default', 'default'])
+
+    def test_unhealthy_replicas_are_skipped(self):
+        with mock.patch.object(db_router, 'is_healthy', lambda alias: False):
+            alias, _ = self.handle(self.factory.get('/'), lambda router: router.db_for_read(Event))
+        self.assertEqual(alias, 'default')
+
+    def test_migrations_skip_replicas(self):
+        self.assertFalse(self.router.allow_migrate('replica_1', 'events'))
+        self.assertTrue(self.router.allow_migrate('default', 'events'))
+
+
+@mock.patch.object(query_budget, 'QUERY_BUDGET_RAISE', True)
+class QueryBudgetTests(TestCase):
+    def request(self, view, budget=None):
+        request = RequestFactory().get('/')
+        if budget is not None:
+            view = query_budget.query_budget(*budget)(view)
+        request.resolver_match = ResolverMatch(view, (), {})
+        return request
+
+    def run_view(self, view, budget=None):
+        request = self.request(view, budget)
+        QueryInstrumentationMiddleware(view)(request)
+        return request.query_recorder
+
+    def test_fingerprint_collapses_in_lists(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t\n WHERE id IN (%s, %s, %s)'), 'SELECT * FROM t WHERE id IN (...)'
+        )
+
+    def test_counts_queries_within_budget(self):
+        def view(request):
+            list(Category.objects.all())
+            list(Event.objects.all())
+            return HttpResponse()
+        self.assertEqual(self.run_view(view, budget=(2,)).count, 2)
+
+    def test_over_budget_raises(self):
+        def view(request):
+            for _ in range(3):
+                list(Category.objects.all())
+            return HttpResponse()
+        with self.assertRaisesMessage(QueryBudgetExceeded, '3 queries (budget 2)'):
+            self.run_view(view, budget=(2,))
+
+    def test_repeated_statements_report_their_origin(self):
+        def n_plus_one(request):
+            for pk in range(5):
+                Category.objects.filter(pk=pk).first()
+            return HttpResponse()
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'n_plus_one'):
+            self.run_view(n_plus_one, budget=(None, 3))
+
+    async def test_concurrent_async_requests_are_recorded_separately(self):
+        def make_view(queries):
+            async def view(request):
+                for _ in range(queries):
+                    await sync_to_async(Category.objects.exists)()
+                    await asyncio.sleep(0)
+                return HttpResponse()
+            return view
+
+        async def run(queries):
+            view = make_view(queries)
+            request = self.request(view)
+            await QueryInstrumentationMiddleware(view)(request)
+            return request.query_recorder.count
+
+        self.assertEqual(await asyncio.gather(run(2), run(5), run(8)), [2, 5, 8])
+        # One shared wrapper on the connection all of them used, not one per request
+        wrappers = await sync_to_async(lambda: list(connection.execute_wrappers))()
+        self.assertEqual(wrappers, [query_budget._dispatch])
+
+    def test_streamed_content_is_recorded(self):
+        def stream():
+            for pk in range(2):
+                yield str(Category.objects.filter(pk=pk).exists())
+
+        def view(request):
+            return StreamingHttpResponse(stream())
+
+        request = self.request(view)
+        response = QueryInstrumentationMiddleware(view)(request)
+        self.assertFalse(hasattr(request, 'query_recorder'))
+        b''.join(response.streaming_content)
+        self.assertEqual(request.query_recorder.count, 2)
+
+    def test_unrecorded_streams_only_check_their_setup(self):
+        def stream():
+            while True:
+                yield str(Category.objects.exists())
+
+        def view(request):
+            list(Event.objects.all())
+            return StreamingHttpResponse(stream())
+
+        request = self.request(view, budget=(1, None, False))
+        response = QueryInstrumentationMiddleware(view)(request)
+        self.assertEqual(request.query_recorder.count, 1)
+        content = iter(response.streaming_content)
+        for _ in range(QUERY_REPEAT_LIMIT + 1):
+            next(content)
+        self.assertEqual(request.query_recorder.count, 1)
@@ -1,14 +1,20 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from accounts.views import serve_content_addressed
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('accounts.urls')),
+    path('api/v1/', include('events.api_urls')),
     path('', include('events.urls')),
 ]
 
 
 if settings.DEBUG:
+    # In production the web server serves MEDIA_ROOT, cas/ with the immutable header (see README)
+    urlpatterns += [
+        re_path(r'^%s(?P<path>cas/.+)$' % settings.MEDIA_URL.lstrip('/'), serve_content_addressed),
+    ]
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
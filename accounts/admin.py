@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth import get_user_model
 from .models import UserProfile
+from .roles import primary_role_expression
 
 User = get_user_model()
 
@@ -31,6 +32,11 @@ class UserProfileAdmin(admin.ModelAdmin):
     """Admin interface for UserProfile model (legacy compatibility)"""
     list_display = ['user', 'get_phone', 'get_email_verified', 'get_user_role']
     search_fields = ['user__username', 'user__email']
+    list_select_related = ['user']
+    
+    def get_queryset(self, request):
+        # One subquery instead of a groups lookup per row for the Role column
+        return super().get_queryset(request).annotate(primary_role=primary_role_expression('user_id'))
     
     def get_phone(self, obj):
         return obj.user.phone_number  
@@ -42,8 +48,9 @@ class UserProfileAdmin(admin.ModelAdmin):
     get_email_verified.boolean = True
     
     def get_user_role(self, obj):
-        return obj.get_user_role()
+        return obj.primary_role
     get_user_role.short_description = 'Role'
+    get_user_role.admin_order_field = 'primary_role'
 
 try:
     admin.site.unregister(User)
@@ -0,0 +1,50 @@
+"""
+Square avatar thumbnails.
+
+A thumbnail is named after the content hash of its source avatar, so
+every user sharing the same picture shares one thumbnail and its URL can
+be derived without a lookup. Vector avatars are used as their own
+thumbnail.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .storage import avatar_storage, is_content_addressed
+
+THUMBNAIL_SIZE = getattr(settings, 'AVATAR_THUMBNAIL_SIZE', 128)
+# Field default. The SVG is shipped under MEDIA_ROOT at its content-addressed name,
+# so building a user (or migrating) touches no files and it is served immutable too
+DEFAULT_PROFILE_PICTURE = 'cas/3d/ec/3decbee4ad0fe4e21bb57dd367556f1efa0f109bd6474196b9609ed02e6bdd01.svg'
+
+
+def thumbnail_name(name):
+    """Thumbnail name for a content-addressed avatar, or None if it needs none"""
+    if not is_content_addressed(name):
+        return None
+    stem, extension = os.path.splitext(name)
+    if extension.lower() == '.svg':
+        return name
+    return f'{stem}-{THUMBNAIL_SIZE}.webp'
+
+
+def make_thumbnail(name):
+    """Create the thumbnail for `name` if it does not exist yet; returns its name or None"""
+    target = thumbnail_name(name)
+    if target is None or avatar_storage.exists(target):
+        return target
+    try:
+        with avatar_storage.open(name, 'rb') as source:
+            image = Image.open(source)
+            image.draft('RGB', (THUMBNAIL_SIZE * 2, THUMBNAIL_SIZE * 2))
+            image = ImageOps.exif_transpose(image)
+            image = ImageOps.fit(image.convert('RGBA'), (THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.Resampling.LANCZOS)
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+    buffer = BytesIO()
+    image.save(buffer, 'WEBP', quality=85)
+    return avatar_storage.save_derived(target, ContentFile(buffer.getvalue()))
+
@@ -2,26 +2,41 @@ from django.shortcuts import redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from functools import wraps
+from asgiref.sync import iscoroutinefunction
 from django.contrib.auth.models import Group
 
+from .roles import aload_user, has_role
+
 def role_required(allowed_roles):
     """
     Decorator to check if user has any of the specified roles.
     allowed_roles: list of role names (group names)
     """
+    def denied(request):
+        messages.error(request, f"You don't have permission to access this page. Required roles: {', '.join(allowed_roles)}")
+        return redirect('home')
+
     def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _async_view(request, *args, **kwargs):
+                user = await aload_user(request)
+                if not user.is_authenticated:
+                    return redirect('accounts:login')
+                
+                if not has_role(user, *allowed_roles):
+                    return denied(request)
+                
+                return await view_func(request, *args, **kwargs)
+            return _async_view
+
         @wraps(view_func)
         def _wrapped_view(request, *args, **kwargs):
             if not request.user.is_authenticated:
                 return redirect('accounts:login')
             
-
-            user_groups = request.user.groups.all()
-            user_role_names = [group.name for group in user_groups]
-            
-            if not any(role in user_role_names for role in allowed_roles):
-                messages.error(request, f"You don't have permission to access this page. Required roles: {', '.join(allowed_roles)}")
-                return redirect('home')
+            if not has_role(request.user, *allowed_roles):
+                return denied(request)
             
             return view_func(request, *args, **kwargs)
         return _wrapped_view
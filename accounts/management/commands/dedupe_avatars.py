@@ -0,0 +1,53 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+
+from accounts import avatars
+from accounts.storage import avatar_storage, is_content_addressed
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Move profile pictures into content-addressed storage and build their thumbnails'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete-originals', action='store_true',
+            help='Delete legacy files under users/profile_pictures/ once no user refers to them'
+        )
+
+    def handle(self, *args, **options):
+        moved = missing = 0
+        ingested = {}
+        legacy = set()
+        users = User.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+
+        for pk, name in users.order_by('pk').values_list('pk', 'profile_picture').iterator():
+            if not is_content_addressed(name):
+                if name not in ingested:
+                    try:
+                        ingested[name] = avatar_storage.ingest(name, default_storage)
+                    except OSError:
+                        missing += 1
+                        self.stdout.write(self.style.WARNING(f'User {pk}: {name} not found'))
+                        continue
+                    legacy.add(name)
+                User.objects.filter(pk=pk).update(profile_picture=ingested[name])
+                name = ingested[name]
+                moved += 1
+            avatars.make_thumbnail(name)
+
+        deleted = 0
+        if options['delete_originals']:
+            for name in sorted(legacy):
+                if name.startswith('users/profile_pictures/') and not User.objects.filter(profile_picture=name).exists():
+                    default_storage.delete(name)
+                    deleted += 1
+
+        stored = len(set(ingested.values()))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully moved {moved} profile pictures into {stored} stored files '
+                f'({missing} missing, {deleted} originals deleted)'
+            )
+        )
@@ -0,0 +1,204 @@
+import datetime
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+from django.utils import timezone
+
+from accounts.models import UserProfile as LegacyUserProfile
+from events import conditional, dashboard, page_cache, search
+from events.counters import rebuild_counters
+from events.models import Category, Event, RSVP, UserProfile
+
+User = get_user_model()
+
+TOPICS = [
+    'Technology', 'Music', 'Sports', 'Art', 'Business', 'Health', 'Science', 'Food',
+    'Education', 'Travel', 'Film', 'Gaming', 'Literature', 'Photography', 'Charity', 'Networking',
+]
+VENUES = ['Main Hall', 'Conference Room A', 'Conference Room B', 'Auditorium', 'Rooftop', 'Library', 'City Park', 'Online']
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn']
+LAST_NAMES = ['Rahman', 'Smith', 'Khan', 'Garcia', 'Chen', 'Okafor', 'Novak', 'Silva', 'Haddad', 'Kim']
+
+
+class Command(BaseCommand):
+    help = 'Generate deterministic synthetic users, categories, events and RSVPs for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--admins', type=int, default=2, help='Number of Admin users (default: 2)')
+        parser.add_argument('--organizers', type=int, default=20, help='Number of Organizer users (default: 20)')
+        parser.add_argument('--participants', type=int, default=1000, help='Number of Participant users (default: 1000)')
+        parser.add_argument('--categories', type=int, default=12, help='Number of categories (default: 12)')
+        parser.add_argument('--events', type=int, default=500, help='Number of events (default: 500)')
+        parser.add_argument('--rsvps', type=int, default=10000, help='Approximate number of RSVPs (default: 10000)')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='Events are spread over this many days before and after today (default: 365)'
+        )
+        parser.add_argument(
+            '--past-ratio', type=float, default=0.4,
+            help='Fraction of events that have already taken place (default: 0.4)'
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Zipf exponent of event popularity; 0 spreads RSVPs evenly (default: 1.1)'
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+        parser.add_argument('--prefix', default='seed', help='Prefix for generated usernames and category names')
+        parser.add_argument('--password', default='password', help='Password given to every generated user')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of rows inserted per transaction (default: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(f'Users prefixed "{prefix}_" already exist; pick another --prefix')
+
+        users = self.create_users(options)
+        self.stdout.write(f"Created {sum(len(ids) for ids in users.values())} users")
+
+        category_ids = self.create_categories(prefix, options['categories'])
+        self.stdout.write(f'Created {len(category_ids)} categories')
+
+        event_ids = self.create_events(options, category_ids, users['Organizer'] or users['Admin'])
+        self.stdout.write(f'Created {len(event_ids)} events')
+
+        rsvps = self.create_rsvps(options, event_ids, users['Participant'])
+        self.stdout.write(f'Created {rsvps} RSVPs')
+
+        # bulk_create skipped the signals that keep these up to date
+        self.stdout.write('Rebuilding counters, search index and dashboard snapshot...')
+        rebuild_counters()
+        for _ in search.reindex_all():
+            pass
+        dashboard.refresh_snapshot()
+        page_cache.invalidate('events', 'categories')
+        conditional.touch('events', 'categories')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully seeded {sum(len(ids) for ids in users.values())} users, {len(category_ids)} categories, "
+            f"{len(event_ids)} events and {rsvps} RSVPs (seed {options['seed']})"
+        ))
+
+    def bulk_insert(self, model, objs):
+        """Insert `objs` in batches, bypassing model signals and custom bulk_create hooks; returns the new pks"""
+        return [obj.pk for obj in self.iter_insert(model, objs)]
+
+    def iter_insert(self, model, objs):
+        """Like bulk_insert(), yielding the saved objects batch by batch instead of collecting them"""
+        batch = []
+        for obj in objs:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                yield from self._insert(model, batch)
+                batch = []
+        if batch:
+            yield from self._insert(model, batch)
+
+    def _insert(self, model, batch):
+        with transaction.atomic():
+            return models.QuerySet(model).bulk_create(batch)
+
+    def create_users(self, options):
+        prefix = options['prefix']
+        # Hashing is deliberately slow, so every generated user shares one hash
+        password = make_password(options['password'])
+        now = timezone.now()
+        groups = {name: Group.objects.get_or_create(name=name)[0] for name in ('Admin', 'Organizer', 'Participant')}
+        counts = {'Admin': options['admins'], 'Organizer': options['organizers'], 'Participant': options['participants']}
+
+        users = {}
+        for role, count in counts.items():
+            def generate(role=role, count=count):
+                for i in range(count):
+                    first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+                    username = f'{prefix}_{role.lower()}_{i}'
+                    yield User(
+                        username=username, email=f'{username}@example.com', password=password,
+                        first_name=first, last_name=last, is_active=True, email_verified=True,
+                        is_staff=role == 'Admin',
+                        date_joined=now - datetime.timedelta(days=self.rng.randrange(1, 3 * options['days'] + 2)),
+                    )
+            users[role] = self.bulk_insert(User, generate())
+            self.bulk_insert(User.groups.through, (
+                User.groups.through(customuser_id=user_id, group_id=groups[role].pk) for user_id in users[role]
+            ))
+
+        all_ids = [user_id for ids in users.values() for user_id in ids]
+        self.bulk_insert(UserProfile, (UserProfile(user_id=user_id) for user_id in all_ids))
+        self.bulk_insert(LegacyUserProfile, (LegacyUserProfile(user_id=user_id) for user_id in all_ids))
+        return users
+
+    def create_categories(self, prefix, count):
+        categories = []
+        for i in range(count):
+            topic = TOPICS[i % len(TOPICS)]
+            name = f'{topic} ({prefix} {i})'
+            categories.append(Category(name=name, description=f'Synthetic {topic.lower()} events'))
+        return self.bulk_insert(Category, categories)
+
+    def create_events(self, options, category_ids, organizer_ids):
+        if not category_ids or not organizer_ids:
+            return []
+        today = timezone.localdate()
+        days = options['days']
+
+        def generate():
+            for i in range(options['events']):
+                if self.rng.random() < options['past_ratio']:
+                    offset = -self.rng.randrange(1, days + 1)
+                else:
+                    offset = self.rng.randrange(0, days + 1)
+                date = today + datetime.timedelta(days=offset)
+                time = datetime.time(self.rng.randrange(8, 21), self.rng.choice((0, 15, 30, 45)))
+                starts_at = Event.compute_starts_at(date, time)
+                yield Event(
+                    name=f'{self.rng.choice(TOPICS)} Meetup #{i}',
+                    description='Synthetic event generated by seed_data.',
+                    date=date, time=time, starts_at=starts_at,
+                    ends_at=starts_at + datetime.timedelta(hours=self.rng.choice((1, 2, 3))),
+                    location=self.rng.choice(VENUES),
+                    category_id=self.rng.choice(category_ids),
+                    created_by_id=self.rng.choice(organizer_ids),
+                    created_at=starts_at - datetime.timedelta(days=self.rng.randrange(7, 90)),
+                )
+        return self.bulk_insert(Event, generate())
+
+    def rsvp_counts(self, total, events, capacity, skew):
+        """
+        Split `total` RSVPs over `events` events following a Zipf distribution.
+        No event can hold more than `capacity` RSVPs; what the most popular
+        events cannot take is spread over the rest in the same proportions.
+        """
+        ranks = list(range(1, events + 1))
+        self.rng.shuffle(ranks)
+        weights = [1 / rank ** skew for rank in ranks]
+        capped = set()
+        while True:
+            open_weight = sum(weight for i, weight in enumerate(weights) if i not in capped)
+            if not open_weight:
+                break
+            scale = (total - capacity * len(capped)) / open_weight
+            full = {i for i, weight in enumerate(weights) if i not in capped and weight * scale >= capacity}
+            if not full:
+                break
+            capped |= full
+        return [capacity if i in capped else round(weight * scale) for i, weight in enumerate(weights)]
+
+    def create_rsvps(self, options, event_ids, participant_ids):
+        if not event_ids or not participant_ids:
+            return 0
+        counts = self.rsvp_counts(options['rsvps'], len(event_ids), len(participant_ids), options['skew'])
+
+        def generate():
+            for event_id, count in zip(event_ids, counts):
+                for user_id in self.rng.sample(participant_ids, count):
+                    yield RSVP(event_id=event_id, user_id=user_id)
+        return sum(1 for _ in self.iter_insert(RSVP, generate()))
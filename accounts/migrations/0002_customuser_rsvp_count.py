@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='rsvp_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:13
+
+import accounts.models
+import accounts.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_customuser_rsvp_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='profile_picture',
+            field=models.ImageField(blank=True, default='users/defaults/default_profile.svg', help_text='Upload a profile picture', null=True, storage=accounts.storage.get_avatar_storage, upload_to=accounts.models.user_profile_picture_path),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:32
+
+import accounts.models
+import accounts.storage
+from django.db import migrations, models
+
+LEGACY_DEFAULT = 'users/defaults/default_profile.svg'
+DEFAULT = 'cas/3d/ec/3decbee4ad0fe4e21bb57dd367556f1efa0f109bd6474196b9609ed02e6bdd01.svg'
+
+
+def use_content_addressed_default(apps, schema_editor):
+    User = apps.get_model('accounts', 'CustomUser')
+    User.objects.filter(profile_picture=LEGACY_DEFAULT).update(profile_picture=DEFAULT)
+
+
+def use_legacy_default(apps, schema_editor):
+    User = apps.get_model('accounts', 'CustomUser')
+    User.objects.filter(profile_picture=DEFAULT).update(profile_picture=LEGACY_DEFAULT)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_avatar_storage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='profile_picture',
+            field=models.ImageField(blank=True, default=DEFAULT, help_text='Upload a profile picture', null=True, storage=accounts.storage.get_avatar_storage, upload_to=accounts.models.user_profile_picture_path),
+        ),
+        migrations.RunPython(use_content_addressed_default, use_legacy_default),
+    ]
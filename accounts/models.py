@@ -5,6 +5,9 @@ from django.dispatch import receiver
 from django.core.validators import RegexValidator
 import os
 
+from . import avatars, roles
+from .storage import get_avatar_storage
+
 def user_profile_picture_path(instance, filename):
     """Generate upload path for user profile pictures"""
     return f'users/profile_pictures/{instance.username}/{filename}'
@@ -13,7 +16,8 @@ class CustomUser(AbstractUser):
     """Custom User model with additional fields"""
     profile_picture = models.ImageField(
         upload_to=user_profile_picture_path,
-        default='users/defaults/default_profile.svg',
+        storage=get_avatar_storage,
+        default=avatars.DEFAULT_PROFILE_PICTURE,
         blank=True,
         null=True,
         help_text="Upload a profile picture"
@@ -39,6 +43,9 @@ class CustomUser(AbstractUser):
     email_verification_token = models.CharField(max_length=100, blank=True, null=True)
     email_verification_sent_at = models.DateTimeField(blank=True, null=True)
     
+    # Number of RSVPs held by the user, maintained by events.counters
+    rsvp_count = models.PositiveIntegerField(default=0, editable=False)
+    
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -54,21 +61,33 @@ class CustomUser(AbstractUser):
         """Return the full name for the user."""
         return f"{self.first_name} {self.last_name}".strip() or self.username
     
+    def save(self, *args, **kwargs):
+        new_upload = bool(self.profile_picture) and not self.profile_picture._committed
+        super().save(*args, **kwargs)
+        if new_upload:
+            avatars.make_thumbnail(self.profile_picture.name)
+    
+    def get_avatar_url(self):
+        """Small square thumbnail of the profile picture, falling back to the original"""
+        if not self.profile_picture:
+            return ''
+        thumbnail = avatars.thumbnail_name(self.profile_picture.name)
+        if thumbnail:
+            return self.profile_picture.storage.url(thumbnail)
+        return self.profile_picture.url
+    
     def get_user_role(self):
         """Get the primary role of the user"""
-        groups = self.groups.all()
-        if groups.exists():
-            return groups.first().name
-        return "No Role"
+        return roles.get_primary_role(self)
     
     def is_admin(self):
-        return self.groups.filter(name='Admin').exists()
+        return roles.has_role(self, 'Admin')
     
     def is_organizer(self):
-        return self.groups.filter(name='Organizer').exists()
+        return roles.has_role(self, 'Organizer')
     
     def is_participant(self):
-        return self.groups.filter(name='Participant').exists()
+        return roles.has_role(self, 'Participant')
 
 # For backward compatibility, keep UserProfile model but make it a proxy
 class UserProfile(models.Model):
@@ -0,0 +1,121 @@
+"""
+Role resolution for CustomUser.
+
+A user's group names are loaded at most once per user instance (and so
+once per request for request.user) and shared across requests through
+the cache. Entries are keyed by a global version that is bumped when a
+group is renamed or deleted; a single user's entry is dropped when their
+`groups` relation changes (see accounts.signals).
+
+Invalidations only reach other workers through a shared cache, so with a
+per-process backend (the default LocMemCache) names are never cached
+across requests: a revoked role would otherwise survive in every other
+worker until its entry expired.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+ROLE_CACHE_TIMEOUT = getattr(settings, 'ROLE_CACHE_TIMEOUT', 300)
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+SHARED_CACHE = settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+VERSION_KEY = 'accounts:roles:version'
+NO_ROLE = 'No Role'
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+async def _aversion():
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, 1, None)
+        version = await cache.aget(VERSION_KEY, 1)
+    return version
+
+
+def _cache_key(user_id):
+    return f'accounts:roles:{_version()}:{user_id}'
+
+
+def get_role_names(user):
+    """Group names of `user` in primary key order, the first being the primary role"""
+    if not getattr(user, 'is_authenticated', False) or user.pk is None:
+        return ()
+    names = getattr(user, '_role_names', None)
+    if names is None:
+        key = _cache_key(user.pk) if SHARED_CACHE else None
+        names = cache.get(key) if key else None
+        if names is None:
+            names = tuple(user.groups.order_by('pk').values_list('name', flat=True))
+            if key:
+                cache.set(key, names, ROLE_CACHE_TIMEOUT)
+        user._role_names = names
+    return names
+
+
+async def aget_role_names(user):
+    """get_role_names() for async code; afterwards the sync helpers answer from the instance"""
+    if not getattr(user, 'is_authenticated', False) or user.pk is None:
+        return ()
+    names = getattr(user, '_role_names', None)
+    if names is None:
+        key = f'accounts:roles:{await _aversion()}:{user.pk}' if SHARED_CACHE else None
+        names = await cache.aget(key) if key else None
+        if names is None:
+            names = tuple([name async for name in user.groups.order_by('pk').values_list('name', flat=True)])
+            if key:
+                await cache.aset(key, names, ROLE_CACHE_TIMEOUT)
+        user._role_names = names
+    return names
+
+
+async def aload_user(request):
+    """
+    Resolve request.user and its roles from async code, so templates and
+    other sync code can use them (and the session) without queries
+    """
+    user = await request.auser()
+    request.user = user
+    await aget_role_names(user)
+    return user
+
+
+def has_role(user, *roles):
+    names = get_role_names(user)
+    return any(role in names for role in roles)
+
+
+def get_primary_role(user):
+    names = get_role_names(user)
+    return names[0] if names else NO_ROLE
+
+
+def invalidate_user_roles(*user_ids):
+    version = _version()
+    cache.delete_many([f'accounts:roles:{version}:{user_id}' for user_id in user_ids])
+
+
+def invalidate_all_roles():
+    """Retire every cached entry at once, e.g. after a group is renamed"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 2, None)
+
+
+def primary_role_expression(user_field='pk'):
+    """Query expression equivalent to get_primary_role(), for annotating user querysets (or via `user_field`)"""
+    memberships = get_user_model().groups.through.objects.filter(customuser_id=OuterRef(user_field))
+    first_group = memberships.order_by('group_id').values('group__name')[:1]
+    return Coalesce(Subquery(first_group), Value(NO_ROLE))
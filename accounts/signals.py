@@ -1,9 +1,12 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.contrib.auth.models import Group
 from events.models import UserProfile
 
+from . import roles
+from .models import CustomUser
+
 @receiver(post_save, sender=User)
 def user_post_save(sender, instance, created, **kwargs):
     """Handle user creation and profile setup"""
@@ -19,3 +22,25 @@ def user_post_save(sender, instance, created, **kwargs):
    
     if not hasattr(instance, 'profile'):
         UserProfile.objects.get_or_create(user=instance)
+
+
+@receiver(m2m_changed, sender=CustomUser.groups.through)
+def invalidate_roles_on_group_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Drop cached role names when a user's groups change"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        instance.__dict__.pop('_role_names', None)
+        roles.invalidate_user_roles(instance.pk)
+    elif pk_set:
+        roles.invalidate_user_roles(*pk_set)
+    else:
+        # group.user_set.clear() does not say which users were affected
+        roles.invalidate_all_roles()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_roles_on_group_rename(sender, instance, created=False, **kwargs):
+    if not created:
+        roles.invalidate_all_roles()
@@ -0,0 +1,62 @@
+"""
+Content-addressed storage for user avatars.
+
+Files are stored under MEDIA_ROOT as cas/<aa>/<bb>/<sha256>.<ext>, so the
+name changes whenever the bytes do and identical uploads (including the
+shared default SVG, which ships at its hashed name) are written once.
+Because a name always refers to the same bytes, responses for cas/ can
+be marked immutable: by the web server in production, and by
+accounts.views.serve_content_addressed under DEBUG.
+"""
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage, default_storage
+
+CAS_PREFIX = 'cas'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+EXTENSION_ALIASES = {'.jpeg': '.jpg', '.jpe': '.jpg'}
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that ignores the requested name and stores by SHA-256"""
+
+    def hashed_name(self, digest, extension):
+        extension = extension.lower()
+        extension = EXTENSION_ALIASES.get(extension, extension)
+        return f'{CAS_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        hashed = self.hashed_name(digest.hexdigest(), os.path.splitext(name)[1])
+        if self.exists(hashed):
+            return hashed
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        return super()._save(hashed, content)
+
+    def save_derived(self, name, content):
+        """Store a file derived from a content-addressed one (e.g. a thumbnail) under `name` as given"""
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+    def ingest(self, name, source=None):
+        """Copy `name` from `source` (default storage) into this storage; returns the new name"""
+        source = source or default_storage
+        with source.open(name, 'rb') as content:
+            return self.save(name, content)
+
+
+def is_content_addressed(name):
+    return bool(name) and name.startswith(f'{CAS_PREFIX}/')
+
+
+avatar_storage = ContentAddressedStorage()
+
+
+def get_avatar_storage():
+    return avatar_storage
+
@@ -1,3 +1,202 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from PIL import Image
+
+from events.models import Category, Event, RSVP
+
+from . import avatars, roles
+from .storage import IMMUTABLE_CACHE_CONTROL, avatar_storage, is_content_addressed
+from .views import serve_content_addressed
+
+User = get_user_model()
+
+
+class RoleResolutionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin_group = Group.objects.create(name='Admin')
+        self.organizer_group = Group.objects.create(name='Organizer')
+        self.user = User.objects.create_user('grace', 'grace@example.com', 'pw')
+        self.user.groups.add(self.admin_group, self.organizer_group)
+
+    def fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_roles_are_resolved_once_per_instance(self):
+        user = self.fresh_user()
+        with self.assertNumQueries(1):
+            self.assertTrue(user.is_admin())
+            self.assertTrue(user.is_organizer())
+            self.assertFalse(user.is_participant())
+            self.assertEqual(user.get_user_role(), 'Admin')
+
+    def test_primary_role_expression_matches(self):
+        other = User.objects.create_user('heidi', 'heidi@example.com', 'pw')
+        other.groups.clear()
+        annotated = dict(
+            User.objects.filter(pk__in=[self.user.pk, other.pk])
+            .annotate(role=roles.primary_role_expression()).values_list('pk', 'role')
+        )
+        self.assertEqual(annotated, {self.user.pk: 'Admin', other.pk: roles.NO_ROLE})
+
+    def test_revoked_roles_apply_to_the_next_request(self):
+        self.assertTrue(self.fresh_user().is_admin())
+        # Another worker revoking the role: nothing in this process hears about it
+        with mock.patch.object(roles, 'invalidate_user_roles'):
+            self.user.groups.remove(self.admin_group)
+        user = self.fresh_user()
+        self.assertFalse(user.is_admin())
+        self.assertEqual(user.get_user_role(), 'Organizer')
+
+    @mock.patch.object(roles, 'SHARED_CACHE', True)
+    def test_shared_cache_serves_and_invalidates_role_names(self):
+        self.assertTrue(self.fresh_user().is_admin())
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(user.is_admin())
+
+        self.user.groups.remove(self.admin_group)
+        self.assertFalse(self.fresh_user().is_admin())
+
+        self.organizer_group.name = 'Organiser'
+        self.organizer_group.save()
+        self.assertEqual(self.fresh_user().get_user_role(), 'Organiser')
+
+
+class AvatarStorageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def png(self, color):
+        buffer = BytesIO()
+        Image.new('RGB', (300, 200), color).save(buffer, 'PNG')
+        return ContentFile(buffer.getvalue(), name='photo.png')
+
+    def stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(directory, name), self.media_root)
+            for directory, _, names in os.walk(self.media_root) for name in names
+        )
+
+    def test_default_avatar_writes_no_files(self):
+        user = User.objects.create_user('ivan', 'ivan@example.com', 'pw')
+        self.assertEqual(user.profile_picture.name, avatars.DEFAULT_PROFILE_PICTURE)
+        self.assertEqual(User().profile_picture.name, avatars.DEFAULT_PROFILE_PICTURE)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_identical_uploads_share_one_file_and_thumbnail(self):
+        first = User.objects.create_user('judy', 'judy@example.com', 'pw')
+        second = User.objects.create_user('mallory', 'mallory@example.com', 'pw')
+        for user in (first, second):
+            user.profile_picture = self.png('red')
+            user.save()
+
+        self.assertTrue(is_content_addressed(first.profile_picture.name))
+        self.assertEqual(first.profile_picture.name, second.profile_picture.name)
+        thumbnail = avatars.thumbnail_name(first.profile_picture.name)
+        self.assertEqual(self.stored_files(), sorted([first.profile_picture.name, thumbnail]))
+        self.assertEqual(first.get_avatar_url(), avatar_storage.url(thumbnail))
+        with avatar_storage.open(thumbnail) as stored:
+            self.assertEqual(Image.open(stored).size, (avatars.THUMBNAIL_SIZE, avatars.THUMBNAIL_SIZE))
+
+    def test_shipped_default_is_content_addressed(self):
+        self.assertTrue(is_content_addressed(avatars.DEFAULT_PROFILE_PICTURE))
+        with open(os.path.join(settings.BASE_DIR, 'media', avatars.DEFAULT_PROFILE_PICTURE), 'rb') as svg:
+            digest = hashlib.sha256(svg.read()).hexdigest()
+        self.assertEqual(avatar_storage.hashed_name(digest, '.svg'), avatars.DEFAULT_PROFILE_PICTURE)
+
+    def test_dedupe_avatars_moves_legacy_pictures(self):
+        legacy_name = 'users/profile_pictures/legacy/avatar.svg'
+        legacy = avatar_storage.path(legacy_name)
+        os.makedirs(os.path.dirname(legacy))
+        with open(legacy, 'w') as svg:
+            svg.write('<svg xmlns="http://www.w3.org/2000/svg"/>')
+        users = [User.objects.create_user(name, f'{name}@example.com', 'pw') for name in ('niaj', 'olivia')]
+        User.objects.filter(pk__in=[user.pk for user in users]).update(profile_picture=legacy_name)
+
+        call_command('dedupe_avatars', stdout=StringIO())
+        names = {user.profile_picture.name for user in User.objects.filter(pk__in=[user.pk for user in users])}
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertTrue(is_content_addressed(name))
+
+        request = RequestFactory().get(avatar_storage.url(name))
+        response = serve_content_addressed(request, name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        with self.assertRaises(Http404):
+            serve_content_addressed(request, legacy_name)
+
+
+class SeedDataTests(TestCase):
+    SIZES = {'admins': 1, 'organizers': 3, 'participants': 8, 'categories': 3, 'events': 12, 'rsvps': 60}
+
+    def seed(self, prefix, **options):
+        call_command('seed_data', prefix=prefix, stdout=StringIO(), **{**self.SIZES, **options})
+
+    def snapshot(self, prefix):
+        """Everything seeded under `prefix`, with the prefix and database ids taken out"""
+        def name(username):
+            return username[len(prefix) + 1:]
+        users = User.objects.filter(username__startswith=f'{prefix}_')
+        events = Event.objects.filter(created_by__in=users).select_related('category', 'created_by').order_by('pk')
+        return {
+            'users': sorted(
+                (name(user.username), user.first_name, user.last_name, user.groups.get().name) for user in users
+            ),
+            'events': [
+                (event.name, event.date, event.time, event.location, event.category.name.replace(prefix, ''),
+                 name(event.created_by.username))
+                for event in events
+            ],
+            'rsvps': sorted(
+                (event_name, name(username))
+                for event_name, username in RSVP.objects.filter(event__in=events).values_list('event__name', 'user__username')
+            ),
+        }
+
+    def test_same_seed_gives_the_same_data_under_any_prefix(self):
+        self.seed('one')
+        self.seed('two')
+        first, second = self.snapshot('one'), self.snapshot('two')
+        self.assertEqual(first, second)
+        self.assertEqual(len(first['events']), 12)
+        self.assertEqual(Category.objects.filter(name__contains='(one ').count(), 3)
+
+        self.seed('three', seed=7)
+        self.assertNotEqual(self.snapshot('three')['rsvps'], first['rsvps'])
+        with self.assertRaises(CommandError):
+            self.seed('one')
+
+    def test_rsvps_per_event_never_exceed_the_participants(self):
+        self.seed('full', rsvps=40, skew=2.0)
+        counts = list(
+            Event.objects.filter(category__name__contains='(full ').annotate(total=Count('rsvp_set'))
+            .values_list('total', 'rsvp_count')
+        )
+        self.assertTrue(all(total <= self.SIZES['participants'] for total, _ in counts))
+        # Popular events are capped and the rest spread over the others
+        totals = sorted(total for total, _ in counts)
+        self.assertEqual(totals[-1], self.SIZES['participants'])
+        self.assertLess(totals[0], self.SIZES['participants'])
+        self.assertAlmostEqual(sum(totals), 40, delta=len(totals) / 2)
+        self.assertEqual([total for total, _ in counts], [rsvp_count for _, rsvp_count in counts])
@@ -8,13 +8,16 @@ from django.contrib.auth.models import Group
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_decode
 from django.utils.encoding import force_str
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse
+from django.conf import settings
+from django.views.static import serve
 from django.utils import timezone
 from django.urls import reverse_lazy
 from django.views.generic import TemplateView, UpdateView
 from datetime import timedelta
 from .forms import UserSignUpForm, UserLoginForm, ProfileEditForm, CustomPasswordChangeForm
 from .utils import send_activation_email, send_activation_reminder_email
+from .storage import IMMUTABLE_CACHE_CONTROL, is_content_addressed
 
 User = get_user_model()
 
@@ -226,3 +229,11 @@ class CustomPasswordResetConfirmView(PasswordResetConfirmView):
     def form_valid(self, form):
         messages.success(self.request, 'Your password has been reset successfully!')
         return super().form_valid(form)
+
+def serve_content_addressed(request, path):
+    """Serve a cas/ media file with far-future caching under DEBUG; its name changes whenever its bytes do"""
+    if not is_content_addressed(path):
+        raise Http404
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
@@ -1,12 +1,84 @@
-from django.contrib import admin
-from .models import Event, Category, UserProfile, EventRegistration, RSVP
+import io
+
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import render
+from django.urls import path
+from .models import Event, Category, UserProfile, EventRegistration, RSVP, ArchivedEvent, ArchivedRSVP
+from .forms import EventImportUploadForm
+from . import archive, importer
+from .exports import export_response
+
+# Rejected rows listed on the import result page; the rest are only counted
+IMPORT_REJECTS_SHOWN = 100
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
-    list_display = ['name', 'date', 'time', 'location', 'category', 'created_by', 'created_at']
-    list_filter = ['category', 'date', 'created_at']
+    list_display = ['name', 'date', 'time', 'location', 'category', 'rsvp_count', 'created_by', 'created_at']
+    list_filter = ['category', 'date', 'created_at', 'sharded_counter']
     search_fields = ['name', 'description', 'location']
     date_hierarchy = 'date'
+    # created_by is nullable, so the automatic select_related() would skip it
+    list_select_related = ['category', 'created_by']
+    change_list_template = 'admin/events/event/change_list.html'
+
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='events_event_import'),
+        ]
+        return urls + super().get_urls()
+
+    def import_view(self, request):
+        """Upload a CSV/JSONL file and import it with events.importer"""
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = EventImportUploadForm(request.POST or None, request.FILES or None)
+        rejects = []
+        result = None
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+
+            def on_reject(line_number, errors):
+                if len(rejects) < IMPORT_REJECTS_SHOWN:
+                    rejects.append((line_number, importer.format_errors(errors)))
+
+            result = importer.EventImporter(
+                created_by=request.user,
+                batch_size=form.cleaned_data['batch_size'],
+                create_categories=form.cleaned_data['create_categories'],
+                dry_run=form.cleaned_data['dry_run'],
+                on_reject=on_reject,
+            )
+            upload.open('rb')
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            try:
+                for _ in result.run(importer.read_rows(stream, importer.guess_format(upload.name))):
+                    pass
+            except UnicodeDecodeError:
+                form.add_error('file', 'The file is not UTF-8 encoded text.')
+                result = None
+            finally:
+                stream.detach()
+            if result is not None:
+                verb = 'Validated' if form.cleaned_data['dry_run'] else 'Imported'
+                level = messages.WARNING if result.rejected else messages.SUCCESS
+                self.message_user(
+                    request,
+                    f'{verb} {result.created} events, {result.rejected} rejected, '
+                    f'{result.categories_created} new categories.',
+                    level,
+                )
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import events',
+            'form': form,
+            'result': result,
+            'rejects': rejects,
+            'rejects_truncated': result is not None and result.rejected > len(rejects),
+        }
+        return render(request, 'admin/events/event/import.html', context)
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -38,6 +110,54 @@ class RSVPAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'user__email', 'event__name', 'notes']
     date_hierarchy = 'rsvp_date'
     readonly_fields = ['rsvp_date', 'updated_at']
+    actions = ['export_csv', 'export_xlsx']
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('user', 'event', 'event__category')
+
+    @admin.action(description='Export selected attendees as CSV')
+    def export_csv(self, request, queryset):
+        return export_response(queryset, 'csv', 'attendees')
+
+    @admin.action(description='Export selected attendees as XLSX')
+    def export_xlsx(self, request, queryset):
+        return export_response(queryset, 'xlsx', 'attendees')
+
+class ReadOnlyAdminMixin:
+    """Archived rows are only moved by events.archive, never edited"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(ArchivedEvent)
+class ArchivedEventAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    list_display = ['name', 'date', 'time', 'location', 'category', 'rsvp_count', 'archived_at']
+    list_filter = ['category', 'archived_at']
+    search_fields = ['name', 'location']
+    date_hierarchy = 'date'
+    list_select_related = ['category']
+    actions = ['restore']
+
+    @admin.action(description='Restore selected events')
+    def restore(self, request, queryset):
+        restored = 0
+        for restored in archive.restore_events(queryset):
+            pass
+        self.message_user(request, f'Restored {restored} events.', messages.SUCCESS)
+
+@admin.register(ArchivedRSVP)
+class ArchivedRSVPAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    list_display = ['user', 'event', 'rsvp_date']
+    search_fields = ['user__username', 'event__name']
+    date_hierarchy = 'rsvp_date'
+    actions = ['export_csv']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'event', 'event__category')
+
+    @admin.action(description='Export selected attendees as CSV')
+    def export_csv(self, request, queryset):
+        return export_response(queryset, 'csv', 'archived-attendees')
@@ -0,0 +1,235 @@
+"""
+Read-only JSON API, version 1 (mounted at /api/v1/).
+
+List endpoints are keyset paginated: follow the `next` / `previous` URLs,
+which carry opaque ?cursor= tokens; a token that does not decode is a
+400 rather than the first page. `?fields=a,b` limits every item to
+those fields and the query to their columns. Rows are serialized straight
+from .values(); no model instances are built.
+
+Event endpoints reuse the HTML pages' conditional validators, so a
+matching If-None-Match is answered before any list query runs. The other
+endpoints send an ETag derived from the response body.
+"""
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, F
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, set_response_etag
+from django.views.decorators.http import require_safe
+
+from EMS.query_budget import query_budget
+
+from .conditional import conditional_page, event_validators, listing_validators
+from .models import Category, Event, RSVP, attendee_count_expression
+from .pagination import InvalidCursor, KeysetPaginator
+
+API_PAGE_SIZE = getattr(settings, 'API_PAGE_SIZE', 50)
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _media_url(name):
+    return default_storage.url(name) if name else None
+
+
+class Resource:
+    """
+    Maps API field names to a lookup (model field path) or an expression
+    and builds the matching .values() query.
+    """
+
+    def __init__(self, fields, keys, default=None, transforms=None):
+        self.fields = fields
+        self.keys = keys
+        self.default = default or list(fields)
+        self.transforms = transforms or {}
+
+    def requested(self, request):
+        raw = request.GET.get('fields')
+        if not raw:
+            return self.default
+        names = [name.strip() for name in raw.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(f"Unknown field(s): {', '.join(unknown)}")
+        return names
+
+    def _column(self, name):
+        lookup = self.fields[name]
+        return lookup if isinstance(lookup, str) else name
+
+    def values(self, queryset, names):
+        lookups, expressions = set(), {}
+        for name in names:
+            lookup = self.fields[name]
+            if isinstance(lookup, str):
+                lookups.add(lookup)
+            else:
+                expressions[name] = lookup
+        lookups.update(key.lstrip('-') for key in self.keys)
+        return queryset.values(*sorted(lookups), **expressions)
+
+    def serialize(self, row, names):
+        item = {}
+        for name in names:
+            value = row[self._column(name)]
+            if name in self.transforms:
+                value = self.transforms[name](value)
+            item[name] = value
+        return item
+
+
+EVENTS = Resource(
+    fields={
+        'id': 'pk',
+        'name': 'name',
+        'description': 'description',
+        'date': 'date',
+        'time': 'time',
+        'starts_at': 'starts_at',
+        'ends_at': 'ends_at',
+        'location': 'location',
+        'category': 'category_id',
+        'category_name': F('category__name'),
+        'image': 'image',
+        'attendee_count': attendee_count_expression(),
+        'updated_at': 'updated_at',
+    },
+    keys=('starts_at', 'pk'),
+    default=['id', 'name', 'date', 'time', 'starts_at', 'location', 'category', 'category_name', 'attendee_count'],
+    transforms={'image': _media_url},
+)
+
+CATEGORIES = Resource(
+    fields={
+        'id': 'pk',
+        'name': 'name',
+        'description': 'description',
+        'event_count': Count('events'),
+        'updated_at': 'updated_at',
+    },
+    keys=('name',),
+)
+
+ATTENDEES = Resource(
+    fields={
+        'id': 'pk',
+        'user': 'user_id',
+        'username': F('user__username'),
+        'rsvp_date': 'rsvp_date',
+    },
+    keys=('rsvp_date', 'pk'),
+    default=['id', 'username', 'rsvp_date'],
+)
+
+MY_RSVPS = Resource(
+    fields={
+        'id': 'pk',
+        'event': 'event_id',
+        'event_name': F('event__name'),
+        'event_starts_at': F('event__starts_at'),
+        'notes': 'notes',
+        'rsvp_date': 'rsvp_date',
+        'updated_at': 'updated_at',
+    },
+    keys=('-rsvp_date', '-pk'),
+)
+
+
+def _json(request, data, status=200, etag=True):
+    response = JsonResponse(data, status=status, encoder=DjangoJSONEncoder)
+    if etag and status == 200:
+        set_response_etag(response)
+        conditional = get_conditional_response(request, etag=response['ETag'])
+        if conditional is not None:
+            return conditional
+    return response
+
+
+def _page_url(request, cursor):
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{urlencode(params, doseq=True)}')
+
+
+def _list(request, resource, queryset, etag=True):
+    names = resource.requested(request)
+    paginator = KeysetPaginator(resource.values(queryset, names), resource.keys, API_PAGE_SIZE)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            paginator.decode_cursor(cursor)
+        except InvalidCursor:
+            raise ApiError('Invalid cursor.')
+    page = paginator.get_page(cursor)
+    return _json(request, {
+        'results': [resource.serialize(row, names) for row in page.object_list],
+        'next': _page_url(request, page.next_cursor) if page.has_next() else None,
+        'previous': _page_url(request, page.previous_cursor) if page.has_previous() else None,
+    }, etag=etag)
+
+
+def api_view(view_func):
+    """GET/HEAD only; ApiError becomes a JSON error response"""
+    @require_safe
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        try:
+            return view_func(request, *args, **kwargs)
+        except ApiError as error:
+            return _json(request, {'error': str(error)}, status=error.status, etag=False)
+    return _wrapped_view
+
+
+@api_view
+@conditional_page(listing_validators)
+@query_budget(8)
+def event_list(request):
+    """Events ordered by start; ?category=, ?start_date=, ?end_date= as on the events page"""
+    events = Event.objects.apply_filters(
+        request.GET.get('category'), request.GET.get('start_date'), request.GET.get('end_date')
+    )
+    return _list(request, EVENTS, events, etag=False)
+
+
+@api_view
+@conditional_page(event_validators)
+@query_budget(8)
+def event_detail(request, pk):
+    names = EVENTS.requested(request)
+    row = EVENTS.values(Event.objects.filter(pk=pk), names).first()
+    if row is None:
+        raise ApiError('Not found.', status=404)
+    return _json(request, EVENTS.serialize(row, names), etag=False)
+
+
+@api_view
+@query_budget(4)
+def event_attendees(request, pk):
+    if not Event.objects.filter(pk=pk).exists():
+        raise ApiError('Not found.', status=404)
+    return _list(request, ATTENDEES, RSVP.objects.filter(event_id=pk))
+
+
+@api_view
+@query_budget(4)
+def category_list(request):
+    return _list(request, CATEGORIES, Category.objects.all())
+
+
+@api_view
+@query_budget(5)
+def my_rsvps(request):
+    """The authenticated user's RSVPs, newest first"""
+    if not request.user.is_authenticated:
+        raise ApiError('Authentication credentials were not provided.', status=401)
+    return _list(request, MY_RSVPS, RSVP.objects.filter(user=request.user))
@@ -0,0 +1,12 @@
+from django.urls import path
+from . import api
+
+app_name = 'api'
+
+urlpatterns = [
+    path('events/', api.event_list, name='event_list'),
+    path('events/<int:pk>/', api.event_detail, name='event_detail'),
+    path('events/<int:pk>/attendees/', api.event_attendees, name='event_attendees'),
+    path('categories/', api.category_list, name='category_list'),
+    path('me/rsvps/', api.my_rsvps, name='my_rsvps'),
+]
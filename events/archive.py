@@ -0,0 +1,167 @@
+"""
+Archival of past events to cold tables.
+
+archive_events() moves events that started before a cutoff, with their
+RSVPs and registrations, into ArchivedEvent / ArchivedRSVP /
+ArchivedEventRegistration under their original primary keys, one batch
+of events per transaction; restore_events() moves them back. The hot
+tables and their indexes then only hold the active window, which every
+listing, dashboard and feed query scans.
+
+Rows are moved, not cancelled: the deletes bypass model signals, so no
+cancellation emails, live updates or counter decrements fire.
+Consequently archived RSVPs stay in CustomUser.rsvp_count and the
+participant total, an archived event keeps its final attendee count
+(counter shards folded in), and the dashboard adds the `archived_events`
+site counter to its total and past figures.
+
+Old URLs keep working: the event detail page redirects to the archived
+copy. Archived events are always past (the cutoff is at least a day
+back), so they never count towards today's or upcoming figures.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+from . import conditional, page_cache, search
+from .counters import ARCHIVED_EVENTS, bump_site_counter
+from .models import (
+    ArchivedEvent, ArchivedEventRegistration, ArchivedRSVP, Event, EventCounterShard, EventRegistration, RSVP,
+    attendee_count_expression,
+)
+
+ARCHIVE_AFTER_DAYS = getattr(settings, 'ARCHIVE_AFTER_DAYS', 365)
+ARCHIVE_BATCH_SIZE = getattr(settings, 'ARCHIVE_BATCH_SIZE', 500)
+
+EVENT_FIELDS = (
+    'id', 'name', 'description', 'date', 'time', 'location', 'category_id', 'image', 'image_width',
+    'image_height', 'image_variants', 'created_by_id', 'created_at', 'updated_at', 'starts_at', 'ends_at',
+    'sharded_counter',
+)
+RSVP_FIELDS = ('id', 'user_id', 'event_id', 'rsvp_date', 'updated_at', 'notes')
+REGISTRATION_FIELDS = ('id', 'user_id', 'event_id', 'registered_at', 'attended')
+
+
+def archive_cutoff(days=None, now=None):
+    """Start of the local day `days` (default ARCHIVE_AFTER_DAYS) days ago"""
+    days = ARCHIVE_AFTER_DAYS if days is None else days
+    if days < 1:
+        raise ValueError('Events can only be archived a day or more after they started')
+    day = timezone.localdate(now) - datetime.timedelta(days=days)
+    return Event.compute_starts_at(day, datetime.time.min)
+
+
+def archivable(before):
+    return Event.objects.filter(starts_at__lt=before)
+
+
+def _insert(model, rows, keep=()):
+    """
+    Insert `rows` (dicts of column values, primary keys included) into
+    `model`, skipping its custom bulk_create and signals. bulk_create
+    stamps auto_now/auto_now_add fields with the current time, so the
+    fields in `keep` are written back afterwards.
+    """
+    objs = models.QuerySet(model).bulk_create([model(**row) for row in rows])
+    if keep and objs:
+        for obj, row in zip(objs, rows):
+            for field in keep:
+                setattr(obj, field, row[field])
+        models.QuerySet(model).bulk_update(objs, keep, batch_size=ARCHIVE_BATCH_SIZE)
+    return len(objs)
+
+
+def _delete(queryset):
+    # A plain DELETE: the rows live on in the other set of tables
+    return queryset._raw_delete(queryset.db)
+
+
+def _pages_changed(event_ids):
+    tags = ['events', *(f'event:{pk}' for pk in event_ids)]
+
+    def changed():
+        page_cache.invalidate(*tags)
+        conditional.touch(*tags)
+    transaction.on_commit(changed)
+
+
+def _archive_batch(event_ids):
+    events = list(
+        Event.objects.filter(pk__in=event_ids)
+        .annotate(final_count=attendee_count_expression())
+        .values(*EVENT_FIELDS, 'final_count')
+    )
+    for row in events:
+        row['rsvp_count'] = row.pop('final_count')
+    _insert(ArchivedEvent, events)
+    _insert(ArchivedRSVP, list(RSVP.objects.filter(event_id__in=event_ids).values(*RSVP_FIELDS)))
+    _insert(
+        ArchivedEventRegistration,
+        list(EventRegistration.objects.filter(event_id__in=event_ids).values(*REGISTRATION_FIELDS)),
+    )
+
+    _delete(RSVP.objects.filter(event_id__in=event_ids))
+    _delete(EventRegistration.objects.filter(event_id__in=event_ids))
+    _delete(EventCounterShard.objects.filter(event_id__in=event_ids))
+    _delete(Event.objects.filter(pk__in=event_ids))
+
+    search.remove_events(event_ids)
+    bump_site_counter(ARCHIVED_EVENTS, len(event_ids))
+    _pages_changed(event_ids)
+
+
+def archive_events(before, batch_size=ARCHIVE_BATCH_SIZE):
+    """Archive the events starting before `before`, oldest first; yields the number archived so far"""
+    if before > archive_cutoff(1):
+        raise ValueError('Events can only be archived a day or more after they started')
+    archived = 0
+    while True:
+        with transaction.atomic():
+            # Locking the events holds off RSVPs and edits to them until they are gone
+            event_ids = list(
+                archivable(before).select_for_update().order_by('starts_at', 'pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not event_ids:
+                break
+            _archive_batch(event_ids)
+        archived += len(event_ids)
+        yield archived
+
+
+def _restore_batch(event_ids):
+    events = list(ArchivedEvent.objects.filter(pk__in=event_ids).values(*EVENT_FIELDS, 'rsvp_count'))
+    # updated_at is left to auto_now, so feeds and cached pages see the event change
+    _insert(Event, events)
+    _insert(RSVP, list(ArchivedRSVP.objects.filter(event_id__in=event_ids).values(*RSVP_FIELDS)), keep=['rsvp_date'])
+    _insert(
+        EventRegistration,
+        list(ArchivedEventRegistration.objects.filter(event_id__in=event_ids).values(*REGISTRATION_FIELDS)),
+        keep=['registered_at'],
+    )
+
+    _delete(ArchivedRSVP.objects.filter(event_id__in=event_ids))
+    _delete(ArchivedEventRegistration.objects.filter(event_id__in=event_ids))
+    _delete(ArchivedEvent.objects.filter(pk__in=event_ids))
+
+    search.index_events(event_ids)
+    bump_site_counter(ARCHIVED_EVENTS, -len(event_ids))
+    _pages_changed(event_ids)
+
+
+def restore_events(queryset, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move the archived events of `queryset` back to the hot tables; yields the number restored so far"""
+    pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+    restored = 0
+    for start in range(0, len(pks), batch_size):
+        with transaction.atomic():
+            event_ids = list(
+                ArchivedEvent.objects.filter(pk__in=pks[start:start + batch_size])
+                .select_for_update().values_list('pk', flat=True)
+            )
+            if event_ids:
+                _restore_batch(event_ids)
+        restored += len(event_ids)
+        yield restored
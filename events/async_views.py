@@ -0,0 +1,186 @@
+"""
+Native async versions of the read-only event pages, used when
+settings.ASYNC_VIEWS is on (the default under EMS.asgi), and the live
+RSVP stream, which needs ASGI either way.
+
+They take the same decorators, context and templates as their sync
+counterparts in events.views. Everything a template touches is fetched
+with the async ORM before render() is called: request.user and its roles
+are resolved through request.auser() (which also loads the session),
+querysets are evaluated with `async for`, and the attendee count is
+annotated, so rendering never reaches the database. Search still runs
+through sync_to_async, as it issues raw SQL on the FTS backends.
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.html import format_html
+
+from EMS.query_budget import query_budget
+from accounts.decorators import admin_or_organizer_required
+from accounts.roles import aload_user
+
+from .conditional import category_validators, conditional_page, event_validators, listing_validators
+from . import live
+from .counters import aget_total_participants
+from .models import ArchivedEvent, Category, Event, RSVP
+from .page_cache import cache_anonymous_page, category_tags, event_tags, listing_tags
+from .pagination import KeysetPaginator
+from .search import search_events
+from .views import (
+    ATTENDEE_PREVIEW_SIZE, EVENT_ORDERING, EVENTS_PER_PAGE, STATS_CHUNK_SIZE, STATS_LISTS,
+    _stats_more, _stats_paginator,
+)
+
+
+def _listing_queryset():
+    return (
+        Event.objects.select_related('category')
+        .with_attendee_preview(ATTENDEE_PREVIEW_SIZE)
+        .with_attendee_count()
+    )
+
+
+@cache_anonymous_page(listing_tags)
+@conditional_page(listing_validators)
+@query_budget(10)
+async def home(request):
+    await aload_user(request)
+    query = request.GET.get('search', '')
+    events = _listing_queryset()
+    if query:
+        return render(request, 'events/home.html', {
+            'events': await sync_to_async(search_events)(query, queryset=events),
+            'search_query': query
+        })
+    page = await KeysetPaginator(events, EVENT_ORDERING, EVENTS_PER_PAGE).aget_page(request.GET.get('cursor'))
+    return render(request, 'events/home.html', {
+        'events': page.object_list,
+        'page_obj': page,
+        'search_query': query
+    })
+
+
+@cache_anonymous_page(listing_tags)
+@conditional_page(listing_validators)
+@query_budget(12)
+async def event_list(request):
+    """EventListView"""
+    await aload_user(request)
+    category_id = request.GET.get('category')
+    start_date = request.GET.get('start_date')
+    end_date = request.GET.get('end_date')
+    query = request.GET.get('search', '')
+    events = _listing_queryset().apply_filters(category=category_id, start_date=start_date, end_date=end_date)
+
+    page = None
+    if query:
+        object_list = await sync_to_async(search_events)(query, queryset=events)
+    else:
+        page = await KeysetPaginator(events, EVENT_ORDERING, EVENTS_PER_PAGE).aget_page(request.GET.get('cursor'))
+        object_list = page.object_list
+
+    context = {
+        'events': object_list,
+        'object_list': object_list,
+        'page_obj': page,
+        'is_paginated': bool(page and page.has_other_pages()),
+        'total_participants': await aget_total_participants(),
+        'categories': [category async for category in Category.objects.all()],
+        'selected_category': category_id,
+        'start_date': start_date,
+        'end_date': end_date,
+        'search_query': query,
+    }
+    return render(request, 'events/event_list.html', context)
+
+
+@cache_anonymous_page(event_tags)
+@conditional_page(event_validators)
+@query_budget(10)
+async def event_detail(request, pk):
+    """EventDetailView"""
+    user = await aload_user(request)
+    try:
+        event = await aget_object_or_404(Event.objects.select_related('category').with_attendee_count(), pk=pk)
+    except Http404:
+        if await ArchivedEvent.objects.filter(pk=pk).aexists():
+            return redirect('archived_event_detail', pk=pk)
+        raise
+
+    user_rsvp = None
+    if user.is_authenticated:
+        user_rsvp = await RSVP.objects.filter(user=user, event=event).afirst()
+
+    return render(request, 'events/event_detail.html', {
+        'object': event,
+        'event': event,
+        'user_rsvp': user_rsvp,
+        'rsvp_stats': {
+            'total_rsvps': event.get_rsvp_count(),
+        },
+    })
+
+
+@cache_anonymous_page(category_tags)
+@conditional_page(category_validators)
+@query_budget(6)
+async def category_list(request):
+    """CategoryListView"""
+    await aload_user(request)
+    categories = [category async for category in Category.objects.all()]
+    return render(request, 'events/category_list.html', {
+        'categories': categories,
+        'object_list': categories,
+        'is_paginated': False,
+    })
+
+
+async def _stream_stats(request, kind, rows, first_page):
+    """events.views._stream_stats, reading the rows with the async ORM"""
+    rows_template = get_template('events/_stats_rows.html')
+    if first_page:
+        yield format_html('<h3 class="text-xl font-semibold mb-2">{}</h3><ul id="stats-rows">', STATS_LISTS[kind][0])
+
+    chunk = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) == STATS_CHUNK_SIZE:
+            yield rows_template.render({'kind': kind, 'rows': chunk}, request)
+            chunk = []
+    if chunk:
+        yield rows_template.render({'kind': kind, 'rows': chunk}, request)
+
+    yield _stats_more(request, kind, rows, first_page)
+    if first_page:
+        yield '</ul>'
+
+
+@admin_or_organizer_required
+@query_budget(6)
+async def dashboard_stats(request, kind):
+    """Drill-down list for a dashboard figure, one keyset page per request"""
+    if kind not in STATS_LISTS:
+        raise Http404
+    cursor = request.GET.get('cursor')
+    rows = _stats_paginator(kind, timezone.now()).stream_page(cursor, chunk_size=STATS_CHUNK_SIZE)
+    return StreamingHttpResponse(_stream_stats(request, kind, rows, first_page=not cursor))
+
+
+# Only the setup is checked: the stream stays open as long as the page does
+@query_budget(2, record_stream=False)
+async def event_live(request, pk):
+    """Server-sent events with the event's attendee count and attendee changes"""
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the stream would hold a worker for good; 204 tells EventSource not to reconnect
+        return HttpResponse(status=204)
+    count = await Event.objects.filter(pk=pk).with_attendee_count().values_list('attendee_count', flat=True).afirst()
+    if count is None:
+        raise Http404
+    response = StreamingHttpResponse(live.stream(pk, count), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
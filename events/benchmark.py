@@ -0,0 +1,213 @@
+"""
+In-process load benchmark for the core pages.
+
+Each scenario is driven by `concurrency` worker threads issuing requests
+through django.test.Client, so the whole Django stack (middleware,
+sessions, ORM, templates) is measured without a network or a separate
+server. Every worker keeps one logged-in client per user it plays, and
+the query count of each request comes from EMS.query_budget's recorder.
+
+Run it against a dedicated database: rsvp_create and the logins write to
+it. Results are plain dicts so the command can store them as JSON and
+compare runs across commits.
+"""
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import connections
+from django.test import Client
+from django.utils import timezone
+
+from .models import Event, RSVP
+
+User = get_user_model()
+
+
+class Scenario:
+    def __init__(self, name, role, request):
+        self.name = name
+        self.role = role
+        self.request = request
+
+
+def _get(path):
+    return lambda client, target: client.get(path(target) if callable(path) else path)
+
+
+SCENARIOS = [
+    Scenario('home', None, _get('/')),
+    Scenario('home_participant', 'participant', _get('/')),
+    Scenario('event_list', None, _get('/events/')),
+    Scenario('event_detail', 'participant', _get(lambda target: f'/events/{target.event()}/')),
+    Scenario('organizer_dashboard', 'organizer', _get('/dashboard/')),
+    Scenario('participant_dashboard', 'participant', _get('/participant-dashboard/')),
+    Scenario('rsvp_create', 'participant', lambda client, target: client.post(
+        f'/events/{target.upcoming_event()}/rsvp/', {'notes': 'benchmark'}
+    )),
+    Scenario('login_view', 'login', lambda client, target: client.post(
+        '/accounts/login/', {'username': target.login_username(), 'password': target.password}
+    )),
+]
+SCENARIO_NAMES = [scenario.name for scenario in SCENARIOS]
+
+
+class Targets:
+    """Users and events the scenarios pick from, sampled once up front"""
+
+    def __init__(self, prefix, password, seed, pool_size=50):
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.password = password
+        self.users = {
+            'participant': list(User.objects.filter(
+                username__startswith=f'{prefix}_participant_').order_by('pk').values_list('pk', flat=True)[:pool_size]),
+            'organizer': list(User.objects.filter(
+                username__startswith=f'{prefix}_organizer_').order_by('pk').values_list('pk', flat=True)[:pool_size]),
+        }
+        self.usernames = list(User.objects.filter(pk__in=self.users['participant']).values_list('username', flat=True))
+        events = Event.objects.order_by('pk').values_list('pk', flat=True)
+        # Popular events first, so detail pages include the heavy ones
+        self.events = list(Event.objects.order_by('-rsvp_count', 'pk').values_list('pk', flat=True)[:pool_size * 4])
+        self.upcoming = list(events.filter(starts_at__gt=timezone.now())[:pool_size * 4])
+
+    def _choice(self, values):
+        with self.lock:
+            return self.rng.choice(values)
+
+    def user(self, role):
+        return self._choice(self.users[role])
+
+    def event(self):
+        return self._choice(self.events)
+
+    def upcoming_event(self):
+        return self._choice(self.upcoming)
+
+    def login_username(self):
+        return self._choice(self.usernames)
+
+
+def dataset_size():
+    return {
+        'users': User.objects.count(),
+        'events': Event.objects.count(),
+        'rsvps': RSVP.objects.count(),
+    }
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _percentile(values, percent):
+    if len(values) < 2:
+        return values[0] if values else None
+    return statistics.quantiles(values, n=100, method='inclusive')[percent - 1]
+
+
+def _consume(response):
+    if response.streaming:
+        b''.join(response.streaming_content)
+
+
+def _worker(scenario, targets, count, warmup, barrier, samples, errors, spans):
+    clients = {}
+    users = User.objects.in_bulk(targets.users.get(scenario.role, []))
+
+    def issue():
+        if scenario.role in targets.users:
+            user_id = targets.user(scenario.role)
+            client = clients.get(user_id)
+            if client is None:
+                client = clients[user_id] = Client()
+                client.force_login(users[user_id])
+        else:
+            client = clients.setdefault(None, Client())
+            # Anonymous scenarios and logins always start without a session
+            client.cookies.clear()
+        response = scenario.request(client, targets)
+        _consume(response)
+        return response
+
+    warmed_up = False
+    try:
+        for _ in range(warmup):
+            try:
+                issue()
+            except Exception:
+                pass
+        barrier.wait()
+        warmed_up = True
+        began = time.perf_counter()
+        for _ in range(count):
+            start = time.perf_counter()
+            try:
+                response = issue()
+            except Exception as error:
+                errors.append(f'{type(error).__name__}: {error}')
+                continue
+            elapsed = time.perf_counter() - start
+            if response.status_code >= 400:
+                errors.append(f'HTTP {response.status_code}')
+                continue
+            recorder = getattr(response.wsgi_request, 'query_recorder', None)
+            samples.append((elapsed, recorder.count if recorder else None))
+        spans.append((began, time.perf_counter()))
+    finally:
+        if not warmed_up:
+            # Don't leave the other workers waiting for this one
+            barrier.abort()
+        connections.close_all()
+
+
+def run_scenario(scenario, targets, requests=200, concurrency=4, warmup=10):
+    """Drive one scenario and return its latency/throughput/query figures"""
+    samples, errors, spans = [], [], []
+    per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+    # Everyone finishes warming up before the measured requests start
+    barrier = threading.Barrier(concurrency)
+    threads = [
+        threading.Thread(
+            target=_worker, args=(scenario, targets, count, warmup // concurrency, barrier, samples, errors, spans)
+        )
+        for count in per_worker
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = max(end for _, end in spans) - min(start for start, _ in spans) if spans else 0
+    if hasattr(mail, 'outbox'):
+        mail.outbox.clear()
+
+    latencies = sorted(elapsed * 1000 for elapsed, _ in samples)
+    queries = [count for _, count in samples if count is not None]
+    return {
+        'requests': len(samples),
+        'errors': len(errors),
+        'error_samples': sorted(set(errors))[:5],
+        'throughput_rps': round(len(samples) / wall, 1) if wall else None,
+        'latency_ms': {
+            'p50': _round(_percentile(latencies, 50)),
+            'p95': _round(_percentile(latencies, 95)),
+            'p99': _round(_percentile(latencies, 99)),
+            'mean': _round(statistics.fmean(latencies)) if latencies else None,
+            'max': _round(latencies[-1]) if latencies else None,
+        },
+        'queries_per_request': {
+            'mean': _round(statistics.fmean(queries)) if queries else None,
+            'max': max(queries) if queries else None,
+        },
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
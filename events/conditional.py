@@ -0,0 +1,163 @@
+"""
+Conditional GET for the public event pages.
+
+Each page has a validators function returning the data its template
+depends on, plus the latest timestamp among them. The listings read
+versions that touch() moves forward whenever their page_cache tags are
+invalidated, i.e. on every Event, RSVP, Category and attendee name
+change. Like the page_cache tag versions they live in the cache, so a
+save adds no write to a shared row and a validator costs a cache read
+however many rows exist; the value is the change time in microseconds
+and doubles as Last-Modified. A version lost to eviction or a cache
+flush restarts at the current time, which changes the ETag rather than
+repeating an old one. The event page aggregates its own RSVPs
+through their index. conditional_page()
+wires such a function into django.views.decorators.http.condition, so a
+request whose validator still matches is answered 304 before the view
+queries or renders anything.
+
+The ETag also covers the query string, since the same validators answer
+for every page, filter and field set of a view (?cursor=, ?fields=, ...),
+and who is asking (user, profile timestamp, roles) since the navbar and
+the edit/delete links are personalized. Last-Modified is
+only sent to anonymous clients; clients holding an ETag send
+If-None-Match, which takes precedence. Responses carrying pending flash messages are never
+conditional.
+
+condition() calls the validator functions synchronously, so for async
+views the user and the validators are loaded before it runs.
+"""
+import datetime
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from accounts.roles import aload_user, get_role_names
+
+from .context_processors import from_dashboard
+from .models import Event, RSVP
+
+# page_cache tags the listing validators keep a version for
+VERSIONED_TAGS = ('events', 'categories')
+
+
+def _latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def _user_component(request):
+    user = request.user
+    if not user.is_authenticated:
+        return ['anonymous']
+    return [
+        user.pk, user.updated_at, ','.join(get_role_names(user)),
+        user.profile_picture.name if user.profile_picture else '',
+        from_dashboard(request),
+    ]
+
+
+def _now():
+    return int(time.time() * 1_000_000)
+
+
+def _version_key(tag):
+    return f'conditional:version:{tag}'
+
+
+def touch(*tags):
+    """Move the versions of `tags` forward; call it wherever page_cache.invalidate() is"""
+    now = _now()
+    keys = [_version_key(tag) for tag in VERSIONED_TAGS if tag in tags]
+    if not keys:
+        return
+    current = cache.get_many(keys)
+    # max() keeps versions increasing when two processes' clocks disagree
+    cache.set_many({key: max(current.get(key, 0) + 1, now) for key in keys}, None)
+
+
+def _version(tag):
+    """(version, change time) of a page_cache tag"""
+    key = _version_key(tag)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, _now(), None)
+        # A cache that keeps nothing gives every request a new version: no 304s, but never a wrong one
+        value = cache.get(key) or _now()
+    return value, datetime.datetime.fromtimestamp(value / 1_000_000, datetime.timezone.utc)
+
+
+def listing_validators(request, *args, **kwargs):
+    """home and the event list: every event, its category and RSVPs"""
+    version, changed = _version('events')
+    # Events move to "passed" without a write; the latest start so far marks when
+    last_started = (
+        Event.objects.filter(starts_at__lte=timezone.now()).order_by('-starts_at')
+        .values_list('starts_at', flat=True).first()
+    )
+    return [version, last_started], changed
+
+
+def event_validators(request, pk, *args, **kwargs):
+    """event detail: the event, its category and its RSVPs"""
+    event = Event.objects.filter(pk=pk).values('updated_at', 'starts_at', 'category__updated_at').first()
+    if event is None:
+        return None
+    rsvps = RSVP.objects.filter(event_id=pk).aggregate(latest=Max('updated_at'), total=Count('pk'))
+    components = [
+        event['updated_at'], event['category__updated_at'], event['starts_at'] <= timezone.now(),
+        rsvps['latest'], rsvps['total'],
+    ]
+    return components, _latest(event['updated_at'], event['category__updated_at'], rsvps['latest'])
+
+
+def category_validators(request, *args, **kwargs):
+    version, changed = _version('categories')
+    return [version], changed
+
+
+def conditional_page(validators):
+    """condition() driven by `validators(request, *args, **kwargs) -> (components, last_modified)`"""
+    def resolve(request, *args, **kwargs):
+        if not hasattr(request, '_page_validators'):
+            result = None
+            if not len(messages.get_messages(request)):
+                result = validators(request, *args, **kwargs)
+            request._page_validators = result
+        return request._page_validators
+
+    def etag(request, *args, **kwargs):
+        result = resolve(request, *args, **kwargs)
+        if result is None:
+            return None
+        parts = [str(part) for part in [*result[0], request.GET.urlencode(), *_user_component(request)]]
+        return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        result = resolve(request, *args, **kwargs)
+        if result is None or request.user.is_authenticated:
+            return None
+        return result[1]
+
+    conditional = condition(etag_func=etag, last_modified_func=last_modified)
+
+    def decorator(view_func):
+        view = conditional(view_func)
+        if not iscoroutinefunction(view_func):
+            return view
+
+        @wraps(view_func)
+        async def _async_view(request, *args, **kwargs):
+            await aload_user(request)
+            await sync_to_async(resolve)(request, *args, **kwargs)
+            return await view(request, *args, **kwargs)
+        return _async_view
+    return decorator
@@ -0,0 +1,30 @@
+"""
+Navigation context derived from the request alone.
+
+Pages reached from the organizer dashboard are shown as part of it. That
+used to be a `from_dashboard` session flag, written on every dashboard
+load and popped on every home page view; it now comes from the URL
+(?from=dashboard, which the dashboard's own links carry) or from a
+same-site Referer pointing at the dashboard, so browsing writes nothing.
+"""
+from urllib.parse import urlsplit
+
+from django.urls import reverse
+
+DASHBOARD = 'dashboard'
+
+
+def from_dashboard(request):
+    """Whether the page was opened from (or is) the organizer dashboard"""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return False
+    dashboard = reverse('organizer_dashboard')
+    if request.path.startswith(dashboard) or request.GET.get('from') == DASHBOARD:
+        return True
+    referer = urlsplit(request.META.get('HTTP_REFERER', ''))
+    return referer.netloc == request.get_host() and referer.path.startswith(dashboard)
+
+
+def navigation(request):
+    return {'active_page': DASHBOARD} if from_dashboard(request) else {}
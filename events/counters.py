@@ -0,0 +1,188 @@
+"""
+Denormalized RSVP counters.
+
+Event.rsvp_count, CustomUser.rsvp_count and the global participant total
+are adjusted in the same transaction as the RSVP insert/delete that
+changes them; the user figures include archived RSVPs (events.archive). Events flagged with `sharded_counter` spread their updates
+over EventCounterShard rows so concurrent RSVPs don't all lock the Event
+row; rebuild_counters() folds those shards back into Event.rsvp_count.
+"""
+import random
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import ArchivedEvent, ArchivedRSVP, Event, EventCounterShard, RSVP, SiteCounter
+
+User = get_user_model()
+
+PARTICIPANTS = 'participants'
+ARCHIVED_EVENTS = 'archived_events'
+SHARD_COUNT = getattr(settings, 'RSVP_COUNTER_SHARDS', 8)
+
+
+def get_site_counter(name):
+    value = SiteCounter.objects.filter(name=name).values_list('value', flat=True).first()
+    return value or 0
+
+
+def get_total_participants():
+    """Number of distinct users holding at least one RSVP"""
+    return get_site_counter(PARTICIPANTS)
+
+
+async def aget_total_participants():
+    value = await SiteCounter.objects.filter(name=PARTICIPANTS).values_list('value', flat=True).afirst()
+    return value or 0
+
+
+def bump_site_counter(name, delta):
+    if not delta:
+        return
+    if not SiteCounter.objects.filter(name=name).update(value=F('value') + delta):
+        SiteCounter.objects.get_or_create(name=name)
+        SiteCounter.objects.filter(name=name).update(value=F('value') + delta)
+
+
+def bump_event_count(event_id, delta, sharded=False):
+    if not delta:
+        return
+    if not sharded:
+        Event.objects.filter(pk=event_id).update(rsvp_count=F('rsvp_count') + delta)
+        return
+    shard = random.randrange(SHARD_COUNT)
+    shards = EventCounterShard.objects.filter(event_id=event_id, shard=shard)
+    if not shards.update(count=F('count') + delta):
+        EventCounterShard.objects.get_or_create(event_id=event_id, shard=shard)
+        shards.update(count=F('count') + delta)
+
+
+def bump_user_count(user_id, delta):
+    """Adjust a user's RSVP count and return the change in participant total (-1, 0 or 1)"""
+    if not delta:
+        return 0
+    current = (
+        User.objects.select_for_update()
+        .filter(pk=user_id)
+        .values_list('rsvp_count', flat=True)
+        .first()
+    )
+    if current is None:
+        return 0
+    new = max(current + delta, 0)
+    User.objects.filter(pk=user_id).update(rsvp_count=new)
+    return int(new > 0) - int(current > 0)
+
+
+def record_rsvp_created(rsvp):
+    with transaction.atomic():
+        bump_event_count(rsvp.event_id, 1, sharded=rsvp.event.sharded_counter)
+        bump_site_counter(PARTICIPANTS, bump_user_count(rsvp.user_id, 1))
+
+
+def _deleting_event(origin):
+    if isinstance(origin, Event):
+        return True
+    return getattr(origin, 'model', None) is Event
+
+
+def record_rsvp_deleted(rsvp, origin=None):
+    """
+    `origin` is the post_delete origin; when the RSVP goes away because its
+    event is being deleted there is no event counter left to maintain.
+    """
+    with transaction.atomic():
+        if not _deleting_event(origin):
+            sharded = Event.objects.filter(pk=rsvp.event_id, sharded_counter=True).exists()
+            bump_event_count(rsvp.event_id, -1, sharded=sharded)
+        bump_site_counter(PARTICIPANTS, bump_user_count(rsvp.user_id, -1))
+
+
+def record_archived_rsvp_deleted(rsvp):
+    """An archived RSVP deleted for good (not restored), e.g. with its user"""
+    with transaction.atomic():
+        bump_site_counter(PARTICIPANTS, bump_user_count(rsvp.user_id, -1))
+
+
+def record_bulk_rsvps(rsvps, exact=True):
+    """
+    Apply counter deltas for RSVPs inserted by bulk_create. When conflicts
+    may have been skipped we cannot tell which rows were inserted, so the
+    affected events and users are recounted instead.
+    """
+    if not rsvps:
+        return
+    event_deltas = Counter(rsvp.event_id for rsvp in rsvps)
+    user_deltas = Counter(rsvp.user_id for rsvp in rsvps)
+    if not exact:
+        rebuild_counters(event_ids=list(event_deltas), user_ids=list(user_deltas))
+        return
+    with transaction.atomic():
+        sharded = set(
+            Event.objects.filter(pk__in=list(event_deltas), sharded_counter=True).values_list('pk', flat=True)
+        )
+        for event_id, delta in event_deltas.items():
+            bump_event_count(event_id, delta, sharded=event_id in sharded)
+        participants = 0
+        for user_id in sorted(user_deltas):
+            participants += bump_user_count(user_id, user_deltas[user_id])
+        bump_site_counter(PARTICIPANTS, participants)
+
+
+def count_participants():
+    """Distinct users with an RSVP, archived ones included, counted from the tables"""
+    return RSVP.objects.order_by().values('user').union(ArchivedRSVP.objects.order_by().values('user')).count()
+
+
+def _count_subquery(field, model=RSVP):
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def _in_batches(ids, batch_size):
+    for start in range(0, len(ids), batch_size):
+        yield ids[start:start + batch_size]
+
+
+def rebuild_counters(event_ids=None, user_ids=None, batch_size=1000):
+    """
+    Recompute counters from the RSVP tables. With no arguments every event,
+    user, archived event and site counter is rebuilt; sharded counts are
+    folded back into Event.rsvp_count.
+    """
+    full = event_ids is None and user_ids is None
+    if event_ids is None:
+        event_ids = list(Event.objects.order_by('pk').values_list('pk', flat=True))
+    if user_ids is None:
+        user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+
+    for batch in _in_batches(list(event_ids), batch_size):
+        with transaction.atomic():
+            EventCounterShard.objects.filter(event_id__in=batch).delete()
+            Event.objects.filter(pk__in=batch).update(rsvp_count=_count_subquery('event'))
+
+    for batch in _in_batches(list(user_ids), batch_size):
+        with transaction.atomic():
+            User.objects.filter(pk__in=batch).update(
+                rsvp_count=_count_subquery('user') + _count_subquery('user', ArchivedRSVP)
+            )
+
+    if full:
+        archived_ids = list(ArchivedEvent.objects.order_by('pk').values_list('pk', flat=True))
+        for batch in _in_batches(archived_ids, batch_size):
+            ArchivedEvent.objects.filter(pk__in=batch).update(rsvp_count=_count_subquery('event', ArchivedRSVP))
+        SiteCounter.objects.update_or_create(name=ARCHIVED_EVENTS, defaults={'value': len(archived_ids)})
+
+    total = count_participants()
+    SiteCounter.objects.update_or_create(name=PARTICIPANTS, defaults={'value': total})
+    return total
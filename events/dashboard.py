@@ -0,0 +1,144 @@
+"""
+Organizer dashboard statistics.
+
+compute_stats() derives every event figure from a single conditional
+aggregate over Event. The result is kept in the DashboardSnapshot row,
+which Event save/delete signals adjust in place, so a dashboard load is
+normally two primary key reads (snapshot + participant counter) however
+many events and RSVPs exist. Archived events (events.archive) are counted
+through the `archived_events` site counter; they are all in the past.
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+
+from .counters import ARCHIVED_EVENTS, count_participants, get_site_counter, get_total_participants
+from .models import DashboardSnapshot, Event
+
+SNAPSHOT_PK = 1
+
+
+def _day_bounds(day):
+    start = Event.compute_starts_at(day, datetime.time.min)
+    end = Event.compute_starts_at(day + datetime.timedelta(days=1), datetime.time.min)
+    return start, end
+
+
+def compute_stats(now=None):
+    """Compute the event figures from scratch in one aggregate query (plus the archived event counter)"""
+    now = now or timezone.now()
+    day = timezone.localdate(now)
+    day_start, day_end = _day_bounds(day)
+    figures = Event.objects.aggregate(
+        total_events=Count('pk'),
+        upcoming_events=Count('pk', filter=Q(starts_at__gt=now)),
+        past_events=Count('pk', filter=Q(starts_at__lte=now)),
+        todays_events=Count('pk', filter=Q(starts_at__gte=day_start, starts_at__lt=day_end)),
+        next_start=Min('starts_at', filter=Q(starts_at__gt=now)),
+    )
+    next_start = figures.pop('next_start')
+    archived = get_site_counter(ARCHIVED_EVENTS)
+    figures['total_events'] += archived
+    figures['past_events'] += archived
+    figures.update({
+        'day': day,
+        'as_of': now,
+        'valid_until': min(next_start, day_end) if next_start else day_end,
+    })
+    return figures
+
+
+def refresh_snapshot(now=None):
+    with transaction.atomic():
+        # Lock the row first so concurrent incremental updates queue behind us
+        DashboardSnapshot.objects.select_for_update().filter(pk=SNAPSHOT_PK).first()
+        figures = compute_stats(now)
+        snapshot, _ = DashboardSnapshot.objects.update_or_create(pk=SNAPSHOT_PK, defaults=figures)
+    return snapshot
+
+
+def get_snapshot(now=None):
+    now = now or timezone.now()
+    snapshot = DashboardSnapshot.objects.filter(pk=SNAPSHOT_PK).first()
+    if snapshot is None or not snapshot.is_valid(now):
+        snapshot = refresh_snapshot(now)
+    return snapshot
+
+
+def get_dashboard_stats(now=None):
+    snapshot = get_snapshot(now)
+    return {
+        'total_events': snapshot.total_events,
+        'upcoming_events': snapshot.upcoming_events,
+        'past_events': snapshot.past_events,
+        'todays_events_count': snapshot.todays_events,
+        'total_participants': get_total_participants(),
+    }
+
+
+def _classify(starts_at, now, day):
+    """Per-figure contribution of one event starting at `starts_at`"""
+    day_start, day_end = _day_bounds(day)
+    return {
+        'total_events': 1,
+        'upcoming_events': int(starts_at > now),
+        'past_events': int(starts_at <= now),
+        'todays_events': int(day_start <= starts_at < day_end),
+    }
+
+
+def _apply(old_starts_at=None, new_starts_at=None):
+    """Move one event's contribution from old_starts_at to new_starts_at"""
+    now = timezone.now()
+    snapshot = DashboardSnapshot.objects.filter(pk=SNAPSHOT_PK)
+    day = snapshot.values_list('day', flat=True).first()
+    if day is None:
+        return
+    deltas = dict.fromkeys(('total_events', 'upcoming_events', 'past_events', 'todays_events'), 0)
+    if old_starts_at is not None:
+        for key, value in _classify(old_starts_at, now, day).items():
+            deltas[key] -= value
+    if new_starts_at is not None:
+        for key, value in _classify(new_starts_at, now, day).items():
+            deltas[key] += value
+    updates = {key: Greatest(F(key) + delta, 0) for key, delta in deltas.items() if delta}
+    if new_starts_at is not None and new_starts_at > now:
+        # The new event flips to "past" when it starts
+        updates['valid_until'] = Least(F('valid_until'), new_starts_at)
+    if updates:
+        snapshot.update(**updates)
+
+
+def record_event_saved(event, created, previous_starts_at=None):
+    if created:
+        _apply(new_starts_at=event.starts_at)
+    elif previous_starts_at is not None and previous_starts_at != event.starts_at:
+        _apply(old_starts_at=previous_starts_at, new_starts_at=event.starts_at)
+
+
+def record_event_deleted(event):
+    _apply(old_starts_at=event.starts_at)
+
+
+def invalidate_snapshot():
+    """Force a recompute on the next read, e.g. after bulk inserts that skip signals"""
+    DashboardSnapshot.objects.filter(pk=SNAPSHOT_PK).update(valid_until=F('as_of'))
+
+
+def check_consistency(now=None):
+    """Return {figure: (stored, actual)} for every figure that has drifted"""
+    now = now or timezone.now()
+    snapshot = DashboardSnapshot.objects.filter(pk=SNAPSHOT_PK).first()
+    mismatches = {}
+    if snapshot is not None and snapshot.is_valid(now):
+        actual = compute_stats(now)
+        for key in ('total_events', 'upcoming_events', 'past_events', 'todays_events'):
+            if getattr(snapshot, key) != actual[key]:
+                mismatches[key] = (getattr(snapshot, key), actual[key])
+    participants = count_participants()
+    if get_total_participants() != participants:
+        mismatches['total_participants'] = (get_total_participants(), participants)
+    return mismatches
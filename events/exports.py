@@ -0,0 +1,194 @@
+"""
+Streaming attendee exports (CSV and XLSX).
+
+Rows come from a single RSVP .values_list() query read with .iterator(),
+so at most EXPORT_CHUNK_SIZE rows are held at once; whether the attendee
+was marked as attended on their EventRegistration is an EXISTS subquery
+in the same statement. The header is yielded before the query runs, so
+the first byte goes out immediately.
+
+XLSX files are zip archives: the worksheet is written into a zipfile
+member row by row, and the compressed bytes are handed to the response
+as they are produced (zipfile writes data descriptors when the output
+cannot seek). Cells are inline strings, so no shared string table has to
+be kept in memory.
+"""
+import csv
+import datetime
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import ArchivedEventRegistration, ArchivedRSVP, EventRegistration
+
+EXPORT_CHUNK_SIZE = getattr(settings, 'ATTENDEE_EXPORT_CHUNK_SIZE', 2000)
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+EXPORT_COLUMNS = (
+    ('Event', 'event__name'),
+    ('Starts at', 'event__starts_at'),
+    ('Location', 'event__location'),
+    ('Category', 'event__category__name'),
+    ('Username', 'user__username'),
+    ('First name', 'user__first_name'),
+    ('Last name', 'user__last_name'),
+    ('Email', 'user__email'),
+    ('Phone', 'user__phone_number'),
+    ('RSVP date', 'rsvp_date'),
+    ('Notes', 'notes'),
+    ('Attended', 'attended'),
+)
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Spreadsheet apps treat these leading characters as the start of a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+# Characters XML 1.0 does not allow, even escaped
+XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def attendee_rows(rsvps):
+    """Export rows for an RSVP (or ArchivedRSVP) queryset, streamed from one query"""
+    registrations = ArchivedEventRegistration if rsvps.model is ArchivedRSVP else EventRegistration
+    attended = registrations.objects.filter(user=OuterRef('user'), event=OuterRef('event'), attended=True)
+    return (
+        rsvps.select_related('user')
+        .annotate(attended=Exists(attended))
+        .order_by('event__starts_at', 'event', 'rsvp_date', 'pk')
+        .values_list(*[lookup for _, lookup in EXPORT_COLUMNS])
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'yes' if value else 'no'
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%Y-%m-%d %H:%M')
+    return str(value)
+
+
+def _csv_cell(value):
+    # XLSX inline strings are never evaluated; CSV cells are
+    text = _cell(value)
+    return "'" + text if text.startswith(FORMULA_PREFIXES) else text
+
+
+class _Echo:
+    """File-like object whose write() returns what was written, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow([title for title, _ in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+class _Buffer:
+    """Unseekable sink for zipfile; drain() returns and forgets what was written"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Attendees" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_row(values):
+    cells = ''.join(
+        f'<c t="inlineStr"><is><t xml:space="preserve">{escape(XML_ILLEGAL.sub("", _cell(value)))}</t></is></c>'
+        for value in values
+    )
+    return f'<row>{cells}</row>'.encode()
+
+
+def stream_xlsx(rows):
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(title for title, _ in EXPORT_COLUMNS))
+            yield buffer.drain()
+            for count, row in enumerate(rows, start=1):
+                sheet.write(_xlsx_row(row))
+                if count % EXPORT_CHUNK_SIZE == 0:
+                    yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+def export_response(rsvps, fmt, filename):
+    """StreamingHttpResponse with the attendees of `rsvps` as CSV or XLSX"""
+    rows = attendee_rows(rsvps)
+    if fmt == 'xlsx':
+        response = StreamingHttpResponse(stream_xlsx(rows), content_type=XLSX_CONTENT_TYPE)
+    else:
+        response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    response['Cache-Control'] = 'private, no-store'
+    # Keep nginx from buffering the whole file before sending the first byte
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,5 +1,6 @@
 from django import forms
 from .models import Event, Category, UserProfile, RSVP
+from .images import process_event_image
 
 tailwind_input_class = (
     'w-full px-3 py-2 border border-gray-300 rounded-sm '
@@ -50,6 +51,26 @@ class EventForm(forms.ModelForm):
             })
         }
 
+    def save(self, commit=True):
+        event = super().save(commit)
+        if 'image' in self.changed_data:
+            if commit:
+                process_event_image(event)
+            else:
+                save_m2m = self.save_m2m
+
+                def save_m2m_and_image():
+                    save_m2m()
+                    process_event_image(event)
+                self.save_m2m = save_m2m_and_image
+        return event
+
+class EventImportUploadForm(forms.Form):
+    file = forms.FileField(help_text='CSV with a header row, or JSON Lines (.jsonl); columns: name, description, date, time, location, category')
+    batch_size = forms.IntegerField(min_value=1, max_value=5000, initial=500)
+    create_categories = forms.BooleanField(required=False, initial=True, help_text='Create categories that do not exist yet')
+    dry_run = forms.BooleanField(required=False, help_text='Validate the file without importing anything')
+
 class UserProfileForm(forms.ModelForm):
     class Meta:
         model = UserProfile
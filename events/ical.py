@@ -0,0 +1,250 @@
+"""
+iCalendar (.ics) feeds: every public event, one category, or one user's RSVPs.
+
+Calendar clients poll feeds every few minutes, so each feed is built in
+three layers:
+
+* Validators - one aggregate query per request (latest updated_at and row
+  count of the feed's events, their categories and, for a user feed, the
+  RSVPs) gives the ETag; a matching If-None-Match is answered 304.
+* Feed body - cached under the feed and its validators, so clients that
+  do download the feed get it without touching the events table.
+* VEVENT blocks - each event's block is cached under its own and its
+  category's updated_at. A feed that changed is rebuilt by reading the
+  window's (pk, updated_at) pairs from the feed's index, fetching all of
+  their blocks in one get_many() and rendering only the events whose
+  block is missing, from one more query. One edited event costs one
+  render, not the whole feed, and a cold feed costs the same three
+  queries however many events it has.
+
+Feeds cover events from ICS_PAST_DAYS ago onwards; the window moves by
+day, so it is part of the validators. Bodies are streamed, and only
+bodies up to ICS_FEED_CACHE_MAX_BYTES are kept in the cache.
+
+User feeds are reached through an unguessable token instead of a
+session, since calendar apps cannot log in. The token is derived from
+the user's password hash, so changing the password revokes old URLs.
+"""
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .models import Event, RSVP
+
+ICS_PAST_DAYS = getattr(settings, 'ICS_PAST_DAYS', 30)
+ICS_CHUNK_SIZE = getattr(settings, 'ICS_CHUNK_SIZE', 1000)
+ICS_MAX_AGE = getattr(settings, 'ICS_MAX_AGE', 300)
+ICS_EVENT_TIMEOUT = getattr(settings, 'ICS_EVENT_TIMEOUT', 7 * 24 * 3600)
+ICS_FEED_TIMEOUT = getattr(settings, 'ICS_FEED_TIMEOUT', 24 * 3600)
+ICS_FEED_CACHE_MAX_BYTES = getattr(settings, 'ICS_FEED_CACHE_MAX_BYTES', 2 * 1024 * 1024)
+
+CONTENT_TYPE = 'text/calendar; charset=utf-8'
+TOKEN_SALT = 'events.ical.user_feed'
+# Events without an end time are shown as this long
+DEFAULT_DURATION = datetime.timedelta(hours=1)
+
+
+def user_token(user):
+    return salted_hmac(TOKEN_SALT, f'{user.pk}:{user.password}').hexdigest()[:32]
+
+
+def check_user_token(user, token):
+    return constant_time_compare(user_token(user), token)
+
+
+def user_feed_url(user):
+    return reverse('user_calendar_feed', args=[user.pk, user_token(user)])
+
+
+def _escape(text):
+    return (
+        (text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+
+def _fold(line):
+    """Fold a content line into 75-octet pieces (RFC 5545, 3.1)"""
+    data = line.encode()
+    if len(data) <= 75:
+        return line + '\r\n'
+    pieces, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        # Never split a UTF-8 sequence
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1
+        pieces.append(data[start:end].decode())
+        start, limit = end, 74
+    return '\r\n '.join(pieces) + '\r\n'
+
+
+def _utc(value):
+    return value.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def render_event(event, base_url, domain):
+    """The VEVENT block of `event` (category selected)"""
+    ends_at = event.ends_at or event.starts_at + DEFAULT_DURATION
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:event-{event.pk}@{domain}',
+        f'DTSTAMP:{_utc(event.updated_at)}',
+        f'LAST-MODIFIED:{_utc(event.updated_at)}',
+        f'DTSTART:{_utc(event.starts_at)}',
+        f'DTEND:{_utc(ends_at)}',
+        f'SUMMARY:{_escape(event.name)}',
+        f'DESCRIPTION:{_escape(event.description)}',
+        f'LOCATION:{_escape(event.location)}',
+        f'CATEGORIES:{_escape(event.category.name)}',
+        f"URL:{base_url}{reverse('event_detail', args=[event.pk])}",
+        'END:VEVENT',
+    ]
+    return ''.join(_fold(line) for line in lines)
+
+
+class Feed:
+    """One .ics feed: its events, its validators and how it is named"""
+
+    def __init__(self, key, name, events, validators):
+        self.key = key
+        self.name = name
+        self.events = events
+        self.validators = validators
+
+    @classmethod
+    def window_start(cls):
+        """Start of the local day ICS_PAST_DAYS days ago"""
+        day = timezone.localdate() - datetime.timedelta(days=ICS_PAST_DAYS)
+        return Event.compute_starts_at(day, datetime.time.min)
+
+    @classmethod
+    def public(cls, category=None):
+        since = cls.window_start()
+        events = Event.objects.filter(starts_at__gte=since)
+        key, name = 'events', 'Events'
+        if category is not None:
+            events = events.filter(category=category)
+            key, name = f'category:{category.pk}', f'Events: {category.name}'
+        figures = events.aggregate(
+            latest=Max('updated_at'), total=Count('pk'), categories=Max('category__updated_at'),
+        )
+        return cls(key, name, events, [since, figures['latest'], figures['total'], figures['categories']])
+
+    @classmethod
+    def for_user(cls, user):
+        since = cls.window_start()
+        rsvps = RSVP.objects.filter(user=user, event__starts_at__gte=since)
+        figures = rsvps.aggregate(
+            latest=Max('updated_at'), total=Count('pk'),
+            events=Max('event__updated_at'), categories=Max('event__category__updated_at'),
+        )
+        events = Event.objects.filter(starts_at__gte=since, rsvp_set__user=user)
+        return cls(
+            f'user:{user.pk}', 'My RSVPs', events,
+            [since, figures['latest'], figures['total'], figures['events'], figures['categories']],
+        )
+
+    def digest(self, base_url):
+        parts = [self.key, base_url] + [str(part) for part in self.validators]
+        return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    def header(self):
+        lines = [
+            'BEGIN:VCALENDAR',
+            'VERSION:2.0',
+            'PRODID:-//EMS//Event Management System//EN',
+            'CALSCALE:GREGORIAN',
+            'METHOD:PUBLISH',
+            f'X-WR-CALNAME:{_escape(self.name)}',
+            f'X-PUBLISHED-TTL:PT{max(ICS_MAX_AGE // 60, 1)}M',
+            f'REFRESH-INTERVAL;VALUE=DURATION:PT{max(ICS_MAX_AGE // 60, 1)}M',
+        ]
+        return ''.join(_fold(line) for line in lines)
+
+    def _rendered(self, missing, base_url, domain):
+        """Yield (pk, VEVENT block) for the events in `missing`, in feed order, from one query"""
+        events = self.events.select_related('category').order_by('starts_at', 'pk')
+        if len(missing) <= ICS_CHUNK_SIZE:
+            events = events.filter(pk__in=missing)
+        for event in events.iterator(chunk_size=ICS_CHUNK_SIZE):
+            if event.pk in missing:
+                yield event.pk, render_event(event, base_url, domain)
+
+    def _parts(self, base_url, domain):
+        site = hashlib.sha1(base_url.encode()).hexdigest()[:8]
+        rows = self.events.order_by('starts_at', 'pk').values_list('pk', 'updated_at', 'category__updated_at')
+        keys = [
+            (f'ics:vevent:{site}:{pk}:{updated_at.timestamp()}:{category_updated_at.timestamp()}', pk)
+            for pk, updated_at, category_updated_at in rows
+        ]
+        blocks = cache.get_many([key for key, _ in keys])
+        missing = {pk for key, pk in keys if key not in blocks}
+        rendered, pending = self._rendered(missing, base_url, domain), {}
+
+        yield self.header()
+        chunk, new = [], {}
+        for key, pk in keys:
+            if key in blocks:
+                chunk.append(blocks[key])
+                continue
+            # Rendered events arrive in the same order unless one moved or
+            # went away since `rows` was read; hold on to any that overtake
+            while pk not in pending:
+                event_pk, block = next(rendered, (None, None))
+                if event_pk is None:
+                    break
+                pending[event_pk] = block
+            if pk in pending:
+                new[key] = pending.pop(pk)
+                chunk.append(new[key])
+            if len(chunk) >= ICS_CHUNK_SIZE:
+                cache.set_many(new, ICS_EVENT_TIMEOUT)
+                yield ''.join(chunk)
+                chunk, new = [], {}
+        if new:
+            cache.set_many(new, ICS_EVENT_TIMEOUT)
+        yield ''.join(chunk)
+        yield 'END:VCALENDAR\r\n'
+
+    def stream(self, base_url, domain, store_key):
+        """Yield the feed body chunk by chunk, caching it once complete (if small enough)"""
+        body, size = [], 0
+        for part in self._parts(base_url, domain):
+            yield part
+            if body is not None:
+                size += len(part)
+                body = body if size <= ICS_FEED_CACHE_MAX_BYTES else None
+            if body is not None:
+                body.append(part)
+        if body is not None:
+            cache.set(store_key, ''.join(body), ICS_FEED_TIMEOUT)
+
+
+def feed_response(request, feed, filename, private=False):
+    """304, the cached body, or the body streamed from the feed's events"""
+    base_url = f'{request.scheme}://{request.get_host()}'
+    domain = getattr(settings, 'ICS_DOMAIN', None) or request.get_host().split(':')[0]
+    digest = feed.digest(base_url)
+    etag = quote_etag(digest)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        store_key = f'ics:feed:{digest}'
+        body = cache.get(store_key)
+        if body is not None:
+            response = HttpResponse(body, content_type=CONTENT_TYPE)
+        else:
+            response = StreamingHttpResponse(feed.stream(base_url, domain, store_key), content_type=CONTENT_TYPE)
+        response['Content-Disposition'] = f'inline; filename="{filename}.ics"'
+    response['ETag'] = etag
+    response['Cache-Control'] = f"{'private' if private else 'public'}, max-age={ICS_MAX_AGE}"
+    return response
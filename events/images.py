@@ -0,0 +1,194 @@
+"""
+Resized variants for Event.image.
+
+generate_variants() decodes an uploaded image once and writes fixed-width
+WebP and JPEG copies next to it under events/variants/. Variant names
+carry a digest of the stored name and bytes of their source, so uploads
+sharing a file name never share (or overwrite) each other's variants,
+and an existing variant file is reused rather than rewritten. The copies are
+re-encoded from pixel data only, so EXIF (including GPS), XMP and comment
+metadata never reach them; orientation is applied before encoding. The
+original dimensions and the variant paths are recorded on the Event, and
+the `event_picture` template tag builds srcset/sizes from them.
+
+The original stays reachable (the API's `image` field, the template's
+fallback <img>), so strip_metadata() rewrites it first whenever it
+carries any of that metadata, with its orientation applied to the pixels.
+
+Vector images (the default SVG) and files Pillow cannot read get no
+variants and are served as-is.
+"""
+import hashlib
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import Event
+
+VARIANT_WIDTHS = tuple(getattr(settings, 'EVENT_IMAGE_WIDTHS', (320, 640, 1024)))
+VARIANT_DIR = 'events/variants'
+ORIENTATION_TAG = 0x0112
+# Image.info keys that can identify the photographer or the place a photo was taken
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'Comment', 'Description', 'Author')
+
+# (key, Pillow format, extension, save options), preferred format first
+VARIANT_FORMATS = (
+    ('webp', 'WEBP', 'webp', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+
+def _source_digest(name, storage):
+    """Digest of the stored name and bytes of a source image"""
+    digest = hashlib.sha256(name.encode())
+    with storage.open(name, 'rb') as source:
+        for chunk in source.chunks():
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def _variant_name(name, digest, width, extension):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f'{VARIANT_DIR}/{stem}-{digest}-{width}w.{extension}'
+
+
+def _target_widths(original_width):
+    """Configured widths not larger than the original; always at least one"""
+    widths = [width for width in VARIANT_WIDTHS if width < original_width]
+    if len(widths) < len(VARIANT_WIDTHS):
+        widths.append(min(original_width, max(VARIANT_WIDTHS)))
+    return sorted(set(widths))
+
+
+def _encode(image, image_format, options):
+    buffer = BytesIO()
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    image.save(buffer, image_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def _has_metadata(image):
+    return bool(image.getexif()) or any(key in image.info for key in METADATA_KEYS)
+
+
+def strip_metadata(name, storage=None):
+    """Rewrite the image stored at `name` without its metadata if it has any; returns the stored name"""
+    storage = storage or default_storage
+    try:
+        with storage.open(name, 'rb') as source:
+            image = Image.open(source)
+            if not _has_metadata(image) or getattr(image, 'n_frames', 1) > 1:
+                return name
+            image_format = image.format
+            options = {}
+            if 'icc_profile' in image.info:
+                options['icc_profile'] = image.info['icc_profile']
+            if image.getexif().get(ORIENTATION_TAG, 1) != 1:
+                image = ImageOps.exif_transpose(image)
+                if image_format == 'JPEG':
+                    options['quality'] = 90
+            else:
+                image.load()
+                if image_format == 'JPEG':
+                    # Reuse the quantisation tables so the rewrite costs as little quality as possible
+                    options['quality'] = 'keep'
+            # Some encoders copy comments from info rather than the save options
+            image.info = {key: value for key, value in image.info.items() if key not in METADATA_KEYS}
+            buffer = BytesIO()
+            image.save(buffer, image_format, **options)
+    except (UnidentifiedImageError, OSError, ValueError, KeyError):
+        return name
+    storage.delete(name)
+    return storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def generate_variants(name, storage=None):
+    """
+    Strip the metadata of the image stored at `name` and write its
+    variants. Returns {'name', 'width', 'height', 'variants': {format:
+    {width: path}}}, or None if the file is not a raster image.
+    """
+    storage = storage or default_storage
+    name = strip_metadata(name, storage)
+    try:
+        with storage.open(name, 'rb') as source:
+            image = Image.open(source)
+            # Dimensions as displayed, taken before draft() may shrink the decode
+            width, height = image.size
+            if image.getexif().get(ORIENTATION_TAG, 1) in (5, 6, 7, 8):
+                width, height = height, width
+            # Let the JPEG decoder downscale while decoding when it can
+            image.draft('RGB', (max(VARIANT_WIDTHS), max(VARIANT_WIDTHS)))
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    digest = _source_digest(name, storage)
+    variants = {key: {} for key, _, _, _ in VARIANT_FORMATS}
+    for target in _target_widths(width):
+        names = {key: _variant_name(name, digest, target, extension) for key, _, extension, _ in VARIANT_FORMATS}
+        if all(storage.exists(variant_name) for variant_name in names.values()):
+            for key, variant_name in names.items():
+                variants[key][str(target)] = variant_name
+            continue
+        target_height = max(1, round(height * target / width))
+        resized = image.resize((target, target_height), Image.Resampling.LANCZOS)
+        for key, image_format, _, options in VARIANT_FORMATS:
+            variant_name = names[key]
+            if not storage.exists(variant_name):
+                variant_name = storage.save(variant_name, _encode(resized, image_format, options))
+            variants[key][str(target)] = variant_name
+    return {'name': name, 'width': width, 'height': height, 'variants': variants}
+
+
+def delete_variants(variants, storage=None):
+    storage = storage or default_storage
+    for paths in (variants or {}).values():
+        for path in paths.values():
+            storage.delete(path)
+
+
+def image_fields(result):
+    """Event field values for a generate_variants() result"""
+    if result is None:
+        return {'image_width': None, 'image_height': None, 'image_variants': {}}
+    return {
+        'image': result['name'],
+        'image_width': result['width'],
+        'image_height': result['height'],
+        'image_variants': result['variants'],
+    }
+
+
+def process_event_image(event):
+    """Regenerate the variants for `event.image` and store the result on the event"""
+    previous = event.image_variants
+    result = generate_variants(event.image.name) if event.image else None
+    fields = image_fields(result)
+    Event.objects.filter(pk=event.pk).update(**fields)
+    for field, value in fields.items():
+        setattr(event, field, value)
+
+    kept = {path for paths in fields['image_variants'].values() for path in paths.values()}
+    stale = {path for paths in (previous or {}).values() for path in paths.values()} - kept
+    # Events sharing an image file (e.g. copies of one event) share its variants
+    shared = Q()
+    for path in stale:
+        shared |= Q(image_variants__icontains=path)
+    if stale:
+        for variants in Event.objects.exclude(pk=event.pk).filter(shared).values_list('image_variants', flat=True):
+            stale -= {path for paths in variants.values() for path in paths.values()}
+    for path in stale:
+        default_storage.delete(path)
@@ -0,0 +1,181 @@
+"""
+Bulk event import from CSV or JSON Lines.
+
+Rows are read one at a time and validated with the EventForm rules
+(EventImportForm, without the category select and image upload, so
+validation needs no queries). Categories are resolved by name from a map
+loaded once up front; an unknown name is created in the transaction of
+the first batch holding a valid row that uses it, so neither rejected
+rows nor a failed batch leave categories behind. Valid rows are inserted
+with bulk_create in batches of `batch_size`, each batch in its own
+transaction, so memory stays bounded by the batch size however large
+the file is.
+
+bulk_create skips the Event signals, so after each batch the search
+documents of the new events are built, and once the import is done the
+dashboard snapshot is refreshed and the cached pages are invalidated.
+"""
+import csv
+import json
+import os
+
+from django.conf import settings
+from django.db import transaction
+
+from . import conditional, dashboard, page_cache, search
+from .forms import EventForm
+from .models import Category, Event
+
+IMPORT_BATCH_SIZE = getattr(settings, 'EVENT_IMPORT_BATCH_SIZE', 500)
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+
+class EventImportForm(EventForm):
+    """EventForm's field rules for one imported row; category is resolved by name"""
+
+    class Meta(EventForm.Meta):
+        fields = ['name', 'description', 'date', 'time', 'location']
+
+
+def guess_format(filename):
+    extension = os.path.splitext(filename)[1].lower().lstrip('.')
+    return 'jsonl' if extension in ('jsonl', 'ndjson') else 'csv'
+
+
+def read_rows(stream, fmt='csv'):
+    """Yield (line number, row dict) from a text stream, lazily"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield line_number, error
+                continue
+            yield line_number, row if isinstance(row, dict) else ValueError('Expected a JSON object')
+    else:
+        raise ValueError(f'Unknown import format: {fmt}')
+
+
+class EventImporter:
+    """
+    Validate and insert rows; rejected rows are passed to `on_reject(line, errors)`
+    instead of being collected, so nothing grows with the file.
+    """
+
+    def __init__(self, created_by=None, batch_size=IMPORT_BATCH_SIZE, create_categories=True,
+                 dry_run=False, on_reject=None):
+        self.created_by = created_by
+        self.batch_size = batch_size
+        self.create_categories = create_categories
+        self.dry_run = dry_run
+        self.on_reject = on_reject
+        self.categories = {
+            name.casefold(): pk for name, pk in Category.objects.values_list('name', 'pk')
+        }
+        # Unknown category names used by valid rows, by key, until their batch creates them
+        self.new_categories = {}
+        self.created = 0
+        self.rejected = 0
+        self.categories_created = 0
+
+    def _reject(self, line_number, errors):
+        self.rejected += 1
+        if self.on_reject is not None:
+            self.on_reject(line_number, errors)
+
+    def _category_key(self, name, valid=True):
+        """(category key, error); an unknown name used by a `valid` row is queued for creation"""
+        name = (name or '').strip()
+        if not name:
+            return None, 'This field is required.'
+        key = name.casefold()
+        if key not in self.categories:
+            if not self.create_categories:
+                return None, f'Unknown category "{name}".'
+            if valid and key not in self.new_categories:
+                self.new_categories[key] = name
+                if self.dry_run:
+                    self.categories_created += 1
+        return key, None
+
+    def _create_categories(self, batch):
+        """Create the queued categories `batch` uses and set every event's category; returns {key: pk}"""
+        created = {}
+        for event in batch:
+            key = event._category_key
+            category_id = self.categories.get(key) or created.get(key)
+            if category_id is None:
+                category_id = created[key] = Category.objects.create(name=self.new_categories[key]).pk
+            event.category_id = category_id
+        return created
+
+    def build(self, row):
+        """An unsaved Event for `row`, or a dict of field errors"""
+        row = {key.strip().lower(): value for key, value in row.items() if key}
+        form = EventImportForm(data={key: '' if value is None else str(value) for key, value in row.items()})
+        errors = {} if form.is_valid() else {field: list(messages) for field, messages in form.errors.items()}
+        category_key, category_error = self._category_key(row.get('category'), valid=not errors)
+        if category_error:
+            errors['category'] = [category_error]
+        if errors:
+            return errors
+        event = form.instance
+        event._category_key = category_key
+        event.created_by = self.created_by
+        # bulk_create does not call Event.save()
+        event.starts_at = Event.compute_starts_at(event.date, event.time)
+        return event
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        if not self.dry_run:
+            with transaction.atomic():
+                created = self._create_categories(batch)
+                events = Event.objects.bulk_create(batch)
+                search.index_events(event.pk for event in events)
+            # Only once committed: a failed batch takes its new categories with it
+            self.categories.update(created)
+            for key in created:
+                del self.new_categories[key]
+            self.categories_created += len(created)
+        self.created += len(batch)
+        batch.clear()
+
+    def run(self, rows):
+        """Import (line number, row) pairs from read_rows(); yields the running totals after each batch"""
+        batch = []
+        for line_number, row in rows:
+            if isinstance(row, Exception):
+                self._reject(line_number, {'__all__': [str(row)]})
+                continue
+            result = self.build(row)
+            if isinstance(result, dict):
+                self._reject(line_number, result)
+                continue
+            batch.append(result)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                yield self.created, self.rejected
+        self._flush(batch)
+        if self.created and not self.dry_run:
+            dashboard.refresh_snapshot()
+            transaction.on_commit(self._pages_changed)
+        yield self.created, self.rejected
+
+    def _pages_changed(self):
+        page_cache.invalidate('events', 'categories')
+        conditional.touch('events', 'categories')
+
+
+def format_errors(errors):
+    return '; '.join(
+        f"{field}: {' '.join(messages)}" if field != '__all__' else ' '.join(messages)
+        for field, messages in errors.items()
+    )
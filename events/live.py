@@ -0,0 +1,221 @@
+"""
+Live RSVP updates pushed to event pages over server-sent events.
+
+The RSVP signals call publish_rsvp(), which after the transaction commits
+reads the event's attendee count once and publishes one SSE frame on the
+event's channel. The Hub hands that same encoded frame to every watcher
+in the process: subscribers are asyncio queues grouped by event loop, so
+an update costs one call_soon_threadsafe() per loop, not per client, and
+no query at all per client. A watcher that falls LIVE_QUEUE_SIZE frames
+behind is disconnected; the browser reconnects and starts again from a
+fresh count.
+
+Other processes are reached through the LIVE_BACKEND:
+
+* LocalBackend (default) - a single process; nothing is forwarded.
+* DatabaseBackend - frames go into the LiveMessage table and a poller
+  thread in each process that has watchers reads new rows every
+  LIVE_POLL_INTERVAL seconds: one query per process per interval
+  whatever the number of watchers. A stand-in for a real broker.
+
+A backend is any class with publish(channel, frame) and start(deliver),
+where deliver(channel, frame) fans a frame out locally; a Redis or
+PostgreSQL LISTEN/NOTIFY backend only needs those two methods.
+"""
+import asyncio
+import datetime
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Event, LiveMessage
+
+logger = logging.getLogger(__name__)
+
+LIVE_BACKEND = getattr(settings, 'LIVE_BACKEND', 'events.live.LocalBackend')
+LIVE_QUEUE_SIZE = getattr(settings, 'LIVE_QUEUE_SIZE', 100)
+LIVE_HEARTBEAT = getattr(settings, 'LIVE_HEARTBEAT', 15)
+LIVE_POLL_INTERVAL = getattr(settings, 'LIVE_POLL_INTERVAL', 1.0)
+LIVE_MESSAGE_TTL = getattr(settings, 'LIVE_MESSAGE_TTL', 300)
+
+# Browsers wait this long (ms) before reconnecting a dropped stream
+RETRY_MS = 3000
+# Fraction of DatabaseBackend publishes that also prune expired rows
+PRUNE_PROBABILITY = 0.01
+
+
+def event_channel(event_id):
+    return f'event:{event_id}'
+
+
+def frame(event, data):
+    """One SSE frame, encoded once however many watchers receive it"""
+    return f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+def _offer(queues, message):
+    for queue in queues:
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too far behind: drop the backlog and tell the stream to close
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+
+class Hub:
+    """In-process fan-out of frames to the subscribers of a channel"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.channels = defaultdict(dict)
+        self.started = False
+
+    def subscribe(self, channel):
+        """A queue receiving the channel's frames (None once the subscriber is dropped); call from async code"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(LIVE_QUEUE_SIZE)
+        with self.lock:
+            if not self.started:
+                self.backend.start(self.deliver)
+                self.started = True
+            self.channels[channel].setdefault(loop, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, channel, queue):
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            loops = self.channels.get(channel, {})
+            queues = loops.get(loop, set())
+            queues.discard(queue)
+            if not queues:
+                loops.pop(loop, None)
+            if not loops:
+                self.channels.pop(channel, None)
+
+    def subscriber_count(self, channel):
+        with self.lock:
+            return sum(len(queues) for queues in self.channels.get(channel, {}).values())
+
+    def deliver(self, channel, message):
+        """Hand `message` to this process's subscribers; safe from any thread"""
+        with self.lock:
+            targets = [(loop, list(queues)) for loop, queues in self.channels.get(channel, {}).items()]
+        for loop, queues in targets:
+            try:
+                loop.call_soon_threadsafe(_offer, queues, message)
+            except RuntimeError:
+                # The loop has been closed
+                pass
+
+    def publish(self, channel, message):
+        self.deliver(channel, message)
+        self.backend.publish(channel, message)
+
+
+class LocalBackend:
+    """Single process: subscribers only ever see local publishes"""
+
+    def publish(self, channel, message):
+        pass
+
+    def start(self, deliver):
+        pass
+
+
+class DatabaseBackend:
+    """Cross-process fan-out through the LiveMessage table"""
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+
+    def publish(self, channel, message):
+        LiveMessage.objects.create(channel=channel, frame=message, origin=self.origin)
+        if random.random() < PRUNE_PROBABILITY:
+            expired = timezone.now() - datetime.timedelta(seconds=LIVE_MESSAGE_TTL)
+            LiveMessage.objects.filter(created_at__lt=expired).delete()
+
+    def start(self, deliver):
+        threading.Thread(target=self._poll, args=(deliver,), name='live-poller', daemon=True).start()
+
+    def _poll(self, deliver):
+        last = None
+        while True:
+            try:
+                if last is None:
+                    last = LiveMessage.objects.aggregate(last=Max('pk'))['last'] or 0
+                rows = (
+                    LiveMessage.objects.filter(pk__gt=last).exclude(origin=self.origin)
+                    .order_by('pk').values_list('pk', 'channel', 'frame')
+                )
+                for pk, channel, message in rows:
+                    last = pk
+                    deliver(channel, message)
+            except DatabaseError:
+                logger.exception('Polling live messages failed')
+                close_old_connections()
+            time.sleep(LIVE_POLL_INTERVAL)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = Hub(import_string(LIVE_BACKEND)())
+    return _hub
+
+
+def attendee_count(event_id):
+    return Event.objects.filter(pk=event_id).with_attendee_count().values_list('attendee_count', flat=True).first()
+
+
+def publish_rsvp(rsvp, action):
+    """Publish the event's new count and the added/removed attendee once the change commits"""
+    event_id, username = rsvp.event_id, rsvp.user.username
+
+    def send():
+        count = attendee_count(event_id)
+        if count is None:
+            return
+        get_hub().publish(event_channel(event_id), frame('rsvp', {
+            'action': action, 'count': count, 'username': username,
+        }))
+    transaction.on_commit(send)
+
+
+async def stream(event_id, count):
+    """SSE body for one watcher: the current count, then every update on the event's channel"""
+    hub = get_hub()
+    channel = event_channel(event_id)
+    queue = hub.subscribe(channel)
+    try:
+        yield f'retry: {RETRY_MS}\n' + frame('count', {'count': count})
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), LIVE_HEARTBEAT)
+            except asyncio.TimeoutError:
+                # Comment line; keeps proxies from timing the stream out and notices gone clients
+                yield ': ping\n\n'
+                continue
+            if message is None:
+                return
+            yield message
+    finally:
+        hub.unsubscribe(channel, queue)
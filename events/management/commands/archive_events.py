@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from events import archive
+
+class Command(BaseCommand):
+    help = 'Move past events, their RSVPs and registrations to the archive tables in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=archive.ARCHIVE_AFTER_DAYS,
+            help=f'Archive events that started this many days ago or earlier (default: {archive.ARCHIVE_AFTER_DAYS})'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=archive.ARCHIVE_BATCH_SIZE,
+            help=f'Number of events moved per transaction (default: {archive.ARCHIVE_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many events would be archived'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            before = archive.archive_cutoff(options['days'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        if options['dry_run']:
+            count = archive.archivable(before).count()
+            self.stdout.write(f'{count} events started before {before:%Y-%m-%d} and would be archived.')
+            return
+
+        archived = 0
+        for archived in archive.archive_events(before, batch_size=options['batch_size']):
+            self.stdout.write(f'Archived {archived} events...')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully archived {archived} events that started before {before:%Y-%m-%d}')
+        )
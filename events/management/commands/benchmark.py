@@ -0,0 +1,125 @@
+import json
+import subprocess
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from events import benchmark
+
+# seed_data arguments per --dataset
+DATASETS = {
+    'small': {'participants': 1000, 'organizers': 20, 'events': 500, 'rsvps': 10000},
+    'medium': {'participants': 10000, 'organizers': 100, 'events': 5000, 'rsvps': 200000},
+    'large': {'participants': 50000, 'organizers': 200, 'events': 20000, 'rsvps': 1000000},
+}
+PREFIX = 'bench'
+PASSWORD = 'benchmark-password'
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the core pages with concurrent in-process clients and save the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dataset', choices=DATASETS, default='small',
+            help='Size of the generated dataset when the database has no benchmark data yet (default: small)'
+        )
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario (default: 200)')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent clients (default: 4)')
+        parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests per scenario (default: 20)')
+        parser.add_argument(
+            '--scenario', action='append', choices=benchmark.SCENARIO_NAMES, dest='scenarios',
+            help='Only run the given scenario (repeatable)'
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for data and request targets')
+        parser.add_argument('--output', help='JSON file for the results (default: benchmark-<commit>.json)')
+        parser.add_argument('--compare', help='Earlier results JSON to compare against')
+
+    def handle(self, *args, **options):
+        if not get_user_model().objects.filter(username__startswith=f'{PREFIX}_').exists():
+            self.stdout.write(f"Seeding the {options['dataset']} dataset...")
+            call_command(
+                'seed_data', prefix=PREFIX, password=PASSWORD, seed=options['seed'],
+                stdout=self.stdout, **DATASETS[options['dataset']]
+            )
+
+        targets = benchmark.Targets(PREFIX, PASSWORD, options['seed'])
+        if not targets.users['participant'] or not targets.users['organizer'] or not targets.upcoming:
+            raise CommandError('The benchmark data needs participants, organizers and upcoming events')
+
+        scenarios = [
+            scenario for scenario in benchmark.SCENARIOS
+            if not options['scenarios'] or scenario.name in options['scenarios']
+        ]
+        results = {}
+        # Mail goes to memory and the test client's host is allowed, whatever the settings say
+        with override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+        ):
+            for scenario in scenarios:
+                result = benchmark.run_scenario(
+                    scenario, targets,
+                    requests=options['requests'], concurrency=options['concurrency'], warmup=options['warmup'],
+                )
+                results[scenario.name] = result
+                latency = result['latency_ms']
+                self.stdout.write(
+                    f"{scenario.name:<24} p50 {latency['p50']}ms  p95 {latency['p95']}ms  p99 {latency['p99']}ms  "
+                    f"{result['throughput_rps']} req/s  {result['queries_per_request']['mean']} queries/req  "
+                    f"{result['errors']} errors"
+                )
+
+        commit = _git_commit()
+        report = {
+            'commit': commit,
+            'created_at': timezone.now().isoformat(),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'dataset': benchmark.dataset_size(),
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'peak_rss_mb': benchmark.peak_rss_mb(),
+            'scenarios': results,
+        }
+        output = options['output'] or f"benchmark-{commit or 'results'}.json"
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+        if options['compare']:
+            self.compare(options['compare'], report)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Peak RSS {report['peak_rss_mb']} MB. Results written to {output}"
+        ))
+
+    def compare(self, path, report):
+        with open(path) as f:
+            previous = json.load(f)
+        self.stdout.write(f"Compared with {previous.get('commit') or path}:")
+        for name, result in report['scenarios'].items():
+            before = previous.get('scenarios', {}).get(name)
+            if not before:
+                continue
+            changes = []
+            for label, old, new in (
+                ('p95', before['latency_ms']['p95'], result['latency_ms']['p95']),
+                ('req/s', before['throughput_rps'], result['throughput_rps']),
+                ('queries', before['queries_per_request']['mean'], result['queries_per_request']['mean']),
+            ):
+                if old and new is not None:
+                    changes.append(f'{label} {old} -> {new} ({(new - old) / old * 100:+.0f}%)')
+            self.stdout.write(f"  {name:<24} {'  '.join(changes)}")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from events import dashboard
+from events.counters import rebuild_counters
+
+class Command(BaseCommand):
+    help = 'Compare the dashboard snapshot and participant counter against the live tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Recompute the snapshot and counters when they have drifted'
+        )
+
+    def handle(self, *args, **options):
+        mismatches = dashboard.check_consistency()
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Dashboard statistics are consistent.'))
+            return
+
+        for figure, (stored, actual) in sorted(mismatches.items()):
+            self.stdout.write(
+                self.style.WARNING(f'{figure}: stored {stored}, actual {actual}')
+            )
+
+        if not options['fix']:
+            self.stdout.write('Run again with --fix to repair.')
+            return
+
+        if 'total_participants' in mismatches:
+            rebuild_counters()
+        dashboard.refresh_snapshot()
+        self.stdout.write(self.style.SUCCESS('Dashboard statistics repaired.'))
@@ -0,0 +1,75 @@
+import csv
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from events import importer
+
+
+class Command(BaseCommand):
+    help = 'Import events from a CSV or JSON Lines file, validating every row and inserting in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, or - for standard input')
+        parser.add_argument(
+            '--format', choices=importer.IMPORT_FORMATS,
+            help='Input format (default: guessed from the file extension, csv for stdin)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=importer.IMPORT_BATCH_SIZE,
+            help=f'Number of events inserted per transaction (default: {importer.IMPORT_BATCH_SIZE})'
+        )
+        parser.add_argument('--created-by', help='Username recorded as the creator of the imported events')
+        parser.add_argument(
+            '--no-create-categories', action='store_true',
+            help='Reject rows whose category does not exist instead of creating it'
+        )
+        parser.add_argument('--rejects', help='Write rejected rows (line, errors) to this CSV file')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; insert nothing')
+
+    def handle(self, *args, **options):
+        created_by = None
+        if options['created_by']:
+            try:
+                created_by = get_user_model().objects.get(username=options['created_by'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User \"{options['created_by']}\" does not exist")
+
+        path = options['path']
+        fmt = options['format'] or ('csv' if path == '-' else importer.guess_format(path))
+
+        rejects_file = open(options['rejects'], 'w', newline='', encoding='utf-8') if options['rejects'] else None
+        rejects_writer = csv.writer(rejects_file) if rejects_file else None
+        if rejects_writer:
+            rejects_writer.writerow(['line', 'errors'])
+
+        def on_reject(line_number, errors):
+            message = importer.format_errors(errors)
+            if rejects_writer:
+                rejects_writer.writerow([line_number, message])
+            else:
+                self.stderr.write(f'Line {line_number}: {message}')
+
+        events_importer = importer.EventImporter(
+            created_by=created_by,
+            batch_size=options['batch_size'],
+            create_categories=not options['no_create_categories'],
+            dry_run=options['dry_run'],
+            on_reject=on_reject,
+        )
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        try:
+            for created, rejected in events_importer.run(importer.read_rows(stream, fmt)):
+                self.stdout.write(f'Imported {created} events ({rejected} rejected)...')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if rejects_file:
+                rejects_file.close()
+
+        verb = 'Validated' if options['dry_run'] else 'Successfully imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {events_importer.created} events, {events_importer.rejected} rejected, '
+            f'{events_importer.categories_created} new categories'
+        ))
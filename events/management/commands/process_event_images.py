@@ -0,0 +1,63 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from events import images
+from events.models import Event
+
+
+def _init_worker():
+    # Workers only touch storage; never reuse the parent's DB connections
+    django.setup()
+    connections.close_all()
+
+
+def _process(pk, name):
+    return pk, images.generate_variants(name)
+
+
+class Command(BaseCommand):
+    help = 'Generate resized variants for existing event images using parallel worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Number of worker processes (default: number of CPUs)'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Regenerate variants for events that already have them'
+        )
+
+    def handle(self, *args, **options):
+        events = Event.objects.exclude(image='').exclude(image__isnull=True).order_by('pk')
+        if not options['force']:
+            events = events.filter(image_width__isnull=True)
+        # The default SVG placeholder has no variants to build
+        events = events.exclude(image__iendswith='.svg')
+        pending = list(events.values_list('pk', 'image'))
+        if not pending:
+            self.stdout.write(self.style.SUCCESS('No event images need processing'))
+            return
+
+        processed = skipped = 0
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as executor:
+            futures = [executor.submit(_process, pk, name) for pk, name in pending]
+            for future in futures:
+                pk, result = future.result()
+                if result is None:
+                    skipped += 1
+                    self.stdout.write(self.style.WARNING(f'Event {pk}: image could not be read'))
+                    continue
+                Event.objects.filter(pk=pk).update(**images.image_fields(result))
+                processed += 1
+                if processed % 100 == 0:
+                    self.stdout.write(f'Processed {processed} images...')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully processed {processed} event images ({skipped} skipped)')
+        )
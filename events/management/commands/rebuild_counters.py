@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from events.counters import rebuild_counters
+
+class Command(BaseCommand):
+    help = 'Rebuild denormalized RSVP counters (per event, per user and total participants)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event', type=int, action='append', dest='event_ids',
+            help='Only rebuild the given event (repeatable)'
+        )
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Only rebuild the given user (repeatable)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows updated per transaction (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        event_ids, user_ids = options['event_ids'], options['user_ids']
+        if (event_ids is None) != (user_ids is None):
+            # Rebuilding one side only leaves the other untouched
+            event_ids, user_ids = event_ids or [], user_ids or []
+        total = rebuild_counters(
+            event_ids=event_ids,
+            user_ids=user_ids,
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Counters rebuilt. Total participants: {total}')
+        )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from events import search
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search document of every event in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of events indexed per transaction (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        backend = search.get_backend()
+        if backend == 'basic':
+            self.stdout.write(
+                self.style.WARNING('No full-text index on this database; search uses basic matching.')
+            )
+            return
+
+        indexed = 0
+        for indexed in search.reindex_all(batch_size=options['batch_size']):
+            self.stdout.write(f'Indexed {indexed} events...')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully reindexed {indexed} events ({backend})')
+        )
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from events import archive
+from events.models import ArchivedEvent
+
+class Command(BaseCommand):
+    help = 'Move archived events, their RSVPs and registrations back to the live tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', type=int, help='Archived events to restore')
+        parser.add_argument('--category', type=int, help='Only restore events of this category id')
+        parser.add_argument('--start-date', help='Only restore events on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--end-date', help='Only restore events on or before this date (YYYY-MM-DD)')
+        parser.add_argument(
+            '--batch-size', type=int, default=archive.ARCHIVE_BATCH_SIZE,
+            help=f'Number of events moved per transaction (default: {archive.ARCHIVE_BATCH_SIZE})'
+        )
+
+    def _date(self, value, option):
+        if value is None:
+            return None
+        date = parse_date(value)
+        if date is None:
+            raise CommandError(f'{option} must be a date (YYYY-MM-DD)')
+        return date
+
+    def handle(self, *args, **options):
+        start_date = self._date(options['start_date'], '--start-date')
+        end_date = self._date(options['end_date'], '--end-date')
+        if not (options['event_ids'] or options['category'] or start_date or end_date):
+            raise CommandError('Name the events to restore: ids, --category, --start-date and/or --end-date')
+
+        events = ArchivedEvent.objects.all()
+        if options['event_ids']:
+            events = events.filter(pk__in=options['event_ids'])
+        if options['category']:
+            events = events.filter(category_id=options['category'])
+        if start_date:
+            events = events.filter(date__gte=start_date)
+        if end_date:
+            events = events.filter(date__lte=end_date)
+
+        restored = 0
+        for restored in archive.restore_events(events, batch_size=options['batch_size']):
+            self.stdout.write(f'Restored {restored} events...')
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully restored {restored} events'))
@@ -0,0 +1,38 @@
+import sqlite3
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+class Command(BaseCommand):
+    help = 'Copy a SQLite primary database into its SQLite replicas, to try replica routing locally'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Keep copying every this many seconds, simulating replication lag (default: 0, copy once)'
+        )
+
+    def _path(self, alias):
+        database = settings.DATABASES[alias]
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError(f'{alias} is not a SQLite database')
+        return database['NAME']
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('No replicas configured; set REPLICA_DATABASE_URLS')
+        primary = self._path('default')
+        replicas = {alias: self._path(alias) for alias in settings.DATABASE_REPLICAS}
+
+        while True:
+            with closing(sqlite3.connect(primary)) as source:
+                for path in replicas.values():
+                    with closing(sqlite3.connect(path)) as target:
+                        # The backup API copies a consistent snapshot, even while the primary is written to
+                        source.backup(target)
+            self.stdout.write(self.style.SUCCESS(f"Copied {primary} to {', '.join(replicas.values())}"))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    RSVP = apps.get_model('events', 'RSVP')
+    SiteCounter = apps.get_model('events', 'SiteCounter')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    def count_for(field):
+        counts = (
+            RSVP.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return Coalesce(Subquery(counts), Value(0))
+
+    Event.objects.update(rsvp_count=count_for('event'))
+    User.objects.update(rsvp_count=count_for('user'))
+    SiteCounter.objects.update_or_create(
+        name='participants',
+        defaults={'value': RSVP.objects.order_by().values('user').distinct().count()},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0002_event_keyset_index'),
+        ('accounts', '0002_customuser_rsvp_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Site Counter',
+                'verbose_name_plural': 'Site Counters',
+            },
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rsvp_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='sharded_counter',
+            field=models.BooleanField(default=False, help_text='Spread RSVP count updates over counter shards (for very popular events)'),
+        ),
+        migrations.CreateModel(
+            name='EventCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counter_shards', to='events.event')),
+            ],
+            options={
+                'verbose_name': 'Event Counter Shard',
+                'verbose_name_plural': 'Event Counter Shards',
+                'unique_together': {('event', 'shard')},
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:58
+
+import django.contrib.postgres.search
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX event_search_vector_gin ON events_event USING gin (search_vector)"
+        )
+        schema_editor.execute(
+            """
+            UPDATE events_event AS e SET search_vector =
+                setweight(to_tsvector('english', coalesce(e.name, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(c.name, '')), 'B') ||
+                setweight(to_tsvector('english', coalesce(e.location, '')), 'B') ||
+                setweight(to_tsvector('english', coalesce(e.description, '')), 'C')
+            FROM events_category AS c
+            WHERE c.id = e.category_id
+            """
+        )
+    elif connection.vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE events_event_fts USING fts5("
+                "name, category, location, description, tokenize = 'porter unicode61')"
+            )
+        except OperationalError:
+            # SQLite built without FTS5: search falls back to icontains
+            return
+        schema_editor.execute(
+            """
+            INSERT INTO events_event_fts (rowid, name, category, location, description)
+            SELECT e.id, e.name, c.name, e.location, e.description
+            FROM events_event AS e JOIN events_category AS c ON c.id = e.category_id
+            """
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS event_search_vector_gin")
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS events_event_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_rsvp_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
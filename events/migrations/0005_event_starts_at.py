@@ -0,0 +1,68 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:59
+
+import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_starts_at(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    tz = timezone.get_default_timezone()
+    batch = []
+    for event in Event.objects.only('pk', 'date', 'time').iterator(chunk_size=1000):
+        event.starts_at = timezone.make_aware(datetime.datetime.combine(event.date, event.time), tz)
+        batch.append(event)
+        if len(batch) >= 1000:
+            Event.objects.bulk_update(batch, ['starts_at'])
+            batch = []
+    if batch:
+        Event.objects.bulk_update(batch, ['starts_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0004_event_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='event',
+            name='event_date_time_id_idx',
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='ends_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='starts_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_starts_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='event',
+            name='starts_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['starts_at', 'id'], name='event_starts_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['category', 'starts_at'], name='event_category_starts_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['created_by', 'starts_at'], name='event_creator_starts_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rsvp',
+            index=models.Index(fields=['event', 'rsvp_date'], name='rsvp_event_date_idx'),
+        ),
+    ]
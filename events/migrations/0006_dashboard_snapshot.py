@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_event_starts_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_events', models.PositiveIntegerField(default=0)),
+                ('upcoming_events', models.PositiveIntegerField(default=0)),
+                ('past_events', models.PositiveIntegerField(default=0)),
+                ('todays_events', models.PositiveIntegerField(default=0)),
+                ('day', models.DateField()),
+                ('as_of', models.DateTimeField()),
+                ('valid_until', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Dashboard Snapshot',
+                'verbose_name_plural': 'Dashboard Snapshots',
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(max_length=100)),
+                ('frame', models.TextField()),
+                ('origin', models.CharField(max_length=32)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Live Message',
+                'verbose_name_plural': 'Live Messages',
+            },
+        ),
+    ]
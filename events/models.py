@@ -1,13 +1,19 @@
-from django.db import models
+from django.db import models, transaction
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+import datetime
 
 User = get_user_model()
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = 'Category'
@@ -16,6 +22,64 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+def _as_date(value):
+    if isinstance(value, datetime.date) or not value:
+        return value or None
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+class EventQuerySet(models.QuerySet):
+    def upcoming(self, now=None):
+        return self.filter(starts_at__gt=now or timezone.now())
+    
+    def past(self, now=None):
+        return self.filter(starts_at__lte=now or timezone.now())
+    
+    def in_date_range(self, start_date=None, end_date=None):
+        """Inclusive range of local dates, expressed as a starts_at range scan"""
+        start_date, end_date = _as_date(start_date), _as_date(end_date)
+        queryset = self
+        if start_date:
+            queryset = queryset.filter(
+                starts_at__gte=self.model.compute_starts_at(start_date, datetime.time.min)
+            )
+        if end_date:
+            queryset = queryset.filter(
+                starts_at__lt=self.model.compute_starts_at(end_date + datetime.timedelta(days=1), datetime.time.min)
+            )
+        return queryset
+    
+    def on_day(self, day):
+        return self.in_date_range(day, day)
+    
+    def apply_filters(self, category=None, start_date=None, end_date=None):
+        """The category / date range filters shared by the event listings"""
+        queryset = self
+        if category and str(category).isdigit():
+            queryset = queryset.filter(category_id=category)
+        return queryset.in_date_range(start_date, end_date)
+    
+    def with_attendee_preview(self, size=5):
+        """Prefetch the first `size` RSVPs of each event into `attendee_preview`"""
+        rsvps = RSVP.objects.select_related('user').only('event', 'rsvp_date', 'user__username')
+        return self.prefetch_related(models.Prefetch(
+            'rsvp_set', queryset=rsvps.order_by('rsvp_date', 'pk')[:size], to_attr='attendee_preview'
+        ))
+    
+    def with_attendee_count(self):
+        """Annotate `attendee_count`, so get_rsvp_count() needs no query for sharded events"""
+        return self.annotate(attendee_count=attendee_count_expression())
+
+def attendee_count_expression():
+    """rsvp_count plus any unfolded counter shards, i.e. Event.get_rsvp_count() in SQL"""
+    shards = (
+        EventCounterShard.objects.filter(event=OuterRef('pk'))
+        .order_by().values('event').annotate(total=Sum('count')).values('total')
+    )
+    return F('rsvp_count') + Coalesce(Subquery(shards), 0)
+
 class Event(models.Model):
     name = models.CharField(max_length=200)
     description = models.TextField()
@@ -24,35 +88,73 @@ class Event(models.Model):
     location = models.CharField(max_length=255)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='events')
     image = models.ImageField(upload_to='events/', default='events/defaults/default_event.svg', blank=True, null=True)
+    # Filled in by events.images when the image is uploaded
+    image_width = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    image_height = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_events', null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # date + time as an aware datetime, kept in sync by save()
+    starts_at = models.DateTimeField(editable=False)
+    ends_at = models.DateTimeField(blank=True, null=True)
+    
+    # Maintained by events.counters; rebuild with `manage.py rebuild_counters`
+    rsvp_count = models.PositiveIntegerField(default=0, editable=False)
+    sharded_counter = models.BooleanField(
+        default=False,
+        help_text="Spread RSVP count updates over counter shards (for very popular events)"
+    )
+    # Weighted search document, maintained by events.search (PostgreSQL only)
+    search_vector = SearchVectorField(null=True, editable=False)
     
     rsvp_participants = models.ManyToManyField(User, through='RSVP', related_name='rsvp_events')
+    
+    objects = EventQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Event'
         verbose_name_plural = 'Events'
+        indexes = [
+            # Keyset pagination and upcoming/past range scans
+            models.Index(fields=['starts_at', 'id'], name='event_starts_at_id_idx'),
+            models.Index(fields=['category', 'starts_at'], name='event_category_starts_at_idx'),
+            models.Index(fields=['created_by', 'starts_at'], name='event_creator_starts_at_idx'),
+        ]
 
     def __str__(self):
         return self.name
     
     def get_rsvp_count(self):
         """Get the number of attending RSVPs for this event"""
-        return self.rsvp_set.count()
+        if hasattr(self, 'attendee_count'):
+            return self.attendee_count
+        if not self.sharded_counter:
+            return self.rsvp_count
+        shards = self.counter_shards.aggregate(total=Sum('count'))['total'] or 0
+        return self.rsvp_count + shards
+    
+    @staticmethod
+    def compute_starts_at(date, time):
+        """Combine a local date and time into an aware datetime"""
+        return timezone.make_aware(
+            datetime.datetime.combine(date, time),
+            timezone.get_default_timezone()
+        )
+    
+    def save(self, *args, **kwargs):
+        self.starts_at = self.compute_starts_at(self.date, self.time)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'date', 'time'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'starts_at'}
+        # Keep the row write and the dashboard snapshot update from post_save atomic
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
     
     def has_passed(self):
         """Check if the event date and time has passed"""
-        from django.utils import timezone
-        import datetime
-        
-        # Combine date and time to create a datetime object
-        event_datetime = datetime.datetime.combine(self.date, self.time)
-        # Make it timezone aware
-        event_datetime = timezone.make_aware(event_datetime)
-        
-        return timezone.now() > event_datetime
+        return timezone.now() > self.starts_at
     
     def can_rsvp(self):
         """Check if users can still RSVP to this event"""
@@ -111,6 +213,17 @@ class UserProfile(models.Model):
     def email_verification_sent_at(self):
         return self.user.email_verification_sent_at
 
+class RSVPQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """Bulk insert RSVPs and apply the matching counter deltas in the same transaction"""
+        from .counters import record_bulk_rsvps
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            conflicts = kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts')
+            record_bulk_rsvps(created, exact=not conflicts)
+        return created
+
 class RSVP(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='rsvps')
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='rsvp_set')
@@ -118,14 +231,24 @@ class RSVP(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     notes = models.TextField(blank=True, null=True, help_text="Optional notes for the event organizer")
     
+    objects = RSVPQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'RSVP'
         verbose_name_plural = 'RSVPs'
         unique_together = ['user', 'event']
         ordering = ['-rsvp_date']
+        indexes = [
+            models.Index(fields=['event', 'rsvp_date'], name='rsvp_event_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.event.name} (Attending)"
+    
+    def save(self, *args, **kwargs):
+        # Keep the insert and the counter updates fired by post_save atomic
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
 
 class EventRegistration(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='event_registrations')
@@ -139,4 +262,146 @@ class EventRegistration(models.Model):
         unique_together = ['user', 'event']
     
     def __str__(self):
-        return f"{self.user.username} - {self.event.name}"
\ No newline at end of file
+        return f"{self.user.username} - {self.event.name}"
+
+class EventCounterShard(models.Model):
+    """One slice of a sharded RSVP counter; the event total is rsvp_count plus all shards"""
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='counter_shards')
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Event Counter Shard'
+        verbose_name_plural = 'Event Counter Shards'
+        unique_together = ['event', 'shard']
+    
+    def __str__(self):
+        return f"{self.event_id}#{self.shard}: {self.count}"
+
+class SiteCounter(models.Model):
+    """Named global counter maintained alongside RSVP writes"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Site Counter'
+        verbose_name_plural = 'Site Counters'
+    
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+class DashboardSnapshot(models.Model):
+    """
+    Single-row cache of the organizer dashboard event figures. The counts
+    hold for any moment between `as_of` and `valid_until` (the next event
+    start or the end of `day`); events.dashboard adjusts them on Event
+    changes and recomputes them once the window has passed.
+    """
+    total_events = models.PositiveIntegerField(default=0)
+    upcoming_events = models.PositiveIntegerField(default=0)
+    past_events = models.PositiveIntegerField(default=0)
+    todays_events = models.PositiveIntegerField(default=0)
+    day = models.DateField()
+    as_of = models.DateTimeField()
+    valid_until = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Dashboard Snapshot'
+        verbose_name_plural = 'Dashboard Snapshots'
+    
+    def __str__(self):
+        return f"Dashboard snapshot for {self.day}"
+    
+    def is_valid(self, now):
+        return self.as_of <= now < self.valid_until
+
+class LiveMessage(models.Model):
+    """Outbox of events.live.DatabaseBackend: one published frame, read by every process's poller"""
+    channel = models.CharField(max_length=100)
+    frame = models.TextField()
+    origin = models.CharField(max_length=32)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        verbose_name = 'Live Message'
+        verbose_name_plural = 'Live Messages'
+    
+    def __str__(self):
+        return f"{self.channel} #{self.pk}"
+
+class ArchivedEvent(models.Model):
+    """
+    An Event moved out of the hot tables by events.archive, under its
+    original primary key. Read-only; restore it with `manage.py restore_events`.
+    """
+    name = models.CharField(max_length=200)
+    description = models.TextField()
+    date = models.DateField()
+    time = models.TimeField()
+    location = models.CharField(max_length=255)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='archived_events')
+    image = models.ImageField(upload_to='events/', blank=True, null=True)
+    image_width = models.PositiveIntegerField(blank=True, null=True)
+    image_height = models.PositiveIntegerField(blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True)
+    created_by = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='archived_events', null=True, blank=True
+    )
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField(blank=True, null=True)
+    # Final attendee count, counter shards included
+    rsvp_count = models.PositiveIntegerField(default=0)
+    sharded_counter = models.BooleanField(default=False)
+    archived_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'Archived Event'
+        verbose_name_plural = 'Archived Events'
+        indexes = [
+            models.Index(fields=['starts_at', 'id'], name='archived_event_starts_at_idx'),
+            models.Index(fields=['category', 'starts_at'], name='archived_event_category_idx'),
+        ]
+    
+    def __str__(self):
+        return self.name
+    
+    def get_rsvp_count(self):
+        return self.rsvp_count
+    
+    def get_absolute_url(self):
+        from django.urls import reverse
+        return reverse('archived_event_detail', kwargs={'pk': self.pk})
+
+class ArchivedRSVP(models.Model):
+    """An RSVP of an ArchivedEvent; still counted in CustomUser.rsvp_count and the participant total"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_rsvps')
+    event = models.ForeignKey(ArchivedEvent, on_delete=models.CASCADE, related_name='rsvps')
+    rsvp_date = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    notes = models.TextField(blank=True, null=True)
+    
+    class Meta:
+        verbose_name = 'Archived RSVP'
+        verbose_name_plural = 'Archived RSVPs'
+        indexes = [
+            models.Index(fields=['event', 'rsvp_date'], name='archived_rsvp_event_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.event.name} (Archived)"
+
+class ArchivedEventRegistration(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_registrations')
+    event = models.ForeignKey(ArchivedEvent, on_delete=models.CASCADE, related_name='registrations')
+    registered_at = models.DateTimeField()
+    attended = models.BooleanField(default=False)
+    
+    class Meta:
+        verbose_name = 'Archived Event Registration'
+        verbose_name_plural = 'Archived Event Registrations'
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.event.name}"
@@ -0,0 +1,221 @@
+"""
+Full-page cache for anonymous visitors.
+
+Cached pages record the version of every tag they were rendered under
+('events', 'event:<pk>', 'category:<pk>', 'categories'); the signal
+receivers in events.signals replace a tag's version after the change
+commits, which makes exactly the dependent pages stale.
+
+A stale page (tag changed, or older than PAGE_CACHE_FRESH seconds) is
+still served for up to PAGE_CACHE_STALE seconds while one request
+regenerates it. Regeneration is single-flight: the request that wins a
+cache.add() lock renders, everyone else gets the stale copy or, on a cold
+miss, waits briefly for the winner's result.
+
+Regeneration reads from the primary (EMS.db_router.read_from_primary):
+right after an invalidation a replica may still hold the old rows, and
+caching them under the new tag version would serve them until the next
+change.
+
+Coroutine views get the same behaviour through the async cache API.
+
+With the default per-process LocMemCache, each worker keeps its own copy;
+configure a shared backend (CACHE_BACKEND / CACHE_LOCATION) in production.
+"""
+import asyncio
+import hashlib
+import time
+import uuid
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from accounts.roles import aload_user
+from EMS.db_router import read_from_primary
+
+from .models import Event
+
+PAGE_CACHE_FRESH = getattr(settings, 'PAGE_CACHE_FRESH', 60)
+PAGE_CACHE_STALE = getattr(settings, 'PAGE_CACHE_STALE', 600)
+PAGE_CACHE_LOCK_TIMEOUT = getattr(settings, 'PAGE_CACHE_LOCK_TIMEOUT', 30)
+PAGE_CACHE_WAIT = getattr(settings, 'PAGE_CACHE_WAIT', 5)
+
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Vary', 'Content-Language')
+
+
+def _tag_key(tag):
+    return f'pagecache:tag:{tag}'
+
+
+def _page_key(request):
+    path = hashlib.sha1(request.get_full_path().encode()).hexdigest()
+    return f'pagecache:page:{path}'
+
+
+def tag_versions(tags):
+    found = cache.get_many([_tag_key(tag) for tag in tags])
+    return {tag: found.get(_tag_key(tag)) for tag in tags}
+
+
+async def atag_versions(tags):
+    found = await cache.aget_many([_tag_key(tag) for tag in tags])
+    return {tag: found.get(_tag_key(tag)) for tag in tags}
+
+
+def invalidate(*tags):
+    """Give each tag a fresh version; pages rendered under the old one become stale"""
+    cache.set_many({_tag_key(tag): uuid.uuid4().hex for tag in tags}, None)
+
+
+def listing_tags(request, *args, **kwargs):
+    return ['events']
+
+
+def event_tags(request, pk, *args, **kwargs):
+    category_id = Event.objects.filter(pk=pk).values_list('category_id', flat=True).first()
+    return [f'event:{pk}', f'category:{category_id}']
+
+
+def category_tags(request, *args, **kwargs):
+    return ['categories']
+
+
+def _cacheable_request(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and not len(messages.get_messages(request))
+    )
+
+
+def _from_entry(request, entry, state):
+    etag = entry['headers'].get('ETag')
+    last_modified = parse_http_date_safe(entry['headers'].get('Last-Modified', ''))
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(entry['content'], status=entry['status'])
+        for header, value in entry['headers'].items():
+            response[header] = value
+    response['X-Page-Cache'] = state
+    return response
+
+
+def _entry(request, response, versions):
+    """The cache entry for `response`, or None when it must not be shared"""
+    if response.status_code != 200 or response.cookies or response.streaming:
+        return None
+    # Pages that hand out a CSRF token or touch the session are per-visitor
+    if request.META.get('CSRF_COOKIE_NEEDS_UPDATE') or request.session.modified:
+        return None
+    return {
+        'content': response.content,
+        'status': response.status_code,
+        'headers': {header: response[header] for header in CACHED_HEADERS if response.has_header(header)},
+        'versions': versions,
+        'fresh_until': time.time() + PAGE_CACHE_FRESH,
+    }
+
+
+def _store(request, key, response, versions):
+    entry = _entry(request, response, versions)
+    if entry is not None:
+        cache.set(key, entry, PAGE_CACHE_FRESH + PAGE_CACHE_STALE)
+
+
+async def _astore(request, key, response, versions):
+    entry = _entry(request, response, versions)
+    if entry is not None:
+        await cache.aset(key, entry, PAGE_CACHE_FRESH + PAGE_CACHE_STALE)
+
+
+def cache_anonymous_page(tags_func):
+    """Cache a view's page for anonymous GETs; `tags_func(request, *args, **kwargs)` lists its tags"""
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            return _cache_async_page(view_func, tags_func)
+
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if not _cacheable_request(request):
+                return view_func(request, *args, **kwargs)
+
+            key = _page_key(request)
+            entry = cache.get(key)
+            if entry is not None and entry['fresh_until'] > time.time() \
+                    and tag_versions(entry['versions']) == entry['versions']:
+                return _from_entry(request, entry, 'hit')
+
+            lock = f'{key}:lock'
+            if cache.add(lock, 1, PAGE_CACHE_LOCK_TIMEOUT):
+                try:
+                    with read_from_primary():
+                        # Versions are read before rendering so a change committed mid-render leaves the entry stale
+                        versions = tag_versions(tags_func(request, *args, **kwargs))
+                        response = view_func(request, *args, **kwargs)
+                        if hasattr(response, 'render') and callable(response.render):
+                            response.render()
+                    _store(request, key, response, versions)
+                finally:
+                    cache.delete(lock)
+                response['X-Page-Cache'] = 'miss'
+                return response
+
+            if entry is not None:
+                return _from_entry(request, entry, 'stale')
+
+            # Cold miss while another request renders: wait for its result
+            deadline = time.monotonic() + PAGE_CACHE_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                entry = cache.get(key)
+                if entry is not None:
+                    return _from_entry(request, entry, 'hit')
+            return view_func(request, *args, **kwargs)
+        return _wrapped_view
+    return decorator
+
+
+def _cache_async_page(view_func, tags_func):
+    """cache_anonymous_page() for coroutine views"""
+    @wraps(view_func)
+    async def _async_view(request, *args, **kwargs):
+        await aload_user(request)
+        if not _cacheable_request(request):
+            return await view_func(request, *args, **kwargs)
+
+        key = _page_key(request)
+        entry = await cache.aget(key)
+        if entry is not None and entry['fresh_until'] > time.time() \
+                and await atag_versions(entry['versions']) == entry['versions']:
+            return _from_entry(request, entry, 'hit')
+
+        lock = f'{key}:lock'
+        if await cache.aadd(lock, 1, PAGE_CACHE_LOCK_TIMEOUT):
+            try:
+                with read_from_primary():
+                    tags = await sync_to_async(tags_func)(request, *args, **kwargs)
+                    versions = await atag_versions(tags)
+                    response = await view_func(request, *args, **kwargs)
+                await _astore(request, key, response, versions)
+            finally:
+                await cache.adelete(lock)
+            response['X-Page-Cache'] = 'miss'
+            return response
+
+        if entry is not None:
+            return _from_entry(request, entry, 'stale')
+
+        deadline = time.monotonic() + PAGE_CACHE_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            entry = await cache.aget(key)
+            if entry is not None:
+                return _from_entry(request, entry, 'hit')
+        return await view_func(request, *args, **kwargs)
+    return _async_view
@@ -0,0 +1,192 @@
+from django.core import signing
+from django.db.models import Q
+
+CURSOR_SALT = 'events.pagination.cursor'
+
+
+class InvalidCursor(Exception):
+    """Raised when a cursor token cannot be decoded"""
+
+
+class KeysetPage:
+    """A single page of results produced by KeysetPaginator"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Cursor based paginator ordering on a fixed tuple of model fields.
+    The last key must be unique (normally 'pk') so the ordering is total
+    and every page boundary is stable regardless of concurrent inserts.
+    Prefix a key with '-' to order it descending.
+    """
+
+    def __init__(self, queryset, keys, per_page=12):
+        self.queryset = queryset
+        self.ordering = tuple(keys)
+        self.keys = tuple(key.lstrip('-') for key in keys)
+        self.descending = tuple(key.startswith('-') for key in keys)
+        self.per_page = per_page
+        self.model = queryset.model
+
+    def _field(self, key):
+        if key == 'pk':
+            return self.model._meta.pk
+        return self.model._meta.get_field(key)
+
+    def _key_string(self, obj, key):
+        """Serialized key value of a model instance or a .values() row"""
+        if isinstance(obj, dict):
+            value = obj[key]
+            return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        return self._field(key).value_to_string(obj)
+
+    def encode_cursor(self, obj, direction):
+        values = [self._key_string(obj, key) for key in self.keys]
+        return signing.dumps({'d': direction, 'v': values}, salt=CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, token):
+        try:
+            data = signing.loads(token, salt=CURSOR_SALT)
+            direction, raw_values = data['d'], data['v']
+        except (signing.BadSignature, KeyError, TypeError):
+            raise InvalidCursor(token)
+        if direction not in ('n', 'p') or len(raw_values) != len(self.keys):
+            raise InvalidCursor(token)
+        try:
+            values = [self._field(key).to_python(raw) for key, raw in zip(self.keys, raw_values)]
+        except Exception:
+            raise InvalidCursor(token)
+        return direction, values
+
+    def _seek(self, values, forward):
+        """Build (a > x) OR (a = x AND b > y) ... for the given key values"""
+        condition = Q()
+        for index, key in enumerate(self.keys):
+            lookup = 'gt' if forward != self.descending[index] else 'lt'
+            clause = Q(**{f'{key}__{lookup}': values[index]})
+            for prev_key, prev_value in zip(self.keys[:index], values[:index]):
+                clause &= Q(**{prev_key: prev_value})
+            condition |= clause
+        return condition
+
+    def _reversed_ordering(self):
+        return [key[1:] if key.startswith('-') else f'-{key}' for key in self.ordering]
+
+    def _resolve(self, token):
+        """Return (direction, values, queryset) for `token`; invalid tokens mean the first page"""
+        direction, values = 'n', None
+        if token:
+            try:
+                direction, values = self.decode_cursor(token)
+            except InvalidCursor:
+                direction, values = 'n', None
+
+        queryset = self.queryset
+        if direction == 'n':
+            if values is not None:
+                queryset = queryset.filter(self._seek(values, forward=True))
+            queryset = queryset.order_by(*self.ordering)
+        else:
+            queryset = queryset.filter(self._seek(values, forward=False))
+            queryset = queryset.order_by(*self._reversed_ordering())
+        return direction, values, queryset
+
+    def get_page(self, token=None):
+        """Return the page addressed by `token`, or the first page when empty/invalid"""
+        direction, values, queryset = self._resolve(token)
+
+        rows = list(queryset[:self.per_page + 1])
+        return self._page(rows, direction, values)
+
+    async def aget_page(self, token=None):
+        """get_page() for async views, fetching the rows with the async ORM"""
+        direction, values, queryset = self._resolve(token)
+        rows = [row async for row in queryset[:self.per_page + 1]]
+        return self._page(rows, direction, values)
+
+    def _page(self, rows, direction, values):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if direction == 'p':
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(rows[-1], 'n')
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(rows[0], 'p')
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def stream_page(self, token=None, chunk_size=100):
+        """
+        Forward-only variant of get_page() that yields rows through
+        QuerySet.iterator(), i.e. a server-side cursor where supported.
+        """
+        return KeysetStream(self, token, chunk_size)
+
+
+class KeysetStream:
+    """
+    Iterable (or async iterable) page of rows; `next_cursor` and `count`
+    are known once iteration ends
+    """
+
+    def __init__(self, paginator, token, chunk_size):
+        self.paginator = paginator
+        self.token = token
+        self.chunk_size = chunk_size
+        self.next_cursor = None
+        self.count = 0
+        self._last = None
+
+    def _queryset(self):
+        paginator = self.paginator
+        direction, values, queryset = paginator._resolve(self.token)
+        if direction != 'n':
+            direction, values, queryset = paginator._resolve(None)
+        return queryset[:paginator.per_page + 1]
+
+    def _accept(self, row):
+        """Count `row` and return True, or record the next cursor and return False once the page is full"""
+        if self.count == self.paginator.per_page:
+            self.next_cursor = self.paginator.encode_cursor(self._last, 'n')
+            return False
+        self.count += 1
+        self._last = row
+        return True
+
+    def __iter__(self):
+        for row in self._queryset().iterator(chunk_size=self.chunk_size):
+            if not self._accept(row):
+                break
+            yield row
+
+    async def __aiter__(self):
+        async for row in self._queryset().aiterator(chunk_size=self.chunk_size):
+            if not self._accept(row):
+                break
+            yield row
@@ -0,0 +1,207 @@
+"""
+Full-text search for events.
+
+Each event gets a weighted search document built from its name (A),
+category and location (B) and description (C).
+
+* PostgreSQL: stored in Event.search_vector (tsvector) with a GIN index
+  and ranked with ts_rank.
+* SQLite: mirrored into the FTS5 table `events_event_fts` and ranked
+  with bm25().
+* Anything else (or SQLite built without FTS5) falls back to icontains
+  matching ordered by date.
+
+The document is refreshed from the Event/Category signals in
+events.signals; `manage.py reindex_events` rebuilds it in batches.
+Documents are written on the database the router picks for Event writes
+and searched on the one the queryset reads from.
+"""
+import re
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Q
+
+from .models import Category, Event
+
+FTS_TABLE = 'events_event_fts'
+SEARCH_CONFIG = getattr(settings, 'EVENT_SEARCH_CONFIG', 'english')
+SEARCH_RESULT_LIMIT = getattr(settings, 'EVENT_SEARCH_RESULT_LIMIT', 50)
+
+# bm25() column weights, in FTS5 column order: name, category, location, description
+FTS_WEIGHTS = (10.0, 4.0, 4.0, 1.0)
+
+# Whether FTS_TABLE exists, per database alias
+_fts5_available = {}
+
+
+def _write_db():
+    return router.db_for_write(Event)
+
+
+def get_backend(using=None):
+    """Return 'postgresql', 'fts5' or 'basic' for the database `using` (default: where events are written)"""
+    using = using or _write_db()
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite':
+        if using not in _fts5_available:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = %s",
+                    [FTS_TABLE],
+                )
+                _fts5_available[using] = cursor.fetchone()[0] > 0
+        if _fts5_available[using]:
+            return 'fts5'
+    return 'basic'
+
+
+def _reindex(where, params):
+    """Rebuild the search document for the events matched by `where` (SQL on alias e)"""
+    using = _write_db()
+    backend = get_backend(using)
+    event_table = Event._meta.db_table
+    category_table = Category._meta.db_table
+    with connections[using].cursor() as cursor:
+        if backend == 'postgresql':
+            cursor.execute(
+                f"""
+                UPDATE {event_table} AS e SET search_vector =
+                    setweight(to_tsvector(%s, coalesce(e.name, '')), 'A') ||
+                    setweight(to_tsvector(%s, coalesce(c.name, '')), 'B') ||
+                    setweight(to_tsvector(%s, coalesce(e.location, '')), 'B') ||
+                    setweight(to_tsvector(%s, coalesce(e.description, '')), 'C')
+                FROM {category_table} AS c
+                WHERE c.id = e.category_id AND {where}
+                """,
+                [SEARCH_CONFIG] * 4 + list(params),
+            )
+        elif backend == 'fts5':
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT e.id FROM {event_table} AS e WHERE {where})",
+                params,
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {FTS_TABLE} (rowid, name, category, location, description)
+                SELECT e.id, e.name, c.name, e.location, e.description
+                FROM {event_table} AS e JOIN {category_table} AS c ON c.id = e.category_id
+                WHERE {where}
+                """,
+                params,
+            )
+
+
+def index_event(event_id):
+    _reindex('e.id = %s', [event_id])
+
+
+def index_events(event_ids):
+    """Refresh several events at once, e.g. after a bulk_create"""
+    event_ids = list(event_ids)
+    if event_ids:
+        placeholders = ', '.join(['%s'] * len(event_ids))
+        _reindex(f'e.id IN ({placeholders})', event_ids)
+
+
+def index_category(category_id):
+    """Refresh every event in a category, e.g. after the category is renamed"""
+    _reindex('e.category_id = %s', [category_id])
+
+
+def remove_event(event_id):
+    remove_events([event_id])
+
+
+def remove_events(event_ids):
+    """Drop several events' documents, e.g. after they are archived"""
+    event_ids = list(event_ids)
+    using = _write_db()
+    if event_ids and get_backend(using) == 'fts5':
+        placeholders = ', '.join(['%s'] * len(event_ids))
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", event_ids)
+
+
+def reindex_all(batch_size=500):
+    """Rebuild every search document in primary key ranges; yields the number indexed so far"""
+    using = _write_db()
+    if get_backend(using) == 'basic':
+        return
+    indexed = 0
+    last_pk = 0
+    while True:
+        pks = list(
+            Event.objects.using(using).filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            break
+        with transaction.atomic(using=using):
+            _reindex('e.id >= %s AND e.id <= %s', [pks[0], pks[-1]])
+        indexed += len(pks)
+        last_pk = pks[-1]
+        yield indexed
+
+
+def _fts5_query(text):
+    """Turn free text into a safe FTS5 expression: every word as a quoted prefix term"""
+    terms = re.findall(r'\w+', text)
+    return ' '.join('"%s"*' % term for term in terms)
+
+
+def search_events(text, queryset=None, limit=SEARCH_RESULT_LIMIT):
+    """
+    Return up to `limit` events from `queryset` matching `text`, best match
+    first. Each event carries a `search_rank` attribute (higher is better,
+    None for the fallback backend).
+    """
+    if queryset is None:
+        queryset = Event.objects.select_related('category')
+    text = (text or '').strip()
+    if not text:
+        return []
+
+    backend = get_backend(queryset.db)
+    if backend == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        from django.db.models import F
+
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+        return list(
+            queryset.filter(search_vector=query)
+            .annotate(search_rank=SearchRank(F('search_vector'), query))
+            .order_by('-search_rank', 'starts_at', 'pk')[:limit]
+        )
+
+    if backend == 'fts5':
+        match = _fts5_query(text)
+        if not match:
+            return []
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        # Match only within the queryset, so its filters apply before the limit
+        candidates, params = queryset.order_by().values('pk').query.get_compiler(queryset.db).as_sql()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                f"SELECT {FTS_TABLE}.rowid, bm25({FTS_TABLE}, {weights}) AS score FROM {FTS_TABLE} "
+                f"JOIN {Event._meta.db_table} AS e ON e.id = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid IN ({candidates}) "
+                f"ORDER BY score, e.starts_at, e.id LIMIT %s",
+                [match, *params, limit],
+            )
+            # bm25 scores are negative, lower is better
+            ranks = dict(cursor.fetchall())
+        events = queryset.in_bulk(list(ranks))
+        for event in events.values():
+            event.search_rank = -ranks[event.pk]
+        return [events[pk] for pk in ranks if pk in events]
+
+    events = queryset.filter(
+        Q(name__icontains=text) | Q(location__icontains=text) |
+        Q(description__icontains=text) | Q(category__name__icontains=text)
+    ).order_by('starts_at', 'pk')[:limit]
+    events = list(events)
+    for event in events:
+        event.search_rank = None
+    return events
@@ -1,35 +1,149 @@
-from django.db.models.signals import post_save, post_delete
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.contrib.auth.models import Group
-from .models import RSVP, UserProfile
+from .models import RSVP, UserProfile, Event, Category, ArchivedEvent, ArchivedRSVP
 from .utils import send_rsvp_confirmation_email, send_rsvp_update_email
+from .counters import (
+    ARCHIVED_EVENTS, _deleting_event, bump_site_counter, record_archived_rsvp_deleted, record_rsvp_created,
+    record_rsvp_deleted,
+)
+from . import live
+from . import search
+from . import dashboard
+from . import page_cache
+from . import conditional
 from accounts.utils import send_activation_email
 
 
 
+@receiver(pre_save, sender=Event)
+def remember_event_start(sender, instance, **kwargs):
+    """Stash the stored start time so post_save can tell whether it moved"""
+    instance._previous_starts_at = None
+    if instance.pk:
+        instance._previous_starts_at = (
+            Event.objects.filter(pk=instance.pk).values_list('starts_at', flat=True).first()
+        )
+
+@receiver(post_save, sender=Event)
+def update_dashboard_snapshot_on_save(sender, instance, created, **kwargs):
+    dashboard.record_event_saved(
+        instance, created, previous_starts_at=getattr(instance, '_previous_starts_at', None)
+    )
+
+@receiver(post_delete, sender=Event)
+def update_dashboard_snapshot_on_delete(sender, instance, **kwargs):
+    dashboard.record_event_deleted(instance)
+
+@receiver(post_save, sender=Event)
+def update_event_search_document(sender, instance, **kwargs):
+    """Refresh the event's full-text search document"""
+    search.index_event(instance.pk)
+
+@receiver(post_delete, sender=Event)
+def remove_event_search_document(sender, instance, **kwargs):
+    search.remove_event(instance.pk)
+
+@receiver(post_save, sender=Category)
+def update_category_search_documents(sender, instance, created, **kwargs):
+    """Category names are part of every event document in the category"""
+    if not created:
+        search.index_category(instance.pk)
+
+@receiver(post_save, sender=RSVP)
+def update_rsvp_counters_on_save(sender, instance, created, **kwargs):
+    """Keep event/user/participant counters in step with new RSVPs"""
+    if created:
+        record_rsvp_created(instance)
+
+@receiver(post_delete, sender=RSVP)
+def update_rsvp_counters_on_delete(sender, instance, **kwargs):
+    """Keep event/user/participant counters in step with removed RSVPs"""
+    record_rsvp_deleted(instance, origin=kwargs.get('origin'))
+
+# events.archive moves rows without signals; these only fire when archived rows are deleted for good
+@receiver(post_delete, sender=ArchivedRSVP)
+def update_counters_on_archived_rsvp_delete(sender, instance, **kwargs):
+    record_archived_rsvp_deleted(instance)
+
+@receiver(post_delete, sender=ArchivedEvent)
+def update_counters_on_archived_event_delete(sender, instance, **kwargs):
+    bump_site_counter(ARCHIVED_EVENTS, -1)
+    dashboard.record_event_deleted(instance)
+
+@receiver(post_save, sender=RSVP)
+def publish_rsvp_created(sender, instance, created, **kwargs):
+    """Push the new count and attendee to the event's live watchers"""
+    if created:
+        live.publish_rsvp(instance, 'created')
+
+@receiver(post_delete, sender=RSVP)
+def publish_rsvp_deleted(sender, instance, **kwargs):
+    if not _deleting_event(kwargs.get('origin')):
+        live.publish_rsvp(instance, 'deleted')
+
+def _invalidate_pages(*tags):
+    # After commit, so a regenerating request cannot cache the old rows under the new version
+    transaction.on_commit(lambda: _pages_changed(tags))
+
+def _pages_changed(tags):
+    page_cache.invalidate(*tags)
+    conditional.touch(*tags)
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_event_pages(sender, instance, **kwargs):
+    _invalidate_pages('events', f'event:{instance.pk}')
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_pages(sender, instance, **kwargs):
+    _invalidate_pages('events', 'categories', f'category:{instance.pk}')
+
+@receiver(post_save, sender=RSVP)
+@receiver(post_delete, sender=RSVP)
+def invalidate_rsvp_pages(sender, instance, **kwargs):
+    _invalidate_pages('events', f'event:{instance.event_id}')
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_attendee_pages(sender, instance, update_fields=None, **kwargs):
+    """Attendee names appear on the listings; logins only touch last_login"""
+    if update_fields and set(update_fields) <= {'last_login', 'rsvp_count'}:
+        return
+    if instance.rsvp_count:
+        _invalidate_pages('events')
+
 @receiver(post_save, sender=RSVP)
 def send_rsvp_notification(sender, instance, created, **kwargs):
     """Send email notification when user RSVPs to an event"""
+    user, event = instance.user, instance.event
+    # Send after commit so SMTP latency never holds the counter row locks
     if created:
         
-        send_rsvp_confirmation_email(instance.user, instance.event)
+        transaction.on_commit(lambda: send_rsvp_confirmation_email(user, event))
     else:
         
-        send_rsvp_update_email(instance.user, instance.event)
+        transaction.on_commit(lambda: send_rsvp_update_email(user, event))
 
 @receiver(post_delete, sender=RSVP)
 def send_rsvp_cancellation(sender, instance, **kwargs):
     """Send email notification when user cancels RSVP"""
+    user, event = instance.user, instance.event
+    transaction.on_commit(lambda: _send_rsvp_cancellation_email(user, event))
+
+def _send_rsvp_cancellation_email(user, event):
     from django.core.mail import send_mail
     from django.conf import settings
     from django.template.loader import render_to_string
     
-    subject = f'RSVP Cancelled for {instance.event.name}'
+    subject = f'RSVP Cancelled for {event.name}'
     
     context = {
-        'user': instance.user,
-        'event': instance.event,
+        'user': user,
+        'event': event,
     }
     
     
@@ -44,7 +158,7 @@ def send_rsvp_cancellation(sender, instance, **kwargs):
             subject=subject,
             message=plain_message,
             from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[instance.user.email],
+            recipient_list=[user.email],
             html_message=html_message,
             fail_silently=False,
         )
@@ -0,0 +1,46 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from ..images import VARIANT_FORMATS
+
+register = template.Library()
+
+MIME_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+
+def _srcset(paths):
+    widths = sorted(paths, key=int)
+    return ', '.join(f'{default_storage.url(paths[width])} {width}w' for width in widths), widths
+
+
+@register.simple_tag
+def event_picture(event, sizes='100vw', css_class='', lazy=True):
+    """
+    <picture> for an event image with WebP and JPEG srcsets over the stored
+    variants; falls back to a plain <img> of the original.
+    """
+    loading = 'lazy' if lazy else 'eager'
+    variants = event.image_variants or {}
+    fallback_key = VARIANT_FORMATS[-1][0]
+    if not variants.get(fallback_key):
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}" decoding="async">',
+            event.image.url, event.name, css_class, loading,
+        )
+
+    sources = []
+    for key, _, _, _ in VARIANT_FORMATS[:-1]:
+        if variants.get(key):
+            srcset, _ = _srcset(variants[key])
+            sources.append((MIME_TYPES[key], srcset, sizes))
+    srcset, widths = _srcset(variants[fallback_key])
+    largest = widths[-1]
+    height = round(event.image_height * int(largest) / event.image_width) if event.image_width else ''
+    return format_html(
+        '<picture class="block w-full h-full">{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" '
+        'alt="{}" class="{}" loading="{}" decoding="async"></picture>',
+        format_html_join('', '<source type="{}" srcset="{}" sizes="{}">', sources),
+        default_storage.url(variants[fallback_key][largest]), srcset, sizes, largest, height,
+        event.name, css_class, loading,
+    )
@@ -1,3 +1,1261 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import html
+import json
+import os
+import re
+import shutil
+import tempfile
+import types
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser, Group
+from django.contrib.sessions.models import Session
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from django.utils import timezone
+from PIL import Image
 
+from . import api, archive, async_views, benchmark, dashboard, exports, ical, importer, live, page_cache, search, views
+from .context_processors import navigation
+from .counters import (
+    ARCHIVED_EVENTS, PARTICIPANTS, bump_site_counter, count_participants, get_site_counter, get_total_participants,
+    rebuild_counters,
+)
+from .forms import EventForm
+from .models import (
+    ArchivedEvent, ArchivedEventRegistration, ArchivedRSVP, Category, DashboardSnapshot, Event, EventCounterShard,
+    EventRegistration, RSVP,
+)
+from .pagination import CURSOR_SALT, KeysetPaginator
+from .search import get_backend, search_events
+
+User = get_user_model()
+
+
+def make_user(username):
+    return User.objects.create_user(username, f'{username}@example.com', 'pw', email_verified=True)
+
+
+def make_event(name, category, hours=24, **kwargs):
+    """An event starting `hours` from now (negative for past events)"""
+    start = timezone.localtime() + datetime.timedelta(hours=hours)
+    kwargs.setdefault('description', f'About {name}')
+    return Event.objects.create(
+        name=name, date=start.date(), time=start.time().replace(microsecond=0), location='Main hall',
+        category=category, **kwargs
+    )
+
+
+class RSVPCounterTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Music')
+        self.event = make_event('Concert', self.category)
+        self.other_event = make_event('Recital', self.category)
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+
+    def assertCounts(self, event_count, alice_count, participants):
+        self.event.refresh_from_db()
+        self.alice.refresh_from_db()
+        self.assertEqual(self.event.get_rsvp_count(), event_count)
+        self.assertEqual(self.alice.rsvp_count, alice_count)
+        self.assertEqual(get_total_participants(), participants)
+
+    def test_rsvp_create_and_delete_adjust_counters(self):
+        rsvp = RSVP.objects.create(user=self.alice, event=self.event)
+        self.assertCounts(1, 1, 1)
+        RSVP.objects.create(user=self.alice, event=self.other_event)
+        self.assertCounts(1, 2, 1)
+        RSVP.objects.create(user=self.bob, event=self.event)
+        self.assertCounts(2, 2, 2)
+
+        rsvp.delete()
+        self.assertCounts(1, 1, 2)
+        RSVP.objects.get(user=self.alice).delete()
+        self.assertCounts(1, 0, 1)
+
+    def test_deleting_an_event_releases_its_participants(self):
+        RSVP.objects.create(user=self.alice, event=self.event)
+        RSVP.objects.create(user=self.bob, event=self.event)
+        RSVP.objects.create(user=self.bob, event=self.other_event)
+
+        self.event.delete()
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual(self.alice.rsvp_count, 0)
+        self.assertEqual(self.bob.rsvp_count, 1)
+        self.assertEqual(get_total_participants(), 1)
+
+    def test_bulk_create_applies_deltas(self):
+        RSVP.objects.bulk_create([
+            RSVP(user=self.alice, event=self.event),
+            RSVP(user=self.bob, event=self.event),
+            RSVP(user=self.alice, event=self.other_event),
+        ])
+        self.assertCounts(2, 2, 2)
+
+    def test_bulk_create_ignoring_conflicts_recounts(self):
+        RSVP.objects.create(user=self.alice, event=self.event)
+        RSVP.objects.bulk_create(
+            [RSVP(user=self.alice, event=self.event), RSVP(user=self.bob, event=self.event)],
+            ignore_conflicts=True,
+        )
+        self.assertCounts(2, 1, 2)
+
+    def test_sharded_counter_is_folded_by_rebuild(self):
+        self.event.sharded_counter = True
+        self.event.save()
+        for user in (self.alice, self.bob):
+            RSVP.objects.create(user=user, event=self.event)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.rsvp_count, 0)
+        self.assertEqual(self.event.get_rsvp_count(), 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(Event.objects.with_attendee_count().get(pk=self.event.pk).get_rsvp_count(), 2)
+
+        rebuild_counters()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.rsvp_count, 2)
+        self.assertFalse(EventCounterShard.objects.filter(event=self.event).exists())
+
+    def test_listings_do_not_query_shards_per_event(self):
+        def listing_queries(url, view=None):
+            cache.clear()
+            if view is not None:
+                request = RequestFactory().get(url)
+                request.user, request.session = User.objects.get(pk=self.alice.pk), session
+            with CaptureQueriesContext(connection) as queries:
+                response = view(request) if view else self.client.get(url)
+            self.assertContains(response, 'Concert')
+            return len(queries)
+
+        self.client.force_login(self.alice)
+        session = self.client.session
+        # home, EventListView and the (unrouted) function view
+        listings = [(reverse('home'),), (reverse('event_list'),), ('/events/', views.event_list)]
+        before = [listing_queries(*listing) for listing in listings]
+        for index in range(3):
+            event = make_event(f'Jam {index}', self.category, sharded_counter=True)
+            RSVP.objects.create(user=self.bob, event=event)
+        self.assertEqual([listing_queries(*listing) for listing in listings], before)
+
+    def test_rebuild_repairs_drifted_counters(self):
+        RSVP.objects.create(user=self.alice, event=self.event)
+        Event.objects.filter(pk=self.event.pk).update(rsvp_count=7)
+        User.objects.filter(pk=self.alice.pk).update(rsvp_count=3)
+
+        self.assertEqual(rebuild_counters(), 1)
+        self.assertCounts(1, 1, 1)
+        self.assertEqual(get_site_counter(PARTICIPANTS), 1)
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Talks')
+        # Pairs of events share a start time, so the pk breaks the ties; more than a page of the event list
+        cls.events = [make_event(f'Talk {index}', category, hours=24 + index // 2) for index in range(14)]
+        cls.ordered = list(Event.objects.order_by('starts_at', 'pk'))
+
+    def paginator(self):
+        return KeysetPaginator(Event.objects.all(), ('starts_at', 'pk'), per_page=3)
+
+    def test_walks_forward_and_back_without_gaps(self):
+        paginator = self.paginator()
+        pages = [paginator.get_page()]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual([event for page in pages for event in page], self.ordered)
+        self.assertEqual([len(page) for page in pages], [3, 3, 3, 3, 2])
+        self.assertFalse(pages[0].has_previous())
+
+        previous = paginator.get_page(pages[2].previous_cursor)
+        self.assertEqual(list(previous), list(pages[1]))
+        self.assertEqual(list(paginator.get_page(previous.previous_cursor)), list(pages[0]))
+
+    def test_page_boundary_is_stable_under_inserts(self):
+        paginator = self.paginator()
+        first = paginator.get_page()
+        make_event('Earlier talk', self.ordered[0].category, hours=2)
+        second = paginator.get_page(first.next_cursor)
+        self.assertEqual(list(second), self.ordered[3:6])
+
+    def test_invalid_cursor_gives_first_page(self):
+        page = self.paginator().get_page('not-a-cursor')
+        self.assertEqual(list(page), self.ordered[:3])
+
+    def test_event_list_follows_cursor(self):
+        first = self.client.get(reverse('event_list'))
+        self.assertEqual(first.status_code, 200)
+        cursor = first.context['page_obj'].next_cursor
+        self.assertIsNotNone(cursor)
+        second = self.client.get(reverse('event_list'), {'cursor': cursor})
+        self.assertEqual(
+            list(first.context['events']) + list(second.context['events']),
+            self.ordered[:len(first.context['events']) + len(second.context['events'])],
+        )
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.music = Category.objects.create(name='Music')
+        cls.sport = Category.objects.create(name='Sport')
+        cls.jazz = make_event('Jazz night', cls.music)
+        cls.mention = make_event('Open mic', cls.music, description='Bring your jazz standards')
+        cls.runs = [make_event(f'Jazz run {index}', cls.sport) for index in range(5)]
+
+    def names(self, results):
+        return [event.name for event in results]
+
+    def test_matches_name_category_location_and_description(self):
+        self.assertIn('Jazz night', self.names(search_events('jazz')))
+        self.assertIn('Open mic', self.names(search_events('standards')))
+        self.assertEqual(len(search_events('music')), 2)
+        self.assertEqual(search_events('   '), [])
+
+    def test_name_matches_rank_first(self):
+        if get_backend() == 'basic':
+            self.skipTest('The basic backend does not rank')
+        results = search_events('jazz', queryset=Event.objects.filter(category=self.music))
+        self.assertEqual(self.names(results), ['Jazz night', 'Open mic'])
+        self.assertGreater(results[0].search_rank, results[1].search_rank)
+
+    def test_filters_apply_before_the_limit(self):
+        results = search_events('jazz', queryset=Event.objects.filter(category=self.music), limit=2)
+        self.assertEqual(set(self.names(results)), {'Jazz night', 'Open mic'})
+        self.assertEqual(len(search_events('jazz', limit=3)), 3)
+
+    def test_documents_follow_event_and_category_changes(self):
+        self.jazz.name = 'Blues night'
+        self.jazz.description = 'Twelve bars'
+        self.jazz.save()
+        self.assertNotIn('Blues night', self.names(search_events('jazz')))
+        self.assertIn('Blues night', self.names(search_events('blues')))
+
+        self.sport.name = 'Athletics'
+        self.sport.save()
+        self.assertEqual(len(search_events('athletics')), 5)
+
+        self.mention.delete()
+        self.assertEqual(search_events('standards'), [])
+
+    def test_home_search(self):
+        response = self.client.get(reverse('home'), {'search': 'night'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names(response.context['events']), ['Jazz night'])
+
+
+class FTS5IndexTests(TestCase):
+    def setUp(self):
+        if get_backend() != 'fts5':
+            self.skipTest('Needs the SQLite FTS5 index')
+        self.category = Category.objects.create(name='Literature')
+        self.reading = make_event('Poetry reading', self.category, description='Sonnets')
+        self.signing = make_event('Book signing', self.category)
+
+    def indexed(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid, name, category, location, description FROM {search.FTS_TABLE} ORDER BY rowid')
+            return {row[0]: row[1:] for row in cursor.fetchall()}
+
+    def expected(self):
+        events = Event.objects.select_related('category').order_by('pk')
+        return {event.pk: (event.name, event.category.name, event.location, event.description) for event in events}
+
+    def test_index_follows_updates_and_deletes(self):
+        self.assertEqual(self.indexed(), self.expected())
+
+        self.reading.name = 'Verse reading'
+        self.reading.location = 'Library'
+        self.reading.save()
+        self.assertEqual(self.indexed()[self.reading.pk], ('Verse reading', 'Literature', 'Library', 'Sonnets'))
+
+        self.category.name = 'Books'
+        self.category.save()
+        self.assertEqual(self.indexed(), self.expected())
+
+        self.signing.delete()
+        self.assertEqual(self.indexed(), self.expected())
+        self.assertEqual(list(self.indexed()), [self.reading.pk])
+
+    def test_reindex_all_rebuilds_after_bulk_inserts(self):
+        start = timezone.localtime() + datetime.timedelta(days=2)
+        Event.objects.bulk_create([
+            Event(
+                name=f'Lecture {index}', description='Essays', date=start.date(), time=start.time(),
+                starts_at=start, location='Hall', category=self.category,
+            )
+            for index in range(3)
+        ])
+        self.assertEqual(len(self.indexed()), 2)
+        self.assertEqual(search_events('essays'), [])
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.FTS_TABLE} WHERE rowid = %s', [self.reading.pk])
+        self.assertEqual(list(search.reindex_all(batch_size=2)), [2, 4, 5])
+        self.assertEqual(self.indexed(), self.expected())
+        self.assertEqual(len(search_events('essays')), 3)
+
+        out = StringIO()
+        call_command('reindex_events', '--batch-size', '10', stdout=out)
+        self.assertIn('Successfully reindexed 5 events (fts5)', out.getvalue())
+        self.assertEqual(self.indexed(), self.expected())
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(name='Film')
+            self.event = make_event('Screening', self.category)
+        self.user = make_user('carol')
+
+    def etag(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def assertNotModified(self, url, etag, **params):
+        # Stale cached pages, unchanged validators: the 304 comes from condition()
+        page_cache.invalidate('events', 'categories', f'event:{self.event.pk}', f'category:{self.category.pk}')
+        self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_unchanged_pages_answer_304(self):
+        for url in (reverse('home'), reverse('event_list'), self.event.get_absolute_url(), reverse('category_list')):
+            with self.subTest(url=url):
+                self.assertNotModified(url, self.etag(url))
+
+    def test_rsvp_changes_listing_and_event_etags(self):
+        listing, detail = self.etag(reverse('event_list')), self.etag(self.event.get_absolute_url())
+        with self.captureOnCommitCallbacks(execute=True):
+            RSVP.objects.create(user=self.user, event=self.event)
+        self.assertNotEqual(self.etag(reverse('event_list')), listing)
+        self.assertNotEqual(self.etag(self.event.get_absolute_url()), detail)
+
+    def test_category_change_changes_category_list_etag(self):
+        etag = self.etag(reverse('category_list'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Cinema'
+            self.category.save()
+        self.assertNotEqual(self.etag(reverse('category_list')), etag)
+
+    def test_saves_bump_versions_without_writing_shared_rows(self):
+        url = reverse('event_list')
+        etag = self.etag(url)
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            self.event.save()
+        self.assertFalse([query for query in queries if 'events_sitecounter' in query['sql']])
+        changed = self.etag(url)
+        self.assertNotEqual(changed, etag)
+
+        # A lost version restarts rather than answering 304 to an old ETag
+        cache.clear()
+        self.assertNotIn(self.etag(url), (etag, changed))
+
+    def test_etag_covers_query_string_and_user(self):
+        url = reverse('event_list')
+        anonymous = self.client.get(url)
+        self.assertTrue(anonymous.has_header('Last-Modified'))
+        self.assertNotEqual(self.etag(url, category=self.category.pk), anonymous['ETag'])
+
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertNotEqual(response['ETag'], anonymous['ETag'])
+        self.assertFalse(response.has_header('Last-Modified'))
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(name='Theatre')
+            self.event = make_event('Hamlet', self.category)
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_anonymous_pages_are_served_from_cache(self):
+        for url in (reverse('event_list'), self.event.get_absolute_url(), reverse('category_list')):
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url)['X-Page-Cache'], 'miss')
+                with self.assertNumQueries(0):
+                    response = self.get(url)
+                self.assertEqual(response['X-Page-Cache'], 'hit')
+
+    def test_event_changes_invalidate_dependent_pages(self):
+        self.get(reverse('event_list'))
+        self.get(self.event.get_absolute_url())
+        Event.objects.filter(pk=self.event.pk).update(name='Macbeth')
+        self.assertNotContains(self.get(reverse('event_list')), 'Macbeth')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.refresh_from_db()
+            self.event.save()
+        self.assertContains(self.get(reverse('event_list')), 'Macbeth')
+        self.assertContains(self.get(self.event.get_absolute_url()), 'Macbeth')
+
+    def test_category_rename_invalidates_its_event_pages(self):
+        self.get(self.event.get_absolute_url())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Drama'
+            self.category.save()
+        self.assertContains(self.get(self.event.get_absolute_url()), 'Drama')
+
+    def test_rsvp_invalidates_the_event_page(self):
+        self.get(self.event.get_absolute_url())
+        with self.captureOnCommitCallbacks(execute=True):
+            RSVP.objects.create(user=make_user('dave'), event=self.event)
+        self.assertEqual(self.get(self.event.get_absolute_url())['X-Page-Cache'], 'miss')
+
+    def test_authenticated_pages_are_not_cached(self):
+        self.client.force_login(make_user('erin'))
+        self.assertFalse(self.get(reverse('event_list')).has_header('X-Page-Cache'))
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Workshops')
+        self.past = make_event('Old workshop', self.category, hours=-72)
+        self.upcoming = make_event('New workshop', self.category)
+        self.user = make_user('frank')
+        self.rsvp = RSVP.objects.create(user=self.user, event=self.past, notes='Vegetarian')
+        EventRegistration.objects.create(user=self.user, event=self.past, attended=True)
+        RSVP.objects.create(user=self.user, event=self.upcoming)
+
+    def archive(self):
+        return list(archive.archive_events(archive.archive_cutoff(1)))
+
+    def test_cutoff_must_be_a_day_back(self):
+        with self.assertRaises(ValueError):
+            archive.archive_cutoff(0)
+        with self.assertRaises(ValueError):
+            list(archive.archive_events(timezone.now()))
+
+    def test_archive_moves_past_events_with_their_rows(self):
+        self.assertEqual(self.archive(), [1])
+
+        self.assertFalse(Event.objects.filter(pk=self.past.pk).exists())
+        self.assertTrue(Event.objects.filter(pk=self.upcoming.pk).exists())
+        archived = ArchivedEvent.objects.get(pk=self.past.pk)
+        self.assertEqual((archived.name, archived.rsvp_count), ('Old workshop', 1))
+        archived_rsvp = ArchivedRSVP.objects.get(pk=self.rsvp.pk)
+        self.assertEqual((archived_rsvp.notes, archived_rsvp.rsvp_date), ('Vegetarian', self.rsvp.rsvp_date))
+        self.assertFalse(EventRegistration.objects.filter(event_id=self.past.pk).exists())
+        self.assertEqual(search_events('old'), [])
+
+        # Archived RSVPs still count for their user and the participant total
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.rsvp_count, 2)
+        self.assertEqual(get_total_participants(), 1)
+        self.assertEqual(get_site_counter(ARCHIVED_EVENTS), 1)
+        self.assertEqual(rebuild_counters(), 1)
+        self.assertEqual(get_site_counter(ARCHIVED_EVENTS), 1)
+
+    def test_old_links_redirect_to_the_archived_copy(self):
+        url = self.past.get_absolute_url()
+        self.archive()
+        response = self.client.get(url)
+        self.assertRedirects(response, reverse('archived_event_detail', args=[self.past.pk]))
+        self.assertContains(self.client.get(reverse('archive_list')), 'Old workshop')
+
+    def test_restore_moves_events_back(self):
+        self.archive()
+        self.assertEqual(list(archive.restore_events(ArchivedEvent.objects.all())), [1])
+
+        self.assertFalse(ArchivedEvent.objects.exists())
+        event = Event.objects.get(pk=self.past.pk)
+        self.assertEqual(event.get_rsvp_count(), 1)
+        self.assertEqual(RSVP.objects.get(pk=self.rsvp.pk).rsvp_date, self.rsvp.rsvp_date)
+        self.assertTrue(EventRegistration.objects.get(event=event).attended)
+        self.assertEqual([result.pk for result in search_events('old')], [event.pk])
+        self.assertEqual(get_site_counter(ARCHIVED_EVENTS), 0)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.rsvp_count, 2)
+
+    def test_restore_brings_back_registrations(self):
+        def registrations(model):
+            return list(model.objects.order_by('pk').values_list('pk', 'user_id', 'event_id', 'registered_at', 'attended'))
+        before = registrations(EventRegistration)
+        self.archive()
+        self.assertEqual(registrations(ArchivedEventRegistration), [before[0]])
+        self.assertEqual(registrations(EventRegistration), [])
+
+        list(archive.restore_events(ArchivedEvent.objects.all()))
+        self.assertEqual(registrations(EventRegistration), before)
+        self.assertFalse(ArchivedEventRegistration.objects.exists())
+
+    def test_raw_moves_refresh_counters_search_and_cache_tags(self):
+        tags = ['events', f'event:{self.past.pk}']
+        dashboard.refresh_snapshot()
+        cache.clear()
+        page_cache.invalidate(*tags)
+        versions = page_cache.tag_versions(tags)
+        etag = self.client.get(reverse('event_list'))['ETag']
+
+        moves = [
+            ('archive', self.archive, []),
+            ('restore', lambda: list(archive.restore_events(ArchivedEvent.objects.all())), [self.past.pk]),
+        ]
+        for name, move, found in moves:
+            with self.captureOnCommitCallbacks(execute=True):
+                move()
+            with self.subTest(move=name):
+                # None of the deletes sent signals, yet nothing derived from the rows has drifted
+                self.assertEqual(dashboard.check_consistency(), {})
+                self.assertEqual(dashboard.get_dashboard_stats()['total_events'], 2)
+                self.assertEqual(get_total_participants(), 1)
+                self.user.refresh_from_db()
+                self.assertEqual(self.user.rsvp_count, 2)
+                self.assertEqual([event.pk for event in search_events('old')], found)
+
+                new_versions = page_cache.tag_versions(tags)
+                self.assertTrue(all(new_versions[tag] != versions[tag] for tag in tags))
+                new_etag = self.client.get(reverse('event_list'))['ETag']
+                self.assertNotEqual(new_etag, etag)
+            versions, etag = new_versions, new_etag
+
+    def test_deleting_archived_rsvps_updates_counters(self):
+        self.archive()
+        ArchivedEvent.objects.get(pk=self.past.pk).delete()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.rsvp_count, 1)
+        self.assertEqual(get_site_counter(ARCHIVED_EVENTS), 0)
+
+
+class EventImageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.category = Category.objects.create(name='Exhibitions')
+
+    def upload(self, event, width, color):
+        buffer = BytesIO()
+        Image.new('RGB', (width, width // 2), color).save(buffer, 'JPEG')
+        form = EventForm(
+            instance=event,
+            data={
+                'name': event.name, 'description': event.description, 'date': event.date, 'time': event.time,
+                'location': event.location, 'category': self.category.pk,
+            },
+            files={'image': SimpleUploadedFile('photo.jpg', buffer.getvalue(), 'image/jpeg')},
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        event = form.save()
+        event.refresh_from_db()
+        return event
+
+    def paths(self, event):
+        return {path for paths in event.image_variants.values() for path in paths.values()}
+
+    def test_same_named_uploads_get_separate_variants(self):
+        first = self.upload(make_event('Paintings', self.category), 800, 'red')
+        second = self.upload(make_event('Sculptures', self.category), 500, 'blue')
+        first.refresh_from_db()
+
+        self.assertNotEqual(first.image.name, second.image.name)
+        self.assertFalse(self.paths(first) & self.paths(second))
+        expected = ((first, ['320', '640', '800'], (254, 0, 0)), (second, ['320', '500'], (0, 0, 254)))
+        for event, widths, color in expected:
+            for key, paths in event.image_variants.items():
+                self.assertEqual(sorted(paths, key=int), widths)
+                for width, path in paths.items():
+                    with default_storage.open(path) as stored:
+                        variant = Image.open(stored)
+                        self.assertEqual(variant.width, int(width))
+                        for channel, expected in zip(variant.convert('RGB').getpixel((0, 0)), color):
+                            self.assertAlmostEqual(channel, expected, delta=8)
+
+    def test_replacing_an_image_removes_only_its_own_variants(self):
+        first = self.upload(make_event('Prints', self.category), 400, 'green')
+        old_paths = self.paths(first)
+        first = self.upload(first, 700, 'yellow')
+        self.assertFalse(old_paths & self.paths(first))
+        self.assertFalse(any(default_storage.exists(path) for path in old_paths))
+        self.assertTrue(all(default_storage.exists(path) for path in self.paths(first)))
+
+
+class EventImportTests(TestCase):
+    HEADER = 'name,description,date,time,location,category\n'
+
+    def setUp(self):
+        self.existing = Category.objects.create(name='Sports')
+        self.rejects = []
+
+    def rows(self, *lines):
+        return importer.read_rows(StringIO(self.HEADER + ''.join(f'{line}\n' for line in lines)))
+
+    def importer(self, **kwargs):
+        kwargs.setdefault('on_reject', lambda line, errors: self.rejects.append((line, sorted(errors))))
+        return importer.EventImporter(**kwargs)
+
+    def test_rejects_invalid_rows_with_their_line_numbers(self):
+        events_importer = self.importer()
+        totals = list(events_importer.run(self.rows(
+            'Match,Final,2030-05-01,18:00,Stadium,sports',
+            ',No name,2030-05-01,18:00,Stadium,Sports',
+            'Bad date,Oops,someday,18:00,Stadium,Sports',
+            'No category,Oops,2030-05-01,18:00,Stadium,',
+        )))
+        self.assertEqual(totals, [(1, 3)])
+        self.assertEqual(self.rejects, [(3, ['name']), (4, ['date']), (5, ['category'])])
+        event = Event.objects.get(name='Match')
+        self.assertEqual(event.category, self.existing)
+        self.assertEqual(event.starts_at, Event.compute_starts_at(event.date, event.time))
+
+    def test_json_lines(self):
+        stream = StringIO(
+            '{"name": "Swim", "description": "Laps", "date": "2030-05-02", "time": "07:00",'
+            ' "location": "Pool", "category": "Sports"}\n'
+            'not json\n'
+        )
+        events_importer = self.importer()
+        list(events_importer.run(importer.read_rows(stream, 'jsonl')))
+        self.assertEqual((events_importer.created, events_importer.rejected), (1, 1))
+        self.assertTrue(Event.objects.filter(name='Swim').exists())
+
+    def test_dry_run_inserts_nothing(self):
+        events_importer = self.importer(dry_run=True)
+        list(events_importer.run(self.rows(
+            'Gig,Live,2030-05-01,20:00,Club,Music',
+            'Gig 2,Live,2030-05-02,20:00,Club,music',
+        )))
+        self.assertEqual((events_importer.created, events_importer.categories_created), (2, 1))
+        self.assertFalse(Event.objects.exists())
+        self.assertFalse(Category.objects.filter(name='Music').exists())
+
+    def test_creates_categories_once_and_only_for_valid_rows(self):
+        events_importer = self.importer()
+        list(events_importer.run(self.rows(
+            ',Rejected,2030-05-01,20:00,Club,Poetry',
+            'Gig,Live,2030-05-01,20:00,Club,Music',
+            'Gig 2,Live,2030-05-02,20:00,Club,MUSIC',
+        )))
+        self.assertEqual(events_importer.categories_created, 1)
+        self.assertFalse(Category.objects.filter(name='Poetry').exists())
+        music = Category.objects.get(name='Music')
+        self.assertEqual(Event.objects.filter(category=music).count(), 2)
+
+        strict = self.importer(create_categories=False)
+        list(strict.run(self.rows('Talk,Words,2030-05-03,10:00,Hall,Poetry')))
+        self.assertEqual(strict.rejected, 1)
+        self.assertFalse(Category.objects.filter(name='Poetry').exists())
+
+    def test_inserts_in_batches(self):
+        events_importer = self.importer(batch_size=2)
+        lines = [f'Run {index},Laps,2030-05-0{index + 1},07:00,Park,Sports' for index in range(5)]
+        self.assertEqual(list(events_importer.run(self.rows(*lines))), [(2, 0), (4, 0), (5, 0)])
+        self.assertEqual(Event.objects.count(), 5)
+        self.assertEqual([event.name for event in search_events('run')], [f'Run {index}' for index in range(5)])
+
+    def test_failed_batch_leaves_no_categories_behind(self):
+        events_importer = self.importer(batch_size=1)
+        index_events = search.index_events
+        calls = []
+
+        def fail_second_batch(event_ids):
+            calls.append(event_ids)
+            if len(calls) == 2:
+                raise RuntimeError('index unavailable')
+            index_events(event_ids)
+
+        with mock.patch.object(importer.search, 'index_events', fail_second_batch):
+            with self.assertRaises(RuntimeError):
+                list(events_importer.run(self.rows(
+                    'Gig,Live,2030-05-01,20:00,Club,Music',
+                    'Reading,Words,2030-05-02,20:00,Library,Poetry',
+                )))
+        self.assertTrue(Category.objects.filter(name='Music').exists())
+        self.assertFalse(Category.objects.filter(name='Poetry').exists())
+        self.assertEqual(events_importer.categories_created, 1)
+
+    def test_command_writes_rejects(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source, rejects = os.path.join(directory, 'events.csv'), os.path.join(directory, 'rejects.csv')
+        with open(source, 'w') as csv_file:
+            csv_file.write(self.HEADER + 'Match,Final,2030-05-01,18:00,Stadium,Sports\n,x,2030-05-01,18:00,S,Sports\n')
+
+        out = StringIO()
+        call_command('import_events', source, '--rejects', rejects, stdout=out)
+        self.assertIn('Successfully imported 1 events, 1 rejected, 0 new categories', out.getvalue())
+        with open(rejects) as rejects_file:
+            self.assertEqual(rejects_file.read().splitlines()[1], '3,name: This field is required.')
+
+    def test_admin_upload(self):
+        admin_user = make_user('root')
+        admin_user.is_staff = admin_user.is_superuser = True
+        admin_user.save()
+        self.client.force_login(admin_user)
+        upload = SimpleUploadedFile('events.csv', (self.HEADER + 'Match,Final,2030-05-01,18:00,Stadium,Chess\n').encode())
+        response = self.client.post(
+            reverse('admin:events_event_import'), {'file': upload, 'batch_size': 10, 'create_categories': 'on'},
+        )
+        self.assertContains(response, 'Imported 1 events, 0 rejected, 1 new categories.')
+        self.assertTrue(Event.objects.filter(name='Match', category__name='Chess').exists())
+
+        self.client.force_login(make_user('visitor'))
+        self.assertNotEqual(self.client.get(reverse('admin:events_event_import')).status_code, 200)
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(name='Theatre')
+            self.events = [make_event(f'Play {index}', self.category, hours=index + 1) for index in range(5)]
+        self.user = make_user('ruth')
+
+    def get(self, name, *args, status=200, **params):
+        response = self.client.get(reverse(f'api:{name}', args=args), params)
+        self.assertEqual(response.status_code, status)
+        return response
+
+    def test_field_mapping(self):
+        event = self.events[0]
+        RSVP.objects.create(user=self.user, event=event)
+        item = self.get('event_list', fields='id,name,category,category_name,attendee_count,image').json()['results'][0]
+        self.assertEqual(item, {
+            'id': event.pk, 'name': 'Play 0', 'category': self.category.pk, 'category_name': 'Theatre',
+            'attendee_count': 1, 'image': default_storage.url(event.image.name),
+        })
+
+        detail = self.get('event_detail', event.pk).json()
+        self.assertEqual(list(detail), api.EVENTS.default)
+        self.assertEqual(datetime.datetime.fromisoformat(detail['starts_at']), event.starts_at)
+
+        error = self.get('event_list', status=400, fields='id,secret').json()
+        self.assertEqual(error, {'error': 'Unknown field(s): secret'})
+
+    @mock.patch.object(api, 'API_PAGE_SIZE', 2)
+    def test_cursors_round_trip(self):
+        names, url = [], reverse('api:event_list') + '?fields=name'
+        while url:
+            page = self.client.get(url).json()
+            names += [item['name'] for item in page['results']]
+            last, url = url, page['next']
+        self.assertEqual(names, [event.name for event in self.events])
+
+        previous = self.client.get(last).json()['previous']
+        self.assertEqual([item['name'] for item in self.client.get(previous).json()['results']], ['Play 2', 'Play 3'])
+
+    @mock.patch.object(api, 'API_PAGE_SIZE', 2)
+    def test_invalid_or_tampered_cursor_is_rejected(self):
+        cursor = self.get('event_list').json()['next'].split('cursor=')[1]
+        tampered = cursor[:-1] + ('A' if cursor[-1] != 'A' else 'B')
+        for token in ('garbage', tampered):
+            with self.subTest(token=token):
+                self.assertEqual(self.get('event_list', status=400, cursor=token).json(), {'error': 'Invalid cursor.'})
+        self.get('category_list', status=400, cursor='garbage')
+
+    def test_unknown_pk_is_404(self):
+        missing = max(event.pk for event in self.events) + 1
+        self.assertEqual(self.get('event_detail', missing, status=404).json(), {'error': 'Not found.'})
+        self.get('event_attendees', missing, status=404)
+
+    def test_my_rsvps_requires_authentication(self):
+        self.assertEqual(self.get('my_rsvps', status=401).json()['error'], 'Authentication credentials were not provided.')
+
+        RSVP.objects.create(user=self.user, event=self.events[0])
+        RSVP.objects.create(user=make_user('sam'), event=self.events[1])
+        self.client.force_login(self.user)
+        results = self.get('my_rsvps').json()['results']
+        self.assertEqual([item['event'] for item in results], [self.events[0].pk])
+
+    def test_matching_etag_answers_304(self):
+        for name, args in (('event_list', ()), ('event_detail', (self.events[0].pk,)), ('category_list', ())):
+            with self.subTest(name=name):
+                url = reverse(f'api:{name}', args=args)
+                etag = self.client.get(url)['ETag']
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+                self.assertNotEqual(self.client.get(url, {'fields': 'id'})['ETag'], etag)
+
+        etag = self.client.get(reverse('api:event_list'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            RSVP.objects.create(user=self.user, event=self.events[0])
+        self.assertEqual(self.client.get(reverse('api:event_list'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Science')
+        self.event = make_event('Lecture', self.category)
+        self.alice, self.bob = make_user('alice'), make_user('bob')
+        self.bob.first_name = '=HYPERLINK("http://evil")'
+        self.bob.save()
+        RSVP.objects.create(user=self.alice, event=self.event, notes='+1 guest')
+        RSVP.objects.create(user=self.bob, event=self.event, notes='@front row')
+        EventRegistration.objects.create(user=self.alice, event=self.event, attended=True)
+
+    def rows(self):
+        return exports.attendee_rows(RSVP.objects.filter(event=self.event))
+
+    def login(self, role):
+        user = make_user(role.lower())
+        user.groups.add(Group.objects.get_or_create(name=role)[0])
+        self.client.force_login(user)
+
+    def test_csv_content_escapes_formulas(self):
+        lines = list(csv.reader(''.join(exports.stream_csv(self.rows())).lstrip('\ufeff').splitlines()))
+        self.assertEqual(lines[0], [title for title, _ in exports.EXPORT_COLUMNS])
+        alice, bob = (dict(zip(lines[0], line)) for line in lines[1:])
+        self.assertEqual((alice['Username'], alice['Notes'], alice['Attended']), ('alice', "'+1 guest", 'yes'))
+        self.assertEqual((bob['First name'], bob['Notes'], bob['Attended']), ("'=HYPERLINK(\"http://evil\")", "'@front row", 'no'))
+        self.assertEqual(exports._csv_cell('-5'), "'-5")
+        self.assertEqual(exports._csv_cell('5'), '5')
+
+    def test_xlsx_is_a_zip_with_the_sheet_rows(self):
+        archive = zipfile.ZipFile(BytesIO(b''.join(exports.stream_xlsx(self.rows()))))
+        self.assertIsNone(archive.testzip())
+        self.assertIn('[Content_Types].xml', archive.namelist())
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        rows = [re.findall(r'<t xml:space="preserve">(.*?)</t>', row) for row in re.findall(r'<row>(.*?)</row>', sheet)]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0][0], 'Event')
+        self.assertEqual([row[4] for row in rows[1:]], ['alice', 'bob'])
+        # Inline strings are not evaluated, so they are exported as typed
+        self.assertEqual(rows[2][5], '=HYPERLINK("http://evil")')
+
+    def test_attendee_export_requires_admin_or_organizer(self):
+        url = reverse('attendee_export')
+        self.assertRedirects(self.client.get(url), reverse('accounts:login'), fetch_redirect_response=False)
+        self.login('Participant')
+        self.assertRedirects(self.client.get(url), reverse('home'), fetch_redirect_response=False)
+
+        self.login('Organizer')
+        response = self.client.get(url, {'event': self.event.pk, 'format': 'xlsx'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], exports.XLSX_CONTENT_TYPE)
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="attendees-event-{self.event.pk}.xlsx"')
+        self.assertTrue(zipfile.is_zipfile(BytesIO(b''.join(response.streaming_content))))
+        self.assertEqual(self.client.get(url, {'format': 'pdf'}).status_code, 404)
+
+
+class CalendarFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Sport')
+        self.recent = make_event('Recent match', self.category, hours=-24 * (ical.ICS_PAST_DAYS - 1))
+        self.old = make_event('Old match', self.category, hours=-24 * (ical.ICS_PAST_DAYS + 2))
+        self.next = make_event('Next match', self.category)
+        self.user = make_user('una')
+
+    def body(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], ical.CONTENT_TYPE)
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    def summaries(self, url):
+        return [line[len(b'SUMMARY:'):].decode() for line in self.body(self.client.get(url)).splitlines()
+                if line.startswith(b'SUMMARY:')]
+
+    def test_window_starts_ics_past_days_ago(self):
+        self.assertEqual(self.summaries(reverse('calendar_feed')), ['Recent match', 'Next match'])
+        other = Category.objects.create(name='Art')
+        make_event('Opening', other)
+        self.assertEqual(self.summaries(reverse('category_calendar_feed', args=[other.pk])), ['Opening'])
+
+    def test_matching_etag_answers_304(self):
+        url = reverse('calendar_feed')
+        response = self.client.get(url)
+        self.body(response)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        self.next.name = 'Final'
+        self.next.save()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertIn(b'SUMMARY:Final', self.body(changed))
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_user_feed_requires_its_token(self):
+        RSVP.objects.create(user=self.user, event=self.next)
+        self.assertEqual(self.summaries(ical.user_feed_url(self.user)), ['Next match'])
+
+        token = ical.user_token(self.user)
+        self.assertEqual(self.client.get(reverse('user_calendar_feed', args=[self.user.pk, 'x' * 32])).status_code, 404)
+        self.assertEqual(self.client.get(f'/calendar/users/{self.user.pk}/.ics').status_code, 404)
+        self.user.set_password('changed')
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('user_calendar_feed', args=[self.user.pk, token])).status_code, 404)
+
+    @mock.patch.object(ical, 'ICS_CHUNK_SIZE', 2)
+    def test_cold_feed_query_count_does_not_grow_with_chunks(self):
+        for index in range(25):
+            make_event(f'Heat {index}', self.category, hours=index + 2)
+        with self.assertNumQueries(3):
+            body = self.body(self.client.get(reverse('calendar_feed')))
+        self.assertEqual(body.count(b'BEGIN:VEVENT'), 27)
+
+        # Only the edited event is rendered again
+        self.next.name = 'Final'
+        self.next.save()
+        with mock.patch.object(ical, 'render_event', wraps=ical.render_event) as render:
+            body = self.body(self.client.get(reverse('calendar_feed')))
+        self.assertEqual(render.call_count, 1)
+        self.assertIn(b'SUMMARY:Final', body)
+
+
+class DashboardSnapshotTests(TestCase):
+    FIGURES = ('total_events', 'upcoming_events', 'past_events', 'todays_events')
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Dance')
+        self.past = make_event('Rehearsal', self.category, hours=-48)
+        dashboard.refresh_snapshot()
+
+    def assertSnapshotMatches(self):
+        """The incrementally maintained row, read as stored, equals a recompute"""
+        snapshot = DashboardSnapshot.objects.get(pk=dashboard.SNAPSHOT_PK)
+        now = timezone.now()
+        self.assertTrue(snapshot.is_valid(now))
+        actual = dashboard.compute_stats(now)
+        self.assertEqual({key: getattr(snapshot, key) for key in self.FIGURES}, {key: actual[key] for key in self.FIGURES})
+
+    def move(self, event, hours):
+        start = timezone.localtime() + datetime.timedelta(hours=hours)
+        event.date, event.time = start.date(), start.time().replace(microsecond=0)
+        event.save()
+
+    def test_create_move_and_delete_keep_the_snapshot_exact(self):
+        upcoming = make_event('Gala', self.category, hours=72)
+        make_event('Workshop', self.category, hours=-72)
+        self.assertSnapshotMatches()
+
+        self.move(upcoming, -24)
+        self.assertSnapshotMatches()
+        self.move(self.past, 96)
+        self.assertSnapshotMatches()
+
+        upcoming.delete()
+        self.assertSnapshotMatches()
+        self.assertEqual(dashboard.get_dashboard_stats()['total_events'], 2)
+
+    def test_new_upcoming_event_bounds_the_snapshot(self):
+        soon = make_event('Flash mob', self.category, hours=1)
+        snapshot = DashboardSnapshot.objects.get(pk=dashboard.SNAPSHOT_PK)
+        self.assertLessEqual(snapshot.valid_until, soon.starts_at)
+
+    def test_rsvps_update_participants(self):
+        event = make_event('Gala', self.category, hours=72)
+        for user in (make_user('pat'), make_user('quinn')):
+            RSVP.objects.create(user=user, event=event)
+            RSVP.objects.create(user=user, event=self.past)
+        self.assertSnapshotMatches()
+        with self.assertNumQueries(2):
+            stats = dashboard.get_dashboard_stats()
+        self.assertEqual(stats['total_participants'], count_participants())
+        self.assertEqual(stats['total_participants'], 2)
+
+    def test_check_consistency_reports_and_repairs_drift(self):
+        RSVP.objects.create(user=make_user('pat'), event=self.past)
+        self.assertEqual(dashboard.check_consistency(), {})
+
+        DashboardSnapshot.objects.filter(pk=dashboard.SNAPSHOT_PK).update(upcoming_events=5)
+        bump_site_counter(PARTICIPANTS, 3)
+        self.assertEqual(dashboard.check_consistency(), {'upcoming_events': (5, 0), 'total_participants': (4, 1)})
+
+        out = StringIO()
+        call_command('check_dashboard_stats', stdout=out)
+        self.assertIn('upcoming_events: stored 5, actual 0', out.getvalue())
+        self.assertIn('Run again with --fix', out.getvalue())
+        self.assertNotEqual(dashboard.check_consistency(), {})
+
+        call_command('check_dashboard_stats', '--fix', stdout=StringIO())
+        self.assertEqual(dashboard.check_consistency(), {})
+        self.assertSnapshotMatches()
+
+
+class LiveUpdateTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Comedy')
+        self.event = make_event('Stand-up', self.category)
+        self.user = make_user('vera')
+
+    def rsvp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            RSVP.objects.create(user=self.user, event=self.event)
+
+    async def test_local_hub_delivers_rsvps_to_subscribers(self):
+        hub = live.Hub(live.LocalBackend())
+        with mock.patch.object(live, '_hub', hub):
+            stream = live.stream(self.event.pk, 0)
+            self.assertIn('event: count\ndata: {"count":0}', await anext(stream))
+            self.assertEqual(hub.subscriber_count(live.event_channel(self.event.pk)), 1)
+
+            await sync_to_async(self.rsvp)()
+            message = await asyncio.wait_for(anext(stream), 1)
+            event, data = message.strip().split('\n')
+            self.assertEqual(event, 'event: rsvp')
+            self.assertEqual(json.loads(data[len('data: '):]), {'action': 'created', 'count': 1, 'username': 'vera'})
+
+            await stream.aclose()
+            self.assertEqual(hub.subscriber_count(live.event_channel(self.event.pk)), 0)
+
+    def test_event_live_is_204_under_wsgi(self):
+        response = self.client.get(reverse('event_live', args=[self.event.pk]))
+        self.assertEqual(response.status_code, 204)
+
+    async def test_event_live_streams_under_asgi(self):
+        hub = live.Hub(live.LocalBackend())
+        with mock.patch.object(live, '_hub', hub):
+            response = await self.async_client.get(reverse('event_live', args=[self.event.pk]))
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            content = aiter(response.streaming_content)
+            self.assertIn(b'data: {"count":0}', await anext(content))
+            await content.aclose()
+        missing = await self.async_client.get(reverse('event_live', args=[self.event.pk + 1]))
+        self.assertEqual(missing.status_code, 404)
+
+
+# What events.urls mounts when settings.ASYNC_VIEWS is on
+ASYNC_URLCONF = types.ModuleType('async_urlconf')
+ASYNC_URLCONF.urlpatterns = [
+    path('', async_views.home, name='home'),
+    path('categories/', async_views.category_list, name='category_list'),
+    path('events/', async_views.event_list, name='event_list'),
+    path('events/<int:pk>/', async_views.event_detail, name='event_detail'),
+    path('', include('EMS.urls')),
+]
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Circus')
+        self.other = Category.objects.create(name='Opera')
+        self.events = [make_event(f'Show {index}', self.category, hours=index + 1) for index in range(14)]
+        self.events.append(make_event('Aria', self.other, hours=3, sharded_counter=True))
+        self.user = make_user('wanda')
+        for user in (self.user, make_user('xena')):
+            RSVP.objects.create(user=user, event=self.events[0])
+            RSVP.objects.create(user=user, event=self.events[-1])
+        self.client.force_login(self.user)
+
+    @staticmethod
+    def summary(context, keys):
+        """Context values reduced to what the templates read from them"""
+        def reduce(key, value):
+            if key in ('events', 'object_list'):
+                return [
+                    (event.pk, event.get_rsvp_count(), [rsvp.user.username for rsvp in event.attendee_preview])
+                    for event in value
+                ]
+            if key == 'categories':
+                return [category.pk for category in value]
+            if key == 'page_obj':
+                # Cursors are signed with a timestamp; compare what they point at
+                cursors = (value.next_cursor, value.previous_cursor) if value else ()
+                return [cursor and signing.loads(cursor, salt=CURSOR_SALT) for cursor in cursors]
+            if key in ('event', 'object', 'user_rsvp'):
+                return value and value.pk
+            return value
+        return {key: reduce(key, context[key]) for key in keys}
+
+    async def render_both(self, url, params, keys):
+        sync = await sync_to_async(self.client.get)(url, params)
+        await self.async_client.aforce_login(self.user)
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+            response = await self.async_client.get(url, params)
+            self.assertEqual(response.resolver_match.func.__module__, async_views.__name__)
+        self.assertEqual((sync.status_code, response.status_code), (200, 200))
+        return self.summary(sync.context, keys), self.summary(response.context, keys)
+
+    async def test_listings_render_the_same_context(self):
+        listing_keys = ['events', 'page_obj', 'search_query']
+        event_list_keys = listing_keys + [
+            'object_list', 'is_paginated', 'total_participants', 'categories', 'selected_category',
+            'start_date', 'end_date',
+        ]
+        cases = [
+            (reverse('home'), {}, listing_keys),
+            (reverse('home'), {'search': 'Show'}, ['events', 'search_query']),
+            (reverse('event_list'), {}, event_list_keys),
+            (reverse('event_list'), {'category': self.other.pk}, event_list_keys),
+        ]
+        for url, params, keys in cases:
+            with self.subTest(url=url, params=params):
+                sync, async_ = await self.render_both(url, params, keys)
+                self.assertEqual(async_, sync)
+
+    async def test_event_detail_renders_the_same_context(self):
+        url = reverse('event_detail', args=[self.events[-1].pk])
+        sync, async_ = await self.render_both(url, {}, ['event', 'user_rsvp', 'rsvp_stats'])
+        self.assertEqual(async_, sync)
+        self.assertEqual(async_['rsvp_stats'], {'total_rsvps': 2})
+
+
+class AdminListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        groups = {name: Group.objects.create(name=name) for name in ('Admin', 'Organizer', 'Participant')}
+        cls.admin = make_user('aaron')
+        cls.admin.groups.add(groups['Admin'])
+        memberships = [['Participant'], ['Organizer'], ['Organizer', 'Participant'], [], ['Admin', 'Organizer']]
+        for index in range(20):
+            user = make_user(f'member{index:02d}')
+            user.groups.add(*[groups[name] for name in memberships[index % len(memberships)]])
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def roles(self):
+        return {user.username: user.get_user_role() for user in User.objects.all()}
+
+    def walk(self, url, params, queries):
+        """Follow the cursor to the end; every page must cost `queries` queries"""
+        rows = []
+        while True:
+            with self.assertNumQueries(queries):
+                response = self.client.get(url, params)
+            page = response.context['page_obj']
+            rows += [(user.username, user.primary_role) for user in response.context['users']]
+            if not page.has_next():
+                return rows, response
+            params = {**params, 'cursor': page.next_cursor}
+
+    @mock.patch.object(views, 'USERS_PER_PAGE', 4)
+    def test_user_list_pages_by_username_with_roles_in_the_query(self):
+        roles = self.roles()
+        # Session, user, the admin's roles, role totals and the page, however many rows it has
+        rows, response = self.walk(reverse('user_list'), {}, 5)
+        self.assertEqual(rows, sorted(roles.items()))
+        self.assertEqual(
+            [response.context[key] for key in ('total_users', 'admin_count', 'organizer_count', 'participant_count')],
+            [21, 5, 8, 4],
+        )
+
+        organizers, _ = self.walk(reverse('user_list'), {'role': 'Organizer'}, 5)
+        self.assertEqual(organizers, sorted((name, role) for name, role in roles.items() if role == 'Organizer'))
+        unassigned, _ = self.walk(reverse('user_list'), {'role': 'No Role', 'q': 'member1'}, 5)
+        self.assertEqual([name for name, _ in unassigned], ['member13', 'member18'])
+
+    def test_user_list_is_admin_only(self):
+        self.client.force_login(User.objects.get(username='member01'))
+        self.assertRedirects(self.client.get(reverse('user_list')), reverse('home'), fetch_redirect_response=False)
+
+    @mock.patch.object(views, 'STATS_PAGE_SIZE', 6)
+    def test_dashboard_stats_pages(self):
+        category = Category.objects.create(name='Talks')
+        events = [make_event(f'Talk {index}', category, hours=index + 1) for index in range(8)]
+        for user in User.objects.filter(username__in=['member00', 'member01', 'member02']):
+            RSVP.objects.create(user=user, event=events[0])
+
+        def stats(url):
+            with self.assertNumQueries(4):
+                return b''.join(self.client.get(url).streaming_content).decode()
+
+        first = stats(reverse('dashboard_stats', args=['upcoming']))
+        self.assertEqual(re.findall(r'Talk \d', first), [f'Talk {index}' for index in range(6)])
+        more = html.unescape(re.search(r'data-next-page="([^"]+)"', first).group(1))
+        second = stats(more)
+        self.assertEqual(re.findall(r'Talk \d', second), ['Talk 6', 'Talk 7'])
+        self.assertNotIn('data-next-page', second)
+
+        participants = stats(reverse('dashboard_stats', args=['participants']))
+        self.assertEqual(re.findall(r'member0\d(?=@)', participants), ['member00', 'member01', 'member02'])
+        self.assertIn('No past events.', stats(reverse('dashboard_stats', args=['past'])))
+        self.assertEqual(self.client.get(reverse('dashboard_stats', args=['unknown'])).status_code, 404)
+
+
+class NavigationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('yuri')
+        self.category = Category.objects.create(name='Tech')
+        self.event = make_event('Hackathon', self.category)
+
+    def navigation(self, path, user=None, **extra):
+        request = RequestFactory().get(path, **extra)
+        request.user = user or self.user
+        return navigation(request)
+
+    def test_from_dashboard_parameter(self):
+        dashboard = {'active_page': 'dashboard'}
+        self.assertEqual(self.navigation(reverse('organizer_dashboard')), dashboard)
+        self.assertEqual(self.navigation(f'{self.event.get_absolute_url()}?from=dashboard'), dashboard)
+        self.assertEqual(self.navigation(f'{self.event.get_absolute_url()}?from=home'), {})
+        self.assertEqual(self.navigation(self.event.get_absolute_url()), {})
+        self.assertEqual(self.navigation('/?from=dashboard', user=AnonymousUser()), {})
+
+    def test_referer(self):
+        dashboard = 'http://testserver' + reverse('organizer_dashboard')
+        self.assertEqual(self.navigation('/events/', HTTP_REFERER=dashboard), {'active_page': 'dashboard'})
+        self.assertEqual(self.navigation('/events/', HTTP_REFERER='http://testserver/events/'), {})
+
+    def test_external_referer_is_ignored(self):
+        for referer in ('http://evil.example' + reverse('organizer_dashboard'), 'not a url', ''):
+            with self.subTest(referer=referer):
+                self.assertEqual(self.navigation('/events/', HTTP_REFERER=referer), {})
+
+    def test_page_views_do_not_write_the_session(self):
+        urls = [reverse('home'), reverse('event_list'), self.event.get_absolute_url(), reverse('category_list')]
+        for url in urls:
+            response = self.client.get(url, {'from': 'dashboard'})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertFalse(Session.objects.exists())
+
+        self.client.force_login(self.user)
+        session = Session.objects.get()
+        for url in urls:
+            response = self.client.get(url, HTTP_REFERER='http://testserver' + reverse('organizer_dashboard'))
+            self.assertEqual(response.context['active_page'], 'dashboard')
+            self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertEqual(Session.objects.get().expire_date, session.expire_date)
+        self.assertEqual(Session.objects.get().session_data, session.session_data)
+
+
+class BenchmarkTests(TransactionTestCase):
+    """The worker threads use their own connections, so the data has to be committed"""
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.output = os.path.join(directory, 'results.json')
+        # A tiny dataset under the benchmark's prefix, so the command does not seed its own
+        call_command(
+            'seed_data', prefix='bench', password='benchmark-password', participants=6, organizers=2,
+            categories=2, events=8, rsvps=12, stdout=StringIO(),
+        )
+
+    def run_benchmark(self, *args):
+        out = StringIO()
+        call_command('benchmark', '--requests', '1', '--warmup', '0', '--concurrency', '1', *args, stdout=out)
+        return out.getvalue()
+
+    def test_every_scenario_runs_once(self):
+        first = os.path.join(os.path.dirname(self.output), 'first.json')
+        self.assertNotIn('Seeding', self.run_benchmark('--output', first))
+        with open(first) as results_file:
+            report = json.load(results_file)
+        self.assertEqual(list(report['scenarios']), benchmark.SCENARIO_NAMES)
+        for name, result in report['scenarios'].items():
+            with self.subTest(scenario=name):
+                self.assertEqual((result['requests'], result['errors']), (1, 0), result['error_samples'])
+                self.assertIsNotNone(result['queries_per_request']['mean'])
+        self.assertEqual(report['dataset']['events'], 8)
+
+        out = self.run_benchmark('--scenario', 'home', '--output', self.output, '--compare', first)
+        self.assertIn('Compared with', out)
+        with open(self.output) as results_file:
+            self.assertEqual(list(json.load(results_file)['scenarios']), ['home'])
@@ -1,5 +1,6 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('', views.home, name='home'),
@@ -14,6 +15,15 @@ urlpatterns = [
     path('events/<int:pk>/edit/', views.EventUpdateView.as_view(), name='event_update'),
     path('events/<int:pk>/delete/', views.EventDeleteView.as_view(), name='event_delete'),
     path('events/<int:pk>/', views.EventDetailView.as_view(), name='event_detail'),
+    path('events/<int:pk>/attendees/', views.event_attendees, name='event_attendees'),
+    path('events/<int:pk>/live/', async_views.event_live, name='event_live'),
+    path('attendees/export/', views.attendee_export, name='attendee_export'),
+    path('archive/', views.archive_list, name='archive_list'),
+    path('archive/<int:pk>/', views.archived_event_detail, name='archived_event_detail'),
+    path('archive/<int:pk>/attendees/', views.archived_event_attendees, name='archived_event_attendees'),
+    path('calendar/events.ics', views.calendar_feed, name='calendar_feed'),
+    path('calendar/categories/<int:pk>.ics', views.category_calendar_feed, name='category_calendar_feed'),
+    path('calendar/users/<int:user_id>/<str:token>.ics', views.user_calendar_feed, name='user_calendar_feed'),
     
     path('events/<int:event_pk>/register/', views.register_for_event, name='register_for_event'),
     path('events/<int:event_pk>/unregister/', views.unregister_from_event, name='unregister_from_event'),
@@ -26,5 +36,16 @@ urlpatterns = [
     path('users/<int:pk>/role/', views.user_role_update, name='user_role_update'),
 
     path('dashboard/', views.organizer_dashboard, name='organizer_dashboard'),
+    path('dashboard/stats/<str:kind>/', views.dashboard_stats, name='dashboard_stats'),
     path('participant-dashboard/', views.participant_dashboard, name='participant_dashboard'),
 ]
+
+if settings.ASYNC_VIEWS:
+    # Matched before the sync views; paths and names are unchanged
+    urlpatterns = [
+        path('', async_views.home, name='home'),
+        path('categories/', async_views.category_list, name='category_list'),
+        path('events/', async_views.event_list, name='event_list'),
+        path('events/<int:pk>/', async_views.event_detail, name='event_detail'),
+        path('dashboard/stats/<str:kind>/', async_views.dashboard_stats, name='dashboard_stats'),
+    ] + urlpatterns
@@ -4,23 +4,56 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db.models import Q, Count
 from django.utils import timezone
-from django.template.loader import render_to_string
-from django.http import HttpResponse
-from django.urls import reverse_lazy
+from django.template.loader import get_template
+from django.http import Http404, StreamingHttpResponse
+from django.utils.html import format_html
+from django.utils.text import slugify
+from django.urls import reverse, reverse_lazy
+from urllib.parse import urlencode
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_safe
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView
-from functools import wraps
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 
 User = get_user_model()
 
-from .models import Event, Category, UserProfile, EventRegistration, RSVP
+from .models import Event, Category, UserProfile, EventRegistration, RSVP, ArchivedEvent, ArchivedRSVP
 from .forms import EventForm, CategoryForm, RSVPForm
+from .pagination import KeysetPaginator
+from .search import search_events
+from accounts.roles import NO_ROLE, primary_role_expression
 from accounts.decorators import (
     admin_required, organizer_required, admin_or_organizer_required,
     participant_required, any_authenticated_user
 )
 from .utils import send_rsvp_confirmation_email, send_rsvp_update_email
+from .counters import get_total_participants
+from .dashboard import get_dashboard_stats
+from .conditional import conditional_page, listing_validators, event_validators, category_validators
+from .page_cache import cache_anonymous_page, listing_tags, event_tags, category_tags
+from .exports import EXPORT_FORMATS, export_response
+from .ical import Feed, check_user_token, feed_response, user_feed_url
+from EMS.query_budget import query_budget
+
+EVENTS_PER_PAGE = 12
+USERS_PER_PAGE = 50
+ATTENDEE_PREVIEW_SIZE = 5
+ATTENDEES_PER_PAGE = 50
+USER_ROLES = ('Admin', 'Organizer', 'Participant')
+EVENT_ORDERING = ('starts_at', 'pk')
+ARCHIVE_ORDERING = ('-starts_at', '-pk')
+ARCHIVED_RSVPS_SHOWN = 12
+STATS_PAGE_SIZE = 50
+STATS_CHUNK_SIZE = 25
+
+# Drill-down lists behind the dashboard figures: title and empty message
+STATS_LISTS = {
+    'total': ('All Events', 'No events found.'),
+    'upcoming': ('Upcoming Events', 'No upcoming events.'),
+    'past': ('Past Events', 'No past events.'),
+    'participants': ('Participants', "No participants have RSVP'd to events yet."),
+}
 
 class AdminOrOrganizerRequiredMixin:
     """Mixin for views that require admin or organizer permissions"""
@@ -48,115 +81,147 @@ class AdminRequiredMixin:
         
         return super().dispatch(request, *args, **kwargs)
 
-class DashboardContextMixin:
-    """Mixin to handle dashboard context"""
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        if self.request.session.get('from_dashboard'):
-            context['active_page'] = 'dashboard'
-        return context
-
-def render_dashboard(request, template, context):
-    if request.session.get('from_dashboard'):
-        context['active_page'] = 'dashboard'
-    return render(request, template, context)
-
-def dashboard_only(view_func):
-    @wraps(view_func)
-    def _wrapped_view(request, *args, **kwargs):
-        if not request.session.get('from_dashboard'):
-            messages.error(request, "You can only perform this action from the Organizer Dashboard.")
-            return redirect('event_list')
-        return view_func(request, *args, **kwargs)
-    return _wrapped_view
-
+@cache_anonymous_page(listing_tags)
+@conditional_page(listing_validators)
+@query_budget(10)
 def home(request):
-    request.session.pop('from_dashboard', None)  
     query = request.GET.get('search', '')
-    events = Event.objects.select_related('category').prefetch_related('registrations')
+    events = (
+        Event.objects.select_related('category')
+        .with_attendee_preview(ATTENDEE_PREVIEW_SIZE)
+        .with_attendee_count()
+    )
     if query:
-        events = events.filter(Q(name__icontains=query) | Q(location__icontains=query))
+        # Ranked results are capped rather than cursor paginated
+        return render(request, 'events/home.html', {
+            'events': search_events(query, queryset=events),
+            'search_query': query
+        })
+    page = KeysetPaginator(events, EVENT_ORDERING, EVENTS_PER_PAGE).get_page(request.GET.get('cursor'))
     return render(request, 'events/home.html', {
-        'events': events.order_by('date'),
+        'events': page.object_list,
+        'page_obj': page,
         'search_query': query
     })
 
 @admin_or_organizer_required
+@query_budget(20)
 def organizer_dashboard(request):
-    request.session['from_dashboard'] = True
-    today = timezone.now().date()
+    now = timezone.now()
     all_events = Event.objects.all()
-    
-    
-    total_participants = User.objects.filter(rsvps__isnull=False).distinct().count()
-    
-    context = {
-        'total_events': all_events.count(),
-        'upcoming_events': all_events.filter(date__gt=today).count(),
-        'past_events': all_events.filter(date__lt=today).count(),
-        'total_participants': total_participants,
-        'todays_events': all_events.filter(date=today),
-    }
 
     stats_type = request.GET.get('stats')
     if stats_type:
-        if stats_type == 'total':
-            context.update({'stats_type': 'total', 'all_events': all_events})
-        elif stats_type == 'upcoming':
-            context.update({'stats_type': 'upcoming', 'upcoming_events_list': all_events.filter(date__gt=today)})
-        elif stats_type == 'past':
-            context.update({'stats_type': 'past', 'past_events_list': all_events.filter(date__lt=today)})
-        elif stats_type == 'participants':
-            
-            users_with_rsvps = User.objects.filter(rsvps__isnull=False).distinct().order_by('first_name', 'last_name', 'username')
-            
-            context.update({
-                'stats_type': 'participants',
-                'users_with_rsvps': users_with_rsvps,
-            })
-        return HttpResponse(render_to_string('events/_stats_content.html', context, request))
+        return dashboard_stats(request, stats_type)
+
+    context = {}
+    context.update(get_dashboard_stats(now))
+    context['todays_events'] = []
+    if context['todays_events_count']:
+        context['todays_events'] = all_events.on_day(timezone.localdate(now)).order_by('starts_at')
+    return render(request, 'events/organizer_dashboard.html', context)
+
+def _stats_paginator(kind, now):
+    """Keyset paginator over only the columns the drill-down rows render"""
+    if kind == 'participants':
+        users = User.objects.filter(rsvp_count__gt=0).only('pk', 'username', 'first_name', 'last_name', 'email')
+        return KeysetPaginator(users, ('username',), STATS_PAGE_SIZE)
+    events = Event.objects.only('pk', 'name', 'date', 'starts_at')
+    if kind == 'upcoming':
+        return KeysetPaginator(events.upcoming(now), EVENT_ORDERING, STATS_PAGE_SIZE)
+    if kind == 'past':
+        return KeysetPaginator(events.past(now), ('-starts_at', '-pk'), STATS_PAGE_SIZE)
+    return KeysetPaginator(events, EVENT_ORDERING, STATS_PAGE_SIZE)
+
+def _stream_stats(request, kind, rows, first_page):
+    """Yield the drill-down markup a chunk of rows at a time"""
+    title = STATS_LISTS[kind][0]
+    rows_template = get_template('events/_stats_rows.html')
+    if first_page:
+        yield format_html('<h3 class="text-xl font-semibold mb-2">{}</h3><ul id="stats-rows">', title)
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == STATS_CHUNK_SIZE:
+            yield rows_template.render({'kind': kind, 'rows': chunk}, request)
+            chunk = []
+    if chunk:
+        yield rows_template.render({'kind': kind, 'rows': chunk}, request)
+
+    yield _stats_more(request, kind, rows, first_page)
+    if first_page:
+        yield '</ul>'
+
+def _stats_more(request, kind, rows, first_page):
+    """The "load more" link (or empty message) once `rows` has been consumed"""
+    next_url = None
+    if rows.next_cursor:
+        next_url = f"{reverse('dashboard_stats', args=[kind])}?{urlencode({'cursor': rows.next_cursor})}"
+    return get_template('events/_stats_more.html').render({
+        'next_url': next_url,
+        'empty_message': STATS_LISTS[kind][1] if first_page and not rows.count else '',
+    }, request)
 
-    return render_dashboard(request, 'events/organizer_dashboard.html', context)
+@admin_or_organizer_required
+@query_budget(6)
+def dashboard_stats(request, kind):
+    """Drill-down list for a dashboard figure, one keyset page per request"""
+    if kind not in STATS_LISTS:
+        raise Http404
+    cursor = request.GET.get('cursor')
+    rows = _stats_paginator(kind, timezone.now()).stream_page(cursor, chunk_size=STATS_CHUNK_SIZE)
+    return StreamingHttpResponse(_stream_stats(request, kind, rows, first_page=not cursor))
 
 @any_authenticated_user
+@query_budget(10)
 def participant_dashboard(request):
     """Dashboard for participants to view their RSVPs"""
     user = request.user
-    user_rsvps = RSVP.objects.filter(user=user).select_related('event', 'event__category').order_by('event__date')
+    user_rsvps = RSVP.objects.filter(user=user).select_related('event', 'event__category').order_by('event__starts_at')
     
+    now = timezone.now()
+    upcoming_rsvps = user_rsvps.filter(event__starts_at__gt=now)
+    past_rsvps = user_rsvps.filter(event__starts_at__lte=now)
     
-    upcoming_rsvps = user_rsvps.filter(event__date__gte=timezone.now().date())
-    past_rsvps = user_rsvps.filter(event__date__lt=timezone.now().date())
+    archived_rsvps = (
+        ArchivedRSVP.objects.filter(user=user).select_related('event')
+        .order_by('-event__starts_at')[:ARCHIVED_RSVPS_SHOWN]
+    )
     
     context = {
         'upcoming_rsvps': upcoming_rsvps,
         'past_rsvps': past_rsvps,
-        'total_rsvps': user_rsvps.count(),
+        'archived_rsvps': archived_rsvps,
+        # Counter maintained with the RSVPs, archived ones included
+        'total_rsvps': user.rsvp_count,
+        'calendar_feed_url': request.build_absolute_uri(user_feed_url(user)),
     }
     
     return render(request, 'events/participant_dashboard.html', context)
 
+@cache_anonymous_page(listing_tags)
+@conditional_page(listing_validators)
+@query_budget(12)
 def event_list(request):
-    events = Event.objects.select_related('category').prefetch_related('rsvp_set__user').all()
     category_id = request.GET.get('category')
-    if category_id:
-        events = events.filter(category_id=category_id)
-
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
-    if start_date and end_date:
-        events = events.filter(date__range=[start_date, end_date])
-    elif start_date:
-        events = events.filter(date__gte=start_date)
-    elif end_date:
-        events = events.filter(date__lte=end_date)
+    events = (
+        Event.objects.select_related('category')
+        .with_attendee_preview(ATTENDEE_PREVIEW_SIZE)
+        .with_attendee_count()
+        .apply_filters(category=category_id, start_date=start_date, end_date=end_date)
+    )
 
     
-    total_participants = User.objects.filter(rsvps__isnull=False).distinct().count()
+    page = KeysetPaginator(events, EVENT_ORDERING, EVENTS_PER_PAGE).get_page(request.GET.get('cursor'))
+    total_participants = get_total_participants()
     categories = Category.objects.all()
 
     context = {
-        'events': events,
+        'events': page.object_list,
+        'page_obj': page,
         'total_participants': total_participants,
         'categories': categories,
         'selected_category': category_id,
@@ -164,8 +229,6 @@ def event_list(request):
         'end_date': end_date,
     }
 
-    if request.session.get('from_dashboard'):
-        return render_dashboard(request, 'events/event_list.html', context)
     return render(request, 'events/event_list.html', context)
 
 @admin_or_organizer_required
@@ -176,6 +239,7 @@ def event_create(request):
             event = form.save(commit=False)
             event.created_by = request.user
             event.save()
+            form.save_m2m()
             messages.success(request, 'Event created successfully!')
             return redirect('event_list')
     else:
@@ -183,8 +247,6 @@ def event_create(request):
     
     
     context = {'form': form, 'title': 'Create Event'}
-    if request.session.get('from_dashboard'):
-        context['active_page'] = 'dashboard'
     
     return render(request, 'events/event_form.html', context)
 
@@ -202,8 +264,6 @@ def event_update(request, pk):
     
     
     context = {'form': form, 'title': 'Edit Event'}
-    if request.session.get('from_dashboard'):
-        context['active_page'] = 'dashboard'
     
     return render(request, 'events/event_form.html', context)
 
@@ -217,8 +277,6 @@ def event_delete(request, pk):
     
     
     context = {'event': event}
-    if request.session.get('from_dashboard'):
-        context['active_page'] = 'dashboard'
     
     return render(request, 'events/event_confirm_delete.html', context)
 
@@ -242,26 +300,131 @@ def event_detail(request, pk):
     
     return render(request, 'events/event_detail.html', context)
 
+def _attendee_rows(request, rsvps, url_name, pk):
+    page = KeysetPaginator(rsvps, ('rsvp_date', 'pk'), ATTENDEES_PER_PAGE).get_page(request.GET.get('cursor'))
+    next_url = None
+    if page.has_next():
+        next_url = f"{reverse(url_name, args=[pk])}?{urlencode({'cursor': page.next_cursor})}"
+    return render(request, 'events/_attendee_rows.html', {'rsvps': page.object_list, 'next_url': next_url})
+
+@query_budget(4)
+def event_attendees(request, pk):
+    """Fragment with one page of an event's attendees, loaded on demand by event_detail"""
+    event = get_object_or_404(Event.objects.only('pk'), pk=pk)
+    rsvps = RSVP.objects.filter(event=event).select_related('user').only('rsvp_date', 'user__username')
+    return _attendee_rows(request, rsvps, 'event_attendees', pk)
+
+@query_budget(6)
+def archive_list(request):
+    """Read-only list of archived events, most recent first"""
+    category_id = request.GET.get('category')
+    events = ArchivedEvent.objects.select_related('category')
+    if category_id and category_id.isdigit():
+        events = events.filter(category_id=category_id)
+    page = KeysetPaginator(events, ARCHIVE_ORDERING, EVENTS_PER_PAGE).get_page(request.GET.get('cursor'))
+    return render(request, 'events/archive_list.html', {
+        'events': page.object_list,
+        'page_obj': page,
+        'categories': Category.objects.all(),
+        'selected_category': category_id,
+    })
+
+@query_budget(4)
+def archived_event_detail(request, pk):
+    event = get_object_or_404(ArchivedEvent.objects.select_related('category'), pk=pk)
+    return render(request, 'events/archived_event_detail.html', {'event': event})
+
+@query_budget(4)
+def archived_event_attendees(request, pk):
+    """event_attendees for an archived event"""
+    event = get_object_or_404(ArchivedEvent.objects.only('pk'), pk=pk)
+    rsvps = ArchivedRSVP.objects.filter(event=event).select_related('user').only('rsvp_date', 'user__username')
+    return _attendee_rows(request, rsvps, 'archived_event_attendees', pk)
+
+@admin_or_organizer_required
+@query_budget(6)
+def attendee_export(request):
+    """Stream the attendees of one event (?event=), a category (?category=) and/or a date range as CSV or XLSX"""
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        raise Http404('Unknown export format')
+    
+    event_id = request.GET.get('event')
+    category_id = request.GET.get('category')
+    start_date = request.GET.get('start_date')
+    end_date = request.GET.get('end_date')
+    
+    if event_id:
+        event = get_object_or_404(Event.objects.only('pk'), pk=event_id if event_id.isdigit() else None)
+        rsvps = RSVP.objects.filter(event=event)
+        filename = f'attendees-event-{event.pk}'
+    else:
+        events = Event.objects.apply_filters(category_id, start_date, end_date)
+        rsvps = RSVP.objects.filter(event__in=events)
+        filename = 'attendees'
+        if category_id and category_id.isdigit():
+            filename += f'-category-{category_id}'
+        if start_date or end_date:
+            filename += f"-{start_date or 'start'}-to-{end_date or 'end'}"
+    
+    return export_response(rsvps, fmt, filename)
+
+# Validators, the window's keys and the missing events: a cold feed costs
+# three queries whatever its size, a warm one just the validators.
+@require_safe
+@query_budget(3)
+def calendar_feed(request):
+    """iCalendar feed of all public events"""
+    return feed_response(request, Feed.public(), 'events')
+
+@require_safe
+@query_budget(4)
+def category_calendar_feed(request, pk):
+    """iCalendar feed of one category's events"""
+    category = get_object_or_404(Category, pk=pk)
+    return feed_response(request, Feed.public(category), f'events-{slugify(category.name)}')
+
+@require_safe
+@query_budget(4)
+def user_calendar_feed(request, user_id, token):
+    """iCalendar feed of one user's RSVPs, authorised by the token in its URL"""
+    user = get_object_or_404(User, pk=user_id, is_active=True)
+    if not check_user_token(user, token):
+        raise Http404
+    return feed_response(request, Feed.for_user(user), 'my-rsvps', private=True)
+
 @admin_required
+@query_budget(8)
 def user_list(request):
-    
-    users = User.objects.select_related('profile').prefetch_related('groups', 'rsvps').all()
-    
-    
-    for user in users:
-        user.rsvp_count = user.rsvps.count()
-        user.primary_role = user.groups.first().name if user.groups.exists() else 'No Role'
-    
-    
-    admin_count = sum(1 for user in users if user.primary_role == 'Admin')
-    organizer_count = sum(1 for user in users if user.primary_role == 'Organizer')
-    participant_count = sum(1 for user in users if user.primary_role == 'Participant')
-    
+    query = request.GET.get('q', '').strip()
+    role = request.GET.get('role', '')
+
+    users = User.objects.annotate(primary_role=primary_role_expression())
+    role_totals = dict(
+        users.order_by().values_list('primary_role').annotate(total=Count('pk'))
+    )
+
+    if query:
+        users = users.filter(
+            Q(username__icontains=query) | Q(email__icontains=query) |
+            Q(first_name__icontains=query) | Q(last_name__icontains=query)
+        )
+    if role in USER_ROLES or role == NO_ROLE:
+        users = users.filter(primary_role=role)
+
+    users = users.only('pk', 'username', 'email', 'first_name', 'last_name', 'rsvp_count')
+    page = KeysetPaginator(users, ('username',), USERS_PER_PAGE).get_page(request.GET.get('cursor'))
+
     context = {
-        'users': users,
-        'admin_count': admin_count,
-        'organizer_count': organizer_count,
-        'participant_count': participant_count,
+        'users': page.object_list,
+        'page_obj': page,
+        'search_query': query,
+        'selected_role': role,
+        'roles': USER_ROLES + (NO_ROLE,),
+        'total_users': sum(role_totals.values()),
+        'admin_count': role_totals.get('Admin', 0),
+        'organizer_count': role_totals.get('Organizer', 0),
+        'participant_count': role_totals.get('Participant', 0),
     }
     
     return render(request, 'events/user_list.html', context)
@@ -276,8 +439,6 @@ def user_delete(request, pk):
     
     
     context = {'user': user}
-    if request.session.get('from_dashboard'):
-        context['active_page'] = 'dashboard'
     
     return render(request, 'events/user_confirm_delete.html', context)
 
@@ -296,8 +457,8 @@ def user_role_update(request, pk):
             return redirect('user_list')
     
     
-    current_role = user.groups.first().name if user.groups.exists() else 'No Role'
-    available_roles = ['Admin', 'Organizer', 'Participant']
+    current_role = user.get_user_role()
+    available_roles = list(USER_ROLES)
     
     context = {
         'user': user,
@@ -306,8 +467,6 @@ def user_role_update(request, pk):
     }
     
     
-    if request.session.get('from_dashboard'):
-        context['active_page'] = 'dashboard'
     
     return render(request, 'events/user_role_form.html', context)
 
@@ -328,8 +487,6 @@ def category_create(request):
     
     
     context = {'form': form, 'title': 'Create Category'}
-    if request.session.get('from_dashboard'):
-        context['active_page'] = 'dashboard'
     
     return render(request, 'events/category_form.html', context)
 
@@ -347,8 +504,6 @@ def category_update(request, pk):
     
     
     context = {'form': form, 'title': 'Edit Category'}
-    if request.session.get('from_dashboard'):
-        context['active_page'] = 'dashboard'
     
     return render(request, 'events/category_form.html', context)
 
@@ -362,8 +517,6 @@ def category_delete(request, pk):
     
    
     context = {'category': category}
-    if request.session.get('from_dashboard'):
-        context['active_page'] = 'dashboard'
     
     return render(request, 'events/category_confirm_delete.html', context)
 
@@ -444,45 +597,64 @@ def unregister_from_event(request, event_pk):
 
 
 
-class EventListView(DashboardContextMixin, ListView):
+@method_decorator(cache_anonymous_page(listing_tags), name='dispatch')
+@method_decorator(conditional_page(listing_validators), name='dispatch')
+@query_budget(12)
+class EventListView(ListView):
     """Class-based view for listing events"""
     model = Event
     template_name = 'events/event_list.html'
     context_object_name = 'events'
+    paginate_by = EVENTS_PER_PAGE
+    
+    def paginate_queryset(self, queryset, page_size):
+        """Paginate with a (starts_at, pk) cursor instead of OFFSET"""
+        query = self.request.GET.get('search')
+        if query:
+            return (None, None, search_events(query, queryset=queryset), False)
+        page = KeysetPaginator(queryset, EVENT_ORDERING, page_size).get_page(self.request.GET.get('cursor'))
+        return (None, page, page.object_list, page.has_other_pages())
     
     def get_queryset(self):
-        events = Event.objects.select_related('category').prefetch_related('rsvp_set__user').all()
-        
-        category_id = self.request.GET.get('category')
-        if category_id:
-            events = events.filter(category_id=category_id)
-        
-        start_date = self.request.GET.get('start_date')
-        end_date = self.request.GET.get('end_date')
-        if start_date and end_date:
-            events = events.filter(date__range=[start_date, end_date])
-        elif start_date:
-            events = events.filter(date__gte=start_date)
-        elif end_date:
-            events = events.filter(date__lte=end_date)
-        
-        return events
+        return (
+            Event.objects.select_related('category')
+            .with_attendee_preview(ATTENDEE_PREVIEW_SIZE)
+            .with_attendee_count()
+            .apply_filters(
+                category=self.request.GET.get('category'),
+                start_date=self.request.GET.get('start_date'),
+                end_date=self.request.GET.get('end_date'),
+            )
+        )
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['total_participants'] = User.objects.filter(rsvps__isnull=False).distinct().count()
+        context['total_participants'] = get_total_participants()
         context['categories'] = Category.objects.all()
         context['selected_category'] = self.request.GET.get('category')
         context['start_date'] = self.request.GET.get('start_date')
         context['end_date'] = self.request.GET.get('end_date')
+        context['search_query'] = self.request.GET.get('search', '')
         return context
 
+@method_decorator(cache_anonymous_page(event_tags), name='dispatch')
+@method_decorator(conditional_page(event_validators), name='dispatch')
+@query_budget(10)
 class EventDetailView(DetailView):
     """Class-based view for event detail"""
     model = Event
     template_name = 'events/event_detail.html'
     context_object_name = 'event'
     
+    def get(self, request, *args, **kwargs):
+        try:
+            return super().get(request, *args, **kwargs)
+        except Http404:
+            # Old links to an archived event lead to its read-only copy
+            if ArchivedEvent.objects.filter(pk=kwargs['pk']).exists():
+                return redirect('archived_event_detail', pk=kwargs['pk'])
+            raise
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         event = self.object
@@ -498,7 +670,7 @@ class EventDetailView(DetailView):
         
         return context
 
-class EventCreateView(AdminOrOrganizerRequiredMixin, DashboardContextMixin, CreateView):
+class EventCreateView(AdminOrOrganizerRequiredMixin, CreateView):
     """Class-based view for creating events"""
     model = Event
     form_class = EventForm
@@ -515,7 +687,7 @@ class EventCreateView(AdminOrOrganizerRequiredMixin, DashboardContextMixin, Crea
         context['title'] = 'Create Event'
         return context
 
-class EventUpdateView(AdminOrOrganizerRequiredMixin, DashboardContextMixin, UpdateView):
+class EventUpdateView(AdminOrOrganizerRequiredMixin, UpdateView):
     """Class-based view for updating events"""
     model = Event
     form_class = EventForm
@@ -531,7 +703,7 @@ class EventUpdateView(AdminOrOrganizerRequiredMixin, DashboardContextMixin, Upda
         context['title'] = 'Edit Event'
         return context
 
-class EventDeleteView(AdminOrOrganizerRequiredMixin, DashboardContextMixin, DeleteView):
+class EventDeleteView(AdminOrOrganizerRequiredMixin, DeleteView):
     """Class-based view for deleting events"""
     model = Event
     template_name = 'events/event_confirm_delete.html'
@@ -542,6 +714,9 @@ class EventDeleteView(AdminOrOrganizerRequiredMixin, DashboardContextMixin, Dele
         messages.success(request, 'Event deleted successfully!')
         return super().delete(request, *args, **kwargs)
 
+@method_decorator(cache_anonymous_page(category_tags), name='dispatch')
+@method_decorator(conditional_page(category_validators), name='dispatch')
+@query_budget(6)
 class CategoryListView(ListView):
     """Class-based view for listing categories"""
     model = Category
@@ -549,9 +724,9 @@ class CategoryListView(ListView):
     context_object_name = 'categories'
     
     def get_queryset(self):
-        return Category.objects.prefetch_related('events').all()
+        return Category.objects.all()
 
-class CategoryCreateView(AdminOrOrganizerRequiredMixin, DashboardContextMixin, CreateView):
+class CategoryCreateView(AdminOrOrganizerRequiredMixin, CreateView):
     """Class-based view for creating categories"""
     model = Category
     form_class = CategoryForm
@@ -567,7 +742,7 @@ class CategoryCreateView(AdminOrOrganizerRequiredMixin, DashboardContextMixin, C
         context['title'] = 'Create Category'
         return context
 
-class CategoryUpdateView(AdminOrOrganizerRequiredMixin, DashboardContextMixin, UpdateView):
+class CategoryUpdateView(AdminOrOrganizerRequiredMixin, UpdateView):
     """Class-based view for updating categories"""
     model = Category
     form_class = CategoryForm
@@ -583,7 +758,7 @@ class CategoryUpdateView(AdminOrOrganizerRequiredMixin, DashboardContextMixin, U
         context['title'] = 'Edit Category'
         return context
 
-class CategoryDeleteView(AdminOrOrganizerRequiredMixin, DashboardContextMixin, DeleteView):
+class CategoryDeleteView(AdminOrOrganizerRequiredMixin, DeleteView):
     """Class-based view for deleting categories"""
     model = Category
     template_name = 'events/category_confirm_delete.html'